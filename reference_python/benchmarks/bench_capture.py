@@ -0,0 +1,413 @@
+#!/usr/bin/env python3
+"""
+Benchmark - Capture throughput on a private Xvfb display
+
+Starts Xvfb on a free display number, draws deterministic animated content into
+it from a separate process and measures, for each region size:
+
+- "grab": grabs from the capture source alone: X11 with XShm, X11 with
+  XGetImage, and the synthetic source (capture_sources.SyntheticSource)
+- "engine": CaptureCore's grab stage feeding the real diff and store stages,
+  for every backend and storage mode (queue policy "block", so the sustained
+  rate is that of the slowest stage)
+
+Each case reports the sustained rate, per-call latency percentiles and the CPU
+used by this process ("client", all threads) and by the X server ("server").
+Results can be written as JSON and compared with an earlier run:
+
+Usage:
+    python benchmarks/bench_capture.py [--seconds S] [--sizes 320x240,1920x1080]
+                                       [--output results.json] [--compare baseline.json]
+
+The X11 backends require Xvfb (xvfb package on Debian/Ubuntu,
+xorg-x11-server-Xvfb on Fedora); --backends synthetic runs without it.
+"""
+
+import argparse
+import contextlib
+import ctypes
+import ctypes.util
+import json
+import os
+import platform
+import select
+import shutil
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+sys.path.insert(0, SRC_DIR)
+
+SCREEN_SIZE = (3840, 2160)
+SIZES = ["320x240", "640x480", "1280x720", "1920x1080", "2560x1440", "3840x2160"]
+BACKENDS = ["xshm", "xgetimage", "synthetic"]
+X11_BACKENDS = ("xshm", "xgetimage")
+STORAGE_MODES = ["ram", "disk", "arena", "delta", "tiles", "hybrid"]
+
+# Animation: the screen is split into cells, each with a box moving along a
+# fixed path, so every region size sees changes in proportion to its area
+CELL = (320, 240)
+BOX = 48
+ANIMATION_FPS = 60
+PALETTE = [0x1E1E2E, 0x313244, 0x45475A, 0x585B70, 0x89B4FA, 0xA6E3A1, 0xF9E2AF, 0xF38BA8]
+
+# Frames a RAM storage case may hold, so 4K runs don't exhaust memory
+RAM_BUDGET = 1 << 30
+
+
+def start_xvfb(width, height):
+    """
+    Start Xvfb on the first free display number
+
+    Returns:
+        tuple: (process, display name)
+    """
+    read_fd, write_fd = os.pipe()
+    process = subprocess.Popen(
+        ["Xvfb", "-displayfd", str(write_fd), "-screen", "0", f"{width}x{height}x24",
+         "-nolisten", "tcp", "-noreset", "+extension", "MIT-SHM"],
+        pass_fds=(write_fd,), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    os.close(write_fd)
+
+    # Xvfb writes the display number once it accepts connections
+    number = b""
+    deadline = time.monotonic() + 10
+    while not number.endswith(b"\n") and time.monotonic() < deadline:
+        ready, _, _ = select.select([read_fd], [], [], 0.1)
+        if ready:
+            chunk = os.read(read_fd, 16)
+            if not chunk:
+                break
+            number += chunk
+    os.close(read_fd)
+
+    if not number.strip():
+        process.kill()
+        process.wait()
+        raise RuntimeError("Xvfb did not start")
+    return process, f":{number.decode().strip()}"
+
+
+def animate(display_name, width, height, fps):
+    """Draw the animation until killed (runs in its own process)"""
+    xlib = ctypes.cdll.LoadLibrary(ctypes.util.find_library("X11"))
+    xlib.XOpenDisplay.argtypes = [ctypes.c_char_p]
+    xlib.XOpenDisplay.restype = ctypes.c_void_p
+    xlib.XDefaultScreen.argtypes = [ctypes.c_void_p]
+    xlib.XRootWindow.argtypes = [ctypes.c_void_p, ctypes.c_int]
+    xlib.XRootWindow.restype = ctypes.c_ulong
+    xlib.XDefaultGC.argtypes = [ctypes.c_void_p, ctypes.c_int]
+    xlib.XDefaultGC.restype = ctypes.c_void_p
+    xlib.XSetForeground.argtypes = [ctypes.c_void_p, ctypes.c_void_p, ctypes.c_ulong]
+    xlib.XFillRectangle.argtypes = [ctypes.c_void_p, ctypes.c_ulong, ctypes.c_void_p,
+                                    ctypes.c_int, ctypes.c_int, ctypes.c_uint, ctypes.c_uint]
+    xlib.XSync.argtypes = [ctypes.c_void_p, ctypes.c_int]
+
+    display = xlib.XOpenDisplay(display_name.encode())
+    if not display:
+        sys.exit(f"Cannot open display {display_name}")
+    screen = xlib.XDefaultScreen(display)
+    root = xlib.XRootWindow(display, screen)
+    gc = xlib.XDefaultGC(display, screen)
+
+    def fill(color, x, y, w, h):
+        xlib.XSetForeground(display, gc, color)
+        xlib.XFillRectangle(display, root, gc, x, y, w, h)
+
+    # Static background: one colour per cell, so frames don't compress to nothing
+    cells = [(x, y) for y in range(0, height, CELL[1]) for x in range(0, width, CELL[0])]
+    for index, (x, y) in enumerate(cells):
+        fill(PALETTE[index % 4], x, y, CELL[0], CELL[1])
+    xlib.XSync(display, 0)
+
+    def box_position(cell_x, cell_y, step):
+        span_x, span_y = CELL[0] - BOX, CELL[1] - BOX
+        return cell_x + (step * 7) % span_x, cell_y + (step * 3) % span_y
+
+    interval = 1.0 / fps
+    next_deadline = time.monotonic()
+    step = 0
+    while True:
+        for index, (x, y) in enumerate(cells):
+            if step:
+                fill(PALETTE[index % 4], *box_position(x, y, step - 1), BOX, BOX)
+            fill(PALETTE[4 + (index + step) % 4], *box_position(x, y, step), BOX, BOX)
+        xlib.XSync(display, 0)
+        step += 1
+        next_deadline += interval
+        time.sleep(max(0.0, next_deadline - time.monotonic()))
+
+
+def server_cpu_seconds(pid):
+    """User + system CPU time of another process, from /proc"""
+    if pid is None:
+        return 0.0
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            # Fields after the command name; utime and stime are fields 14 and 15
+            fields = f.read().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+    except (OSError, IndexError, ValueError):
+        return 0.0
+
+
+def measure(step, seconds, server_pid, max_calls=None):
+    """
+    Call step() repeatedly for *seconds* (or max_calls times)
+
+    Returns:
+        dict: Rate, latency percentiles and CPU use
+    """
+    latencies = []
+    cpu_start = time.process_time()
+    server_start = server_cpu_seconds(server_pid)
+    start = time.perf_counter()
+    deadline = start + seconds
+    now = start
+    while now < deadline and (max_calls is None or len(latencies) < max_calls):
+        step()
+        end = time.perf_counter()
+        latencies.append(end - now)
+        now = end
+    elapsed = now - start
+
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "calls": len(latencies),
+        "seconds": round(elapsed, 3),
+        "fps": round(len(latencies) / elapsed, 2),
+        "latency_ms": {name: round(float(np.percentile(latencies_ms, q)), 3)
+                       for name, q in (("p50", 50), ("p90", 90), ("p99", 99), ("max", 100))},
+        "cpu_percent": {
+            "client": round((time.process_time() - cpu_start) / elapsed * 100, 1),
+            "server": (round((server_cpu_seconds(server_pid) - server_start) / elapsed * 100, 1)
+                       if server_pid is not None else None),
+        },
+    }
+
+
+def open_source(backend, buffer_pool):
+    """
+    Capture source and grabber for a backend
+
+    Returns:
+        tuple: (source, grabber), or None if the backend isn't available
+    """
+    from capture_sources import SyntheticSource, X11Source
+
+    if backend == "synthetic":
+        source = SyntheticSource(*SCREEN_SIZE, fps=ANIMATION_FPS, buffer_pool=buffer_pool)
+        return source, source.open_grabber()
+
+    source = X11Source(buffer_pool, with_shm=backend == "xshm")
+    grabber = source.open_grabber()
+    # mss silently falls back to XGetImage when XShm can't be used
+    probe = grabber.sct.grab({"left": 0, "top": 0, "width": 16, "height": 16})
+    used = "xgetimage" if isinstance(probe.raw, bytearray) else "xshm"
+    if used != backend:
+        grabber.close()
+        return None
+    return source, grabber
+
+
+def region_for(size):
+    width, height = (int(value) for value in size.split("x"))
+    return {"left": 0, "top": 0, "width": width, "height": height}
+
+
+def bench_grab(size, backend, seconds, server_pid):
+    from frame_pool import FrameBufferPool
+
+    pool = FrameBufferPool()
+    opened = open_source(backend, pool)
+    if opened is None:
+        return None
+    _, grabber = opened
+    region = region_for(size)
+
+    def step():
+        # Hand the buffer back like the pipeline does once a frame is done
+        pool.release(grabber.grab(region))
+
+    try:
+        for _ in range(5):
+            step()
+        return measure(step, seconds, server_pid)
+    finally:
+        grabber.close()
+
+
+def bench_engine(size, backend, storage_mode, seconds, server_pid):
+    from capture_core import CaptureCore
+    from capture_pipeline import BLOCK
+    from frame_storage import FrameStorage
+
+    storage = FrameStorage(storage_mode)
+    opened = open_source(backend, storage.buffer_pool)
+    if opened is None:
+        storage.cleanup()
+        return None
+    source, grabber = opened
+    region = region_for(size)
+    max_calls = None
+    if storage_mode == "ram":
+        max_calls = max(1, RAM_BUDGET // (region["width"] * region["height"] * 4))
+
+    core = CaptureCore(storage, source=source)
+    core.capture_cursor = False
+    core.adaptive_rate = False
+    core.queue_policy = BLOCK
+    core.set_capture_region(0, 0, region["width"], region["height"])
+    try:
+        if not core.start_recording(run_thread=False):
+            return None
+        result = measure(lambda: core._capture_frame(grabber), seconds, server_pid, max_calls)
+        # Frames still in the pipeline count towards the time they took to store
+        drain_start = time.perf_counter()
+        core.stop_recording()
+        stored_seconds = result["seconds"] + (time.perf_counter() - drain_start)
+        result["stored_frames"] = storage.get_frame_count()
+        result["stored_fps"] = round(result["stored_frames"] / stored_seconds, 2)
+        return result
+    finally:
+        grabber.close()
+        core.change_detector.close()
+        storage.cleanup()
+
+
+def run_cases(sizes, backends, storage_modes, args, server_pid):
+    """Run every requested case, in a stable order"""
+    cases = []
+    for size in sizes:
+        for backend in backends:
+            plan = [("grab", None)]
+            if not args.grab_only:
+                plan += [("engine", mode) for mode in storage_modes]
+            # Only X11 grabs make the X server work
+            pid = server_pid if backend in X11_BACKENDS else None
+            for kind, storage_mode in plan:
+                if kind == "grab":
+                    result = bench_grab(size, backend, args.seconds, pid)
+                else:
+                    result = bench_engine(size, backend, storage_mode, args.seconds, pid)
+                if result is None:
+                    print(f"Skipping {kind} {size} {backend}: backend not available", file=sys.stderr)
+                    continue
+                cases.append(dict(kind=kind, size=size, backend=backend, storage=storage_mode, **result))
+    return cases
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=SRC_DIR, text=True,
+                              capture_output=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def case_key(case):
+    return (case["kind"], case["size"], case["backend"], case.get("storage"))
+
+
+def print_table(cases, baseline=None):
+    previous = {case_key(case): case for case in (baseline or {}).get("cases", [])}
+    header = f"{'case':<10}{'size':>11}{'backend':>11}{'storage':>9}{'fps':>9}{'p50 ms':>9}{'p99 ms':>9}{'cpu %':>8}{'X %':>7}"
+    if baseline:
+        header += f"{'vs base':>10}"
+    print(header)
+    for case in cases:
+        server = case['cpu_percent']['server']
+        line = (f"{case['kind']:<10}{case['size']:>11}{case['backend']:>11}{case.get('storage') or '-':>9}"
+                f"{case['fps']:>9.1f}{case['latency_ms']['p50']:>9.2f}{case['latency_ms']['p99']:>9.2f}"
+                f"{case['cpu_percent']['client']:>8.0f}{'-' if server is None else f'{server:.0f}':>7}")
+        if baseline:
+            old = previous.get(case_key(case))
+            line += f"{(case['fps'] / old['fps'] - 1) * 100:>+9.0f}%" if old else f"{'new':>10}"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=2.0, help="Measuring time per case")
+    parser.add_argument("--sizes", default=",".join(SIZES), help="Comma separated WxH region sizes")
+    parser.add_argument("--backends", default=",".join(BACKENDS), help="Comma separated: xshm, xgetimage, synthetic")
+    parser.add_argument("--storage", default=",".join(STORAGE_MODES), help="Comma separated: ram, disk, arena, delta, tiles, hybrid")
+    parser.add_argument("--grab-only", action="store_true", help="Skip the engine cases")
+    parser.add_argument("--output", metavar="PATH", help="Write results as JSON")
+    parser.add_argument("--compare", metavar="PATH", help="JSON from an earlier run to compare rates with")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    # Internal: the animation process
+    parser.add_argument("--animate", metavar="DISPLAY", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.animate:
+        animate(args.animate, *SCREEN_SIZE, ANIMATION_FPS)
+        return
+
+    backends = [name for name in args.backends.split(",") if name]
+    for name in backends:
+        if name not in BACKENDS:
+            parser.error(f"unknown backend {name!r}, expected one of {', '.join(BACKENDS)}")
+    needs_x = any(name in X11_BACKENDS for name in backends)
+    if needs_x and not shutil.which("Xvfb"):
+        print("Error: Xvfb not found. Install it (e.g. apt install xvfb) to run the X11 cases, "
+              "or pass --backends synthetic.", file=sys.stderr)
+        sys.exit(2)
+
+    sizes = [size.strip() for size in args.sizes.split(",") if size.strip()]
+    for size in sizes:
+        width, height = region_for(size)["width"], region_for(size)["height"]
+        if width > SCREEN_SIZE[0] or height > SCREEN_SIZE[1]:
+            parser.error(f"region {size} is larger than the {SCREEN_SIZE[0]}x{SCREEN_SIZE[1]} screen")
+    storage_modes = [name for name in args.storage.split(",") if name]
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    xvfb = animator = None
+    try:
+        if needs_x:
+            xvfb, display = start_xvfb(*SCREEN_SIZE)
+            # Everything below must capture from the private display, never the user's session
+            os.environ["DISPLAY"] = display
+            os.environ.pop("WAYLAND_DISPLAY", None)
+            os.environ["XDG_SESSION_TYPE"] = "x11"
+            animator = subprocess.Popen([sys.executable, os.path.abspath(__file__), "--animate", display])
+            time.sleep(0.5)
+
+        # The application's own prints would end up in the --json output
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            cases = run_cases(sizes, backends, storage_modes, args, xvfb.pid if xvfb else None)
+    finally:
+        if animator:
+            animator.kill()
+            animator.wait()
+        if xvfb:
+            xvfb.terminate()
+            xvfb.wait()
+
+    report = {
+        "commit": git_commit(),
+        "python": sys.version.split()[0],
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "screen": f"{SCREEN_SIZE[0]}x{SCREEN_SIZE[1]}",
+        "animation_fps": ANIMATION_FPS,
+        "seconds_per_case": args.seconds,
+        "cases": cases,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_table(cases, baseline)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Benchmark - Per-frame cost of change detection at common capture sizes
+
+Compares the original int-cast full diff with ChangeDetector for three typical
+recording situations: an idle screen, a blinking caret and a full-screen change.
+
+Usage:
+    python benchmarks/bench_change_detection.py [--repeat N] [--json]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from change_detection import ChangeDetector  # noqa: E402
+
+SIZES = {
+    "720p": (1280, 720),
+    "1080p": (1920, 1080),
+    "4K": (3840, 2160),
+}
+
+
+def legacy_frames_identical(frame1, frame2, threshold=0.99):
+    """The comparison CaptureEngine used before ChangeDetector"""
+    diff = np.abs(frame1.astype(int) - frame2.astype(int))
+    return np.sum(diff == 0) / diff.size >= threshold
+
+
+def make_scenarios(width, height):
+    """Frame pairs (previous, current) as BGRA buffers"""
+    rng = np.random.default_rng(0)
+    base = rng.integers(0, 256, (height, width, 4), dtype=np.uint8)
+    base[..., 3] = 255
+
+    caret = base.copy()
+    caret[height // 2:height // 2 + 16, width // 2:width // 2 + 2, :3] ^= 0xFF
+
+    scrolled = np.roll(base, -20, axis=0)
+
+    return {
+        "idle": (base, base.copy()),
+        "caret": (base, caret),
+        "full": (base, scrolled),
+    }
+
+
+def time_call(func, repeat):
+    """Median wall time of func() in milliseconds"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return float(np.median(samples))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=15, help="Runs per measurement (median is reported)")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    exact = ChangeDetector(threshold=1.0)
+    similar = ChangeDetector(threshold=0.99)
+    results = []
+
+    for size_name, (width, height) in SIZES.items():
+        for scenario, (previous, current) in make_scenarios(width, height).items():
+            # The legacy code worked on RGB images
+            prev_rgb = np.ascontiguousarray(previous[..., 2::-1])
+            curr_rgb = np.ascontiguousarray(current[..., 2::-1])
+            results.append({
+                "size": size_name,
+                "scenario": scenario,
+                "legacy_ms": time_call(lambda: legacy_frames_identical(prev_rgb, curr_rgb), max(3, args.repeat // 5)),
+                "exact_ms": time_call(lambda: exact.compare(previous, current), args.repeat),
+                "similarity_ms": time_call(lambda: similar.compare(previous, current), args.repeat),
+            })
+
+    exact.close()
+    similar.close()
+
+    if args.json:
+        print(json.dumps({"cpu_count": os.cpu_count(), "results": results}, indent=2))
+        return
+
+    print(f"{'size':<7}{'scenario':<10}{'legacy':>10}{'exact':>10}{'0.99':>10}   (ms per frame, median)")
+    for row in results:
+        print(f"{row['size']:<7}{row['scenario']:<10}{row['legacy_ms']:>10.2f}"
+              f"{row['exact_ms']:>10.2f}{row['similarity_ms']:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Benchmark - Time from process start until the recorder window is usable
+
+Each run starts a fresh interpreter with the offscreen Qt platform and an empty
+HOME, so results don't depend on a display or on saved settings. Two marks are
+reported per run: the window shown and processing events ("window"), and the
+capture engine created in the background ("capture ready"). The "eager" row
+imports the capture stack, encoder and editor before the window, the way the
+application started before imports were made lazy.
+
+Usage:
+    python benchmarks/bench_startup.py [--runs N] [--budget MS] [--json]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+
+# Runs inside the child interpreter; prints one mark per line as it gets there
+CHILD = """
+import os, sys, time
+# Marks go to the real stdout, the application's own prints are discarded
+marks = sys.stdout
+sys.stdout = open(os.devnull, "w")
+sys.path.insert(0, {src!r})
+if {eager!r}:
+    import capture_engine, frame_storage, gif_encoder, editor_window, imageio
+from PyQt6.QtWidgets import QApplication
+from recorder_window import RecorderWindow
+
+app = QApplication(sys.argv)
+window = RecorderWindow()
+window.show()
+app.processEvents()
+print("window", file=marks, flush=True)
+
+deadline = time.monotonic() + 30
+while window.capture_engine is None and time.monotonic() < deadline:
+    app.processEvents()
+    time.sleep(0.001)
+print("capture", file=marks, flush=True)
+"""
+
+
+def run_once(eager, home):
+    """Start one child process and return the time of each mark in milliseconds"""
+    env = dict(os.environ, QT_QPA_PLATFORM="offscreen", HOME=home)
+    code = CHILD.format(src=os.path.abspath(SRC_DIR), eager=eager)
+
+    marks = {}
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "-c", code], stdout=subprocess.PIPE,
+                               stderr=subprocess.DEVNULL, env=env, text=True)
+    for line in process.stdout:
+        name = line.strip()
+        if name in ("window", "capture"):
+            marks[name] = (time.perf_counter() - start) * 1000
+    process.wait()
+    if process.returncode != 0 or len(marks) != 2:
+        raise RuntimeError(f"startup run failed (exit code {process.returncode})")
+    return marks
+
+
+def median(values):
+    values = sorted(values)
+    middle = len(values) // 2
+    return values[middle] if len(values) % 2 else (values[middle - 1] + values[middle]) / 2
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=7, help="Process starts per mode (median is reported)")
+    parser.add_argument("--budget", type=float, default=None, metavar="MS",
+                        help="Exit with status 1 if the median time to the window exceeds this")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="gifcap_bench_home_") as home:
+        # One untimed start warms the OS file cache
+        run_once(False, home)
+        for mode, eager in (("lazy", False), ("eager", True)):
+            runs = [run_once(eager, home) for _ in range(args.runs)]
+            results.append({
+                "mode": mode,
+                "window_ms": median([run["window"] for run in runs]),
+                "capture_ready_ms": median([run["capture"] for run in runs]),
+            })
+
+    if args.json:
+        print(json.dumps({"python": sys.version.split()[0], "results": results}, indent=2))
+    else:
+        print(f"{'mode':<8}{'window':>10}{'capture ready':>16}   (ms from process start, median)")
+        for row in results:
+            print(f"{row['mode']:<8}{row['window_ms']:>10.1f}{row['capture_ready_ms']:>16.1f}")
+
+    if args.budget is not None and results[0]["window_ms"] > args.budget:
+        print(f"Startup budget exceeded: {results[0]['window_ms']:.1f} ms > {args.budget:.1f} ms", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+"""
+Arena Storage - Frames appended to one growable memory-mapped file
+"""
+
+import mmap
+import os
+import threading
+import zlib
+import numpy as np
+from frame_convert import frame_to_array, read_only
+from storage_backends import StorageBackend
+
+# Every slot starts on this boundary, so frame views are well aligned
+SLOT_ALIGNMENT = 64
+# Size of each mapped piece of the arena (bigger frames get a piece of their own)
+CHUNK_SIZE = 256 * 1024 * 1024
+
+
+def _round_up(value, multiple):
+    return -(-value // multiple) * multiple
+
+
+class ArenaChunk:
+    """One mapped piece of the arena file"""
+
+    __slots__ = ("map", "file_offset", "size", "used")
+
+    def __init__(self, map_, file_offset, size):
+        self.map = map_
+        self.file_offset = file_offset
+        self.size = size
+        self.used = 0
+
+
+class ArenaBackend(StorageBackend):
+    """
+    Raw (or lightly compressed) frames in a single memory-mapped file
+
+    The file grows in chunks that are mapped one by one: an existing mapping
+    never has to move, so the views handed out by get_array() stay valid while
+    the arena grows. Raw frames are read as zero-copy numpy views over the
+    mapping; the kernel pages them in and out, so recordings can be much
+    larger than RAM and still have RAM-like random access.
+
+    Deleting a frame only marks its slot free; new frames of the same size
+    (all frames of a recording, when raw) reuse it. compact() rewrites the
+    live frames into a new file to give the space of the rest back.
+    """
+
+    name = "arena"
+
+    def __init__(self, path, compress_level=0, chunk_size=CHUNK_SIZE):
+        """
+        Args:
+            path: Arena file to create (removed by close())
+            compress_level: 0 stores raw frames (zero-copy reads), 1-9 zlib
+                            compresses them (smaller file, reads decompress)
+            chunk_size: Bytes mapped at a time as the file grows
+        """
+        self.file_path = path
+        self.compress_level = compress_level
+        # Raw frames are read in place, compressed ones are worth caching
+        self.decodes = compress_level > 0
+        self.chunk_size = _round_up(chunk_size, mmap.ALLOCATIONGRANULARITY)
+        self.lock = threading.Lock()
+        self.file = open(path, "w+b")
+        self.file_size = 0
+        self.chunks = []
+        # key -> (chunk index, offset, slot size, stored bytes, shape, compressed)
+        self.slots = {}
+        self.free = {}  # slot size -> [(chunk index, offset)]
+        self.live_bytes = 0
+        self.free_bytes = 0
+
+    def _new_chunk(self, min_size):
+        """Grow the file and map the new part"""
+        size = max(self.chunk_size, _round_up(min_size, mmap.ALLOCATIONGRANULARITY))
+        offset = self.file_size
+        self.file.truncate(offset + size)  # Sparse: no disk space is used until written
+        self.file_size += size
+        self.chunks.append(ArenaChunk(mmap.mmap(self.file.fileno(), size, offset=offset), offset, size))
+        return len(self.chunks) - 1
+
+    def _allocate(self, size):
+        """Slot of at least size bytes: a free one if possible, otherwise new space (lock held)"""
+        for free_size in sorted(self.free):
+            if free_size >= size:
+                slots = self.free[free_size]
+                chunk_index, offset = slots.pop()
+                if not slots:
+                    del self.free[free_size]
+                self.free_bytes -= free_size
+                return chunk_index, offset, free_size
+
+        chunk_index = len(self.chunks) - 1
+        if chunk_index < 0 or self.chunks[chunk_index].size - self.chunks[chunk_index].used < size:
+            chunk_index = self._new_chunk(size)
+        chunk = self.chunks[chunk_index]
+        offset = chunk.used
+        chunk.used += size
+        return chunk_index, offset, size
+
+    def _store(self, key, data, shape, compressed):
+        """Copy data into a new slot and index it (lock held)"""
+        nbytes = len(data)
+        chunk_index, offset, size = self._allocate(_round_up(max(1, nbytes), SLOT_ALIGNMENT))
+        target = np.frombuffer(self.chunks[chunk_index].map, dtype=np.uint8, count=nbytes, offset=offset)
+        target[:] = np.frombuffer(data, dtype=np.uint8)
+        del target  # Don't keep an export of the mapping alive
+        self.slots[key] = (chunk_index, offset, size, nbytes, shape, compressed)
+        self.live_bytes += size
+
+    def put(self, key, frame, change=None, base_key=None):
+        array = np.ascontiguousarray(frame_to_array(frame))
+        if self.compress_level > 0:
+            data = zlib.compress(array, self.compress_level)
+            compressed = True
+        else:
+            data = array.reshape(-1)
+            compressed = False
+        with self.lock:
+            self._store(key, data, array.shape, compressed)
+
+    def get_array(self, key):
+        with self.lock:
+            chunk_index, offset, _, nbytes, shape, compressed = self.slots[key]
+            chunk_map = self.chunks[chunk_index].map
+            if compressed:
+                data = chunk_map[offset:offset + nbytes]
+        if compressed:
+            return read_only(np.frombuffer(zlib.decompress(data), dtype=np.uint8).reshape(shape))
+        # Zero-copy view over the mapping; stays valid even if the arena is compacted
+        return read_only(np.frombuffer(chunk_map, dtype=np.uint8, count=nbytes, offset=offset).reshape(shape))
+
+    def delete(self, key):
+        with self.lock:
+            chunk_index, offset, size, _, _, _ = self.slots.pop(key)
+            self.free.setdefault(size, []).append((chunk_index, offset))
+            self.live_bytes -= size
+            self.free_bytes += size
+
+    def compact(self):
+        """
+        Rewrite the live frames into a new arena file
+
+        Views from get_array() keep reading the old mapping, which is released
+        once the last of them is gone.
+
+        Returns:
+            int: Bytes of freed slots given back
+        """
+        with self.lock:
+            reclaimed = self.free_bytes
+            if not reclaimed:
+                return 0
+            old_chunks, old_file = self.chunks, self.file
+            old_slots = self.slots
+
+            temp_path = f"{self.file_path}.compact"
+            self.file = open(temp_path, "w+b")
+            self.file_size = 0
+            self.chunks = []
+            self.slots = {}
+            self.free = {}
+            self.live_bytes = 0
+            self.free_bytes = 0
+            # One chunk for everything that is left
+            self._new_chunk(sum(slot[2] for slot in old_slots.values()))
+
+            for key in sorted(old_slots):
+                chunk_index, offset, _, nbytes, shape, compressed = old_slots[key]
+                data = old_chunks[chunk_index].map[offset:offset + nbytes]
+                self._store(key, data, shape, compressed)
+            # The old file disappears once nothing maps it any more
+            os.replace(temp_path, self.file_path)
+            self._release_chunks(old_chunks)
+            old_file.close()
+            return reclaimed
+
+    @staticmethod
+    def _release_chunks(chunks):
+        for chunk in chunks:
+            try:
+                chunk.map.close()
+            except BufferError:
+                # Views are still exported; the mapping goes with the last one
+                pass
+
+    def stats(self):
+        with self.lock:
+            return {
+                "frames": len(self.slots),
+                "file_bytes": self.file_size,
+                "live_bytes": self.live_bytes,
+                "free_bytes": self.free_bytes,
+                "chunks": len(self.chunks),
+            }
+
+    def close(self):
+        with self.lock:
+            self._release_chunks(self.chunks)
+            self.chunks = []
+            self.slots.clear()
+            self.free.clear()
+            self.file.close()
+            try:
+                os.unlink(self.file_path)
+            except OSError:
+                pass
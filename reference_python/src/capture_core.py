@@ -0,0 +1,499 @@
+"""
+Capture Core - Screen capture and frame comparison with hybrid X11/Wayland support, without Qt
+"""
+
+import os
+import threading
+import time
+from capture_sources import X11Source, WaylandSource
+from cursor_capture import CursorCompositor, X11CursorCapture
+from capture_thread import CaptureThread
+from damage_monitor import XDamageMonitor
+from change_detection import ChangeDetector, compute_change_map, merge_changes
+from capture_pipeline import CapturePipeline, CapturedFrame, MERGE
+from capture_scheduler import AdaptiveScheduler
+from frame_scaling import scale_frame
+
+# GIF delays are stored in hundredths of a second
+GIF_DELAY_UNIT = 10  # ms
+
+
+class CaptureCore:
+    """
+    UI-agnostic capture engine: grab, diff and store frames on worker threads
+    
+    Progress is reported through optional callbacks, called from the worker
+    threads while recording:
+        on_frame_captured(frame_count)
+        on_frames_skipped(total_skipped)
+        on_pipeline_stats(stats)
+        on_recording_stopped()
+    
+    CaptureEngine wraps this class for the Qt UI; scripts can use it directly
+    (see recorder.Recorder).
+    """
+    
+    # Minimum time between two on_pipeline_stats calls (seconds)
+    STATS_INTERVAL = 0.5
+    
+    def __init__(self, frame_storage, probe=True, source=None):
+        """
+        Args:
+            frame_storage: FrameStorage receiving the frames
+            probe: Detect the capture backends now. Pass False to call
+                   probe_backends() later, e.g. from a background thread;
+                   recording waits for it if it hasn't finished.
+            source: CaptureSource to grab from (see capture_sources), e.g. a
+                    SyntheticSource; by default X11 or Wayland is detected
+        """
+        super().__init__()
+        self.frame_storage = frame_storage
+        
+        # Event callbacks (None to ignore)
+        self.on_frame_captured = None
+        self.on_frames_skipped = None
+        self.on_pipeline_stats = None
+        self.on_recording_stopped = None
+        # Frame buffers are checked out per grab and returned once dropped or stored
+        self.buffer_pool = frame_storage.buffer_pool
+        
+        # Capture backends, filled in by probe_backends()
+        self.source = source
+        self.session_type = None
+        self.sct = None  # GUI thread grabber, opened on the first single frame
+        self.cursor_capture = None
+        self.default_cursor = None
+        self.cursor_compositor = None
+        self.backend_error = None
+        self.probed = False
+        self.probe_lock = threading.Lock()
+        
+        # Recording state
+        self.is_recording = False
+        self.capture_thread = None
+        self.skipped_frames = 0
+        
+        # grab -> diff -> store pipeline, created per recording
+        self.pipeline = None
+        self.queue_policy = MERGE  # What a full queue does: block, drop_newest or merge
+        self.last_stats_time = 0.0
+        
+        # Capture region (x, y, width, height)
+        self.capture_region = None
+        self.fps = 30
+        self.capture_cursor = False
+        # Frames are shrunk to this size right after the grab (1.0 = full size)
+        self.output_scale = 1.0
+        
+        # Effective capture rate: backs off on static screens, sheds load when behind
+        self.adaptive_rate = True
+        self.scheduler = AdaptiveScheduler(self.fps)
+        
+        # "poll" grabs every tick, "damage" only grabs once XDamage reports a change
+        self.capture_mode = "poll"
+        self.damage_monitor = None
+        
+        # Frame comparison (last_frame_array is the last frame sent to storage)
+        self.last_frame_array = None
+        # Storage key of the last frame the store stage added: the base of the next change map
+        self.last_stored_key = None
+        # Frames at least 99% similar count as identical (1.0 would require exact equality)
+        self.change_detector = ChangeDetector(threshold=0.99)
+        self.last_cursor_pos = None  # Track cursor position for change detection
+        self.last_cursor_shape = None
+        self.has_grabbed = False
+        self.last_grab_cursor = None
+        
+        # Frame timing: the last recorded frame stays on screen from span_start
+        # until the next change, delay_carry holds the rounding error (ms)
+        self.span_start = None
+        self.delay_carry = 0.0
+        
+        if probe:
+            self.probe_backends()
+    
+    def probe_backends(self):
+        """
+        Pick a capture source for the session (unless one was given) and check it works
+        
+        Safe to call from any thread and more than once; only the first call
+        does the work, later ones wait for it.
+        
+        Returns:
+            bool: True if frames can be captured, otherwise see backend_error
+        """
+        with self.probe_lock:
+            if self.probed:
+                return self.backend_error is None
+            
+            if self.source is None:
+                self.source = self._detect_source()
+            if self.source.buffer_pool is None:
+                self.source.buffer_pool = self.buffer_pool
+            
+            error = self.source.probe()
+            if error:
+                self.backend_error = error
+                print(f"Error: {self.source.name} capture not available: {error}")
+            
+            if self.source.composite_cursor:
+                # Cursor capture (X11 only for now, Wayland portal handles it)
+                self.cursor_capture = X11CursorCapture()
+                self.default_cursor = self.cursor_capture.create_default_cursor()
+                # Blended straight into the BGRA capture buffer
+                self.cursor_compositor = CursorCompositor(channel_order="BGRA")
+                self.cursor_compositor.set_sprite(self.default_cursor, key="default")
+            
+            self.session_type = self.source.name
+            self.probed = True
+            return self.backend_error is None
+    
+    @staticmethod
+    def _notify(callback, *args):
+        """Invoke an event callback if one is set"""
+        if callback:
+            callback(*args)
+    
+    def _detect_source(self):
+        """Capture source for the current session"""
+        session_type = self._detect_session()
+        print(f"Detected session type: {session_type}")
+        
+        if session_type == 'wayland':
+            source = WaylandSource()
+            if source.probe() is None:
+                return source
+            print("Warning: Wayland capture not available, falling back to X11")
+        return X11Source()
+    
+    def _detect_session(self):
+        """Detect if running on X11 or Wayland"""
+        wayland_display = os.environ.get('WAYLAND_DISPLAY')
+        xdg_session_type = os.environ.get('XDG_SESSION_TYPE', '').lower()
+        
+        if wayland_display or xdg_session_type == 'wayland':
+            return 'wayland'
+        return 'x11'
+    
+    def set_capture_region(self, x, y, width, height):
+        """Set the screen region to capture"""
+        self.capture_region = {"top": int(y), "left": int(x), "width": int(width), "height": int(height)}
+        if self.damage_monitor:
+            self.damage_monitor.set_region(self.capture_region)
+    
+    def set_fps(self, fps):
+        """Set capture frame rate"""
+        self.fps = max(1, min(60, fps))  # Clamp between 1-60
+        self.scheduler.set_target(self.fps)
+    
+    def set_output_scale(self, scale):
+        """
+        Set the size frames are recorded at, relative to the capture region
+        
+        0.5, 0.25 or 1/3 use a fast box filter; other scales are resampled.
+        
+        Returns:
+            bool: True if the scale was accepted (0 < scale <= 1)
+        """
+        try:
+            scale = float(scale)
+        except (TypeError, ValueError):
+            scale = 0.0
+        if not 0.0 < scale <= 1.0:
+            print(f"Error: Output scale must be between 0 and 1, got {scale}")
+            return False
+        self.output_scale = scale
+        return True
+    
+    def start_recording(self, run_thread=True):
+        """
+        Start capturing frames
+        
+        Args:
+            run_thread: Start the capture thread. With False the pipeline runs but
+                        the caller drives the grab stage by calling _capture_frame()
+                        with its own grabber (used by benchmarks/bench_capture.py).
+        """
+        if not self.capture_region:
+            print("Error: Capture region not set")
+            return False
+        if not self.probe_backends():
+            return False
+        
+        self.is_recording = True
+        self.last_frame_array = None
+        self.last_stored_key = None
+        self.last_cursor_pos = None
+        self.last_cursor_shape = None
+        self.has_grabbed = False
+        self.last_grab_cursor = None
+        self.span_start = None
+        self.delay_carry = 0.0
+        self.skipped_frames = 0
+        self.scheduler.reset(self.fps, self.adaptive_rate)
+        
+        # Subscribe to damage before the first grab so no change is missed
+        if self.capture_mode == "damage" and self.source.supports_damage:
+            self.damage_monitor = XDamageMonitor()
+            if not self.damage_monitor.start(self.capture_region):
+                print("Warning: XDamage not available, falling back to polling")
+                self.damage_monitor = None
+        
+        self.pipeline = CapturePipeline(self._diff_frame, self._store_frame, policy=self.queue_policy,
+                                        merge_diff=self._merge_queued_frames,
+                                        merge_store=self._merge_stored_frames,
+                                        on_cost=self.scheduler.record_cost)
+        self.pipeline.start()
+        
+        if run_thread:
+            self.capture_thread = CaptureThread(self)
+            self.capture_thread.start()
+        print(f"Recording started at {self.fps} FPS")
+        return True
+    
+    def stop_recording(self):
+        """Stop capturing frames"""
+        stop_time = time.monotonic()
+        self.is_recording = False
+        if self.capture_thread:
+            self.capture_thread.stop()
+            self.capture_thread = None
+        if self.pipeline:
+            # Frames still queued are stored before the recording ends
+            self.pipeline.stop()
+            self._notify(self.on_pipeline_stats, self._collect_stats())
+            self.pipeline = None
+        if self.damage_monitor:
+            self.damage_monitor.stop()
+            self.damage_monitor = None
+        
+        # The last frame lasted until recording stopped
+        self._close_span(stop_time)
+        changes = len(self.scheduler.rate_changes) - 1
+        if changes:
+            print(f"Capture rate changed {changes} times (adaptive scheduling)")
+        self.buffer_pool.release(self.last_frame_array)
+        self.last_frame_array = None
+        
+        print(f"Recording stopped. Total frames: {self.frame_storage.get_frame_count()}")
+        self._notify(self.on_recording_stopped)
+    
+    def capture_single_frame(self):
+        """Capture a single frame immediately"""
+        if not self.capture_region:
+            print("Error: Capture region not set")
+            return False
+        if not self.probe_backends():
+            return False
+        
+        cursor = self._sample_cursor()
+        
+        if self.source.keep_grabber:
+            if self.sct is None:
+                self.sct = self.source.open_grabber()
+            frame = self._grab_screen(self.sct, cursor)
+        else:
+            # e.g. a Wayland stream: don't leave a producer running
+            grabber = self.source.open_grabber()
+            try:
+                frame = self._grab_screen(grabber, cursor)
+            finally:
+                grabber.close()
+        if frame is not None:
+            delay = int(1000 / self.fps)  # Use FPS to determine delay
+            frame_num = self.frame_storage.add_frame(frame, delay)
+            self.buffer_pool.release(frame)
+            self._notify(self.on_frame_captured, frame_num)
+            return True
+        return False
+    
+    def _open_grabber(self):
+        """Open a screen grabber for the calling thread (X11 connections can't be shared)"""
+        return self.source.open_grabber()
+    
+    def _close_grabber(self, grabber):
+        """Close a grabber returned by _open_grabber"""
+        if grabber is not None:
+            grabber.close()
+    
+    def _skip_frames(self, count):
+        """Account for ticks the capture thread had to skip"""
+        # Nothing to do for the delays: the frame on screen keeps its span running
+        self.skipped_frames += count
+        self._notify(self.on_frames_skipped, self.skipped_frames)
+    
+    def _capture_frame(self, grabber=None):
+        """Grab stage: grab a frame and queue it for comparison (runs on the capture thread)"""
+        timestamp = time.monotonic()
+        
+        # Get current cursor position and shape if cursor capture is enabled
+        cursor = self._sample_cursor()
+        cursor_pos = cursor["position"] if cursor else None
+        cursor_shape = cursor["serial"] if cursor else None
+        
+        # In damage mode an undamaged region can't have changed - skip the grab,
+        # the previous frame just stays on screen longer
+        if (self.damage_monitor and self.has_grabbed and not self.damage_monitor.poll() and
+                (cursor_pos, cursor_shape) == self.last_grab_cursor):
+            return
+        
+        frame = self._grab_screen(grabber, cursor)
+        if frame is None:
+            return
+        self.has_grabbed = True
+        self.last_grab_cursor = (cursor_pos, cursor_shape)
+        
+        if not self.pipeline.diff.put(CapturedFrame(frame, timestamp, cursor_pos, cursor_shape)):
+            self.buffer_pool.release(frame)
+        self.scheduler.record_cost("grab", time.monotonic() - timestamp)
+        
+        if timestamp - self.last_stats_time >= self.STATS_INTERVAL:
+            self.last_stats_time = timestamp
+            self._notify(self.on_pipeline_stats, self._collect_stats())
+    
+    def _diff_frame(self, item):
+        """Diff stage: forward the frame to storage if it differs from the last stored one"""
+        # Check if cursor moved significantly (more than a few pixels)
+        cursor_moved = False
+        if self.capture_cursor and item.cursor_pos and self.last_cursor_pos:
+            dx = abs(item.cursor_pos[0] - self.last_cursor_pos[0])
+            dy = abs(item.cursor_pos[1] - self.last_cursor_pos[1])
+            cursor_moved = (dx > 2 or dy > 2)  # Threshold to avoid jitter
+        # A new cursor shape (e.g. arrow to text beam) is worth a frame too
+        if self.capture_cursor and item.cursor_shape != self.last_cursor_shape:
+            cursor_moved = True
+        
+        if self.last_frame_array is not None and self.last_frame_array.shape != item.array.shape:
+            # Region resized: nothing to compare with, the frame is stored whole
+            item.change = None
+        elif self.last_frame_array is not None:
+            # Compare frames and keep the tile map of what changed for later stages
+            item.change = self.change_detector.compare(self.last_frame_array, item.array)
+            if item.change is None:
+                if not cursor_moved:
+                    # Same frame - the previous one simply stays on screen longer
+                    self.buffer_pool.release(item.array)
+                    self.scheduler.frame_unchanged()
+                    return
+                item.change = compute_change_map(self.last_frame_array, item.array)
+        
+        self.scheduler.frame_changed()
+        
+        # Reference for the next comparison - taken before put(), the store
+        # stage may release the pipeline's reference right away
+        self.buffer_pool.retain(item.array)
+        if self.pipeline.store.put(item):
+            # Compare the next frames against what storage will actually hold
+            self.buffer_pool.release(self.last_frame_array)
+            self.last_frame_array = item.array
+            self.last_cursor_pos = item.cursor_pos
+            self.last_cursor_shape = item.cursor_shape
+        else:
+            # Dropped: neither the comparison nor the pipeline keeps it
+            self.buffer_pool.release(item.array)
+            self.buffer_pool.release(item.array)
+    
+    def _merge_queued_frames(self, queued, new):
+        """Diff queue full: the newest frame replaces the queued one"""
+        self.buffer_pool.release(queued.array)
+        return new
+    
+    def _merge_stored_frames(self, queued, new):
+        """Store queue full: keep the newest frame, its change map covers both"""
+        new.change = merge_changes(queued.change, new.change)
+        self.buffer_pool.release(queued.array)
+        return new
+    
+    def _store_frame(self, item):
+        """Store stage: end the previous frame's span and save the new frame"""
+        # The previous frame was shown until this one was grabbed
+        self._close_span(item.timestamp)
+        
+        # Provisional, fixed once the next frame arrives
+        delay = int(1000 * self.scheduler.interval)
+        # The change map is against the frame this stage stored last; storage
+        # ignores it if anything else (e.g. a single frame capture) came in between
+        self.last_stored_key = self.frame_storage.append_frame(item.array, delay, timestamp=item.timestamp,
+                                                               change=item.change, base_key=self.last_stored_key)
+        self.buffer_pool.release(item.array)  # RAM storage holds its own reference
+        self.span_start = item.timestamp
+        
+        # Emit signal
+        frame_num = self.frame_storage.get_frame_count()
+        self._notify(self.on_frame_captured, frame_num)
+    
+    def _collect_stats(self):
+        """Pipeline statistics for the recorder UI"""
+        stats = self.pipeline.stats() if self.pipeline else {}
+        stats["grab"] = {"skipped": self.skipped_frames}
+        stats["pool"] = self.buffer_pool.stats()
+        stats["scheduler"] = self.scheduler.stats()
+        stats["storage"] = self.frame_storage.stats()
+        return stats
+    
+    def _close_span(self, end_time):
+        """
+        Set the delay of the last recorded frame from the time it was on screen
+        
+        Delays are rounded to GIF's 10 ms resolution and the rounding error is
+        carried over to the next frame, so the total duration doesn't drift.
+        
+        Args:
+            end_time: time.monotonic() timestamp at which the frame was replaced
+        """
+        if self.span_start is None:
+            return
+        
+        elapsed = (end_time - self.span_start) * 1000 + self.delay_carry
+        delay = max(GIF_DELAY_UNIT, round(elapsed / GIF_DELAY_UNIT) * GIF_DELAY_UNIT)
+        self.delay_carry = elapsed - delay
+        self.span_start = None
+        
+        self.frame_storage.update_last_frame_delay(delay)
+    
+    def _sample_cursor(self):
+        """Cursor position and shape for the next frame, or None when not drawn"""
+        if self.capture_cursor and self.cursor_capture:
+            return self.cursor_capture.get_cursor()
+        return None
+    
+    def _grab_screen(self, grabber, cursor=None):
+        """
+        Grab the current screen region from the capture source
+        
+        The frame stays in the source's native layout and is only converted
+        to PIL when a consumer asks for it (see frame_storage.frame_to_image).
+        
+        Args:
+            grabber: Per-thread grabber from _open_grabber()
+            cursor: Cursor sampled for this frame (see X11CursorCapture.get_cursor),
+                    drawn into the frame when cursor capture is enabled
+        """
+        try:
+            frame = grabber.grab(self.capture_region)
+        except Exception as e:
+            print(f"Error capturing screen: {e}")
+            import traceback
+            traceback.print_exc()
+            return None
+        
+        if (frame is not None and self.source.composite_cursor and self.capture_cursor
+                and self.cursor_compositor and cursor):
+            # Real cursor shape when XFixes provides it, prepared once per serial
+            if cursor["image"] is not None:
+                self.cursor_compositor.set_sprite(cursor["image"], cursor["hotspot"],
+                                                  premultiplied=True, key=cursor["serial"])
+            else:
+                self.cursor_compositor.set_sprite(self.default_cursor, key="default")
+            
+            # Draw the cursor straight into the frame buffer
+            origin = (self.capture_region['left'], self.capture_region['top'])
+            self.cursor_compositor.composite(frame, cursor["position"], origin)
+        
+        if frame is not None and self.output_scale < 1.0:
+            # Shrink before diffing and storage, so every later stage handles fewer pixels
+            scaled = scale_frame(frame, self.output_scale, self.buffer_pool)
+            self.buffer_pool.release(frame)
+            frame = scaled
+        
+        return frame
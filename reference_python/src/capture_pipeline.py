@@ -0,0 +1,158 @@
+"""
+Capture Pipeline - Bounded queues and worker threads between the capture stages
+"""
+
+import queue
+import threading
+import time
+
+# What a stage does with a new item when its input queue is full
+BLOCK = "block"              # Wait for room, slowing the upstream stage down
+DROP_NEWEST = "drop_newest"  # Discard the new item
+MERGE = "merge"              # Fold the new item into the last queued one
+
+QUEUE_POLICIES = (BLOCK, DROP_NEWEST, MERGE)
+
+_STOP = object()
+
+
+class CapturedFrame:
+    """A grabbed frame travelling through the pipeline"""
+
+    __slots__ = ("array", "timestamp", "cursor_pos", "cursor_shape", "change")
+
+    def __init__(self, array, timestamp, cursor_pos=None, cursor_shape=None):
+        self.array = array            # uint8 frame, BGRA (X11) or RGB (Wayland), owned by the frame
+        self.timestamp = timestamp    # time.monotonic() at grab time
+        self.cursor_pos = cursor_pos  # Global cursor position sampled for this frame
+        self.cursor_shape = cursor_shape  # XFixes cursor serial, None if unknown
+        self.change = None            # FrameChange against the previous stored frame
+
+
+class PipelineStage:
+    """
+    One worker thread consuming a bounded queue
+
+    Items are handed to *handler* in order. When the queue is full, put()
+    applies the stage's policy: BLOCK waits, DROP_NEWEST discards the new item
+    and MERGE replaces the last queued item with merge(queued, new), so the
+    newest content is kept while the replaced item's time goes to the frame
+    before it.
+    """
+
+    def __init__(self, name, handler, maxsize=4, policy=BLOCK, merge=None, on_cost=None):
+        if policy not in QUEUE_POLICIES:
+            raise ValueError(f"Unknown queue policy: {policy}")
+
+        self.name = name
+        self.handler = handler
+        self.policy = policy
+        self.merge = merge or (lambda queued, new: new)
+        self.on_cost = on_cost  # Optional callback(stage name, seconds spent on an item)
+        self.queue = queue.Queue(maxsize)
+        self.thread = None
+
+        # Counters (read from other threads, only written by put() and the worker)
+        self.processed = 0
+        self.dropped = 0
+        self.merged = 0
+        self.high_water = 0
+
+    def start(self):
+        """Start the worker thread"""
+        self.thread = threading.Thread(target=self._run, name=f"gifcap-{self.name}", daemon=True)
+        self.thread.start()
+
+    def put(self, item):
+        """
+        Queue an item for the worker
+
+        Returns:
+            bool: True if the item's content will reach the handler
+                  (queued or merged), False if it was dropped
+        """
+        if self.policy == BLOCK:
+            self.queue.put(item)
+        else:
+            try:
+                self.queue.put_nowait(item)
+            except queue.Full:
+                if self.policy == DROP_NEWEST or not self._merge_into_tail(item):
+                    self.dropped += 1
+                    return False
+                self.merged += 1
+
+        self.high_water = max(self.high_water, self.queue.qsize())
+        return True
+
+    def _merge_into_tail(self, item):
+        """Replace the last queued item with its merge with the new one"""
+        with self.queue.mutex:
+            if not self.queue.queue or self.queue.queue[-1] is _STOP:
+                return False
+            self.queue.queue[-1] = self.merge(self.queue.queue[-1], item)
+        return True
+
+    def stop(self):
+        """Process everything already queued, then stop the worker"""
+        if self.thread:
+            self.queue.put(_STOP)
+            self.thread.join()
+            self.thread = None
+
+    def stats(self):
+        """Queue depth and counters for display"""
+        return {
+            "depth": self.queue.qsize(),
+            "capacity": self.queue.maxsize,
+            "high_water": self.high_water,
+            "processed": self.processed,
+            "dropped": self.dropped,
+            "merged": self.merged,
+        }
+
+    def _run(self):
+        """Worker loop"""
+        while True:
+            item = self.queue.get()
+            if item is _STOP:
+                break
+            start = time.monotonic()
+            try:
+                self.handler(item)
+            except Exception as e:
+                print(f"Error in {self.name} stage: {e}")
+                import traceback
+                traceback.print_exc()
+            self.processed += 1
+            if self.on_cost:
+                self.on_cost(self.name, time.monotonic() - start)
+
+
+class CapturePipeline:
+    """
+    grab -> diff -> store
+
+    The grab stage is the capture thread itself; it feeds the diff stage,
+    which forwards changed frames to the store stage. Each stage has its own
+    worker, so a slow PNG write no longer delays the next grab.
+    """
+
+    def __init__(self, diff_handler, store_handler, policy=MERGE, merge_diff=None, merge_store=None,
+                 diff_queue_size=4, store_queue_size=8, on_cost=None):
+        self.diff = PipelineStage("diff", diff_handler, diff_queue_size, policy, merge_diff, on_cost)
+        self.store = PipelineStage("store", store_handler, store_queue_size, policy, merge_store, on_cost)
+
+    def start(self):
+        """Start the diff and store workers"""
+        self.store.start()
+        self.diff.start()
+
+    def stop(self):
+        """Drain both queues in order and stop the workers"""
+        self.diff.stop()
+        self.store.stop()
+
+    def stats(self):
+        """Per-stage statistics keyed by stage name"""
+        return {"diff": self.diff.stats(), "store": self.store.stats()}
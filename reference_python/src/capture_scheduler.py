@@ -0,0 +1,126 @@
+"""
+Capture Scheduler - Adapt the capture rate to screen activity and machine load
+"""
+
+import threading
+import time
+
+
+class AdaptiveScheduler:
+    """
+    Decide how often the capture thread grabs a frame
+
+    The user's fps is the target. Two things can lower the effective rate:
+
+    - Idle backoff: after IDLE_FRAMES identical frames in a row the rate is
+      halved, again after each further IDLE_FRAMES, down to MIN_IDLE_FPS.
+      The first changed frame snaps back to full rate.
+    - Load shedding: each pipeline stage reports how long a frame took. When
+      the slowest stage (smoothed) needs more than a frame interval, the rate
+      is lowered so it uses about LOAD_HEADROOM of the interval, and raised
+      again as the cost drops.
+
+    Every rate change is logged in rate_changes as (monotonic time, fps, reason).
+    Frame delays come from grab timestamps, so they stay accurate whatever the rate.
+    """
+
+    # Identical frames in a row before each backoff step
+    IDLE_FRAMES = 5
+    # Lowest rate reached while the screen is static
+    MIN_IDLE_FPS = 2.0
+    # Weight of the newest sample in the per-stage cost average
+    COST_SMOOTHING = 0.2
+    # Share of the frame interval the slowest stage may use while shedding load
+    LOAD_HEADROOM = 0.8
+
+    def __init__(self, fps=30, adaptive=True):
+        self.lock = threading.Lock()
+        self.reset(fps, adaptive)
+
+    def reset(self, fps, adaptive=True):
+        """Start over at the target rate (called when a recording starts)"""
+        with self.lock:
+            self.target_fps = float(fps)
+            self.adaptive = adaptive
+            self.idle_fps = None   # Rate limit from idle backoff
+            self.load_fps = None   # Rate limit from load shedding
+            self.identical_run = 0
+            self.costs = {}        # Stage name -> smoothed seconds per frame
+            self.fps = self.target_fps
+            self.reason = "target"
+            self.rate_changes = [(time.monotonic(), self.fps, self.reason)]
+
+    def set_target(self, fps):
+        """Change the target rate (e.g. the FPS field changed while recording)"""
+        with self.lock:
+            self.target_fps = float(fps)
+            self._update("target")
+
+    @property
+    def interval(self):
+        """Seconds until the next grab"""
+        return 1.0 / self.fps
+
+    def frame_unchanged(self):
+        """The diff stage found the frame identical to the previous one"""
+        if not self.adaptive:
+            return
+        with self.lock:
+            self.identical_run += 1
+            if self.identical_run < self.IDLE_FRAMES:
+                return
+            self.identical_run = 0
+            if self.fps > self.MIN_IDLE_FPS:
+                self.idle_fps = max(self.MIN_IDLE_FPS, self.fps / 2)
+                self._update("idle")
+
+    def frame_changed(self):
+        """The diff stage found a change: back to full rate"""
+        with self.lock:
+            self.identical_run = 0
+            if self.idle_fps is not None:
+                self.idle_fps = None
+                self._update("active")
+
+    def record_cost(self, stage, seconds):
+        """A pipeline stage spent *seconds* on one frame"""
+        if not self.adaptive:
+            return
+        with self.lock:
+            previous = self.costs.get(stage)
+            self.costs[stage] = seconds if previous is None else (
+                previous + self.COST_SMOOTHING * (seconds - previous))
+
+            # Stages run in parallel, so the slowest one limits the rate
+            bottleneck = max(self.costs.values())
+            sustainable = self.LOAD_HEADROOM / bottleneck if bottleneck > 0 else self.target_fps
+            if sustainable >= self.target_fps:
+                load_fps = None
+            elif self.load_fps is None and bottleneck <= 1.0 / self.target_fps:
+                # Within budget, if only just - don't start shedding yet
+                load_fps = None
+            else:
+                load_fps = max(1, int(sustainable))
+
+            if load_fps != self.load_fps:
+                self.load_fps = load_fps
+                self._update("load" if load_fps is not None else "recovered")
+
+    def _update(self, reason):
+        """Recompute the effective rate and log it if it changed (lock held)"""
+        fps = min(limit for limit in (self.target_fps, self.idle_fps, self.load_fps) if limit is not None)
+        if fps != self.fps:
+            self.fps = fps
+            self.reason = reason
+            self.rate_changes.append((time.monotonic(), fps, reason))
+
+    def stats(self):
+        """Current rate and why, for display"""
+        with self.lock:
+            return {
+                "fps": self.fps,
+                "target_fps": self.target_fps,
+                "reason": self.reason,
+                "rate_changes": len(self.rate_changes) - 1,
+                "costs_ms": {stage: cost * 1000 for stage, cost in self.costs.items()},
+            }
@@ -0,0 +1,375 @@
+"""
+Capture Sources - Where frames come from: X11 (mss), a Wayland frame stream or a synthetic generator
+"""
+
+import threading
+import time
+import mss
+import numpy as np
+from wayland_capture import WaylandStreamCapture
+
+
+class CaptureSource:
+    """
+    A source of screen frames for CaptureCore
+
+    The core opens one grabber per capturing thread (X11 connections can't be
+    shared between threads). A grabber has grab(region), returning the region
+    as a (height, width, 4) BGRA or (height, width, 3) RGB uint8 array or None,
+    and close(). Frames may come from the core's buffer pool; see
+    frame_storage.frame_to_image for how they are converted later.
+    """
+
+    # Name shown in messages, also used as CaptureCore.session_type
+    name = None
+    # The cursor is not part of the frames, so CaptureCore draws it in
+    composite_cursor = False
+    # XDamage can report changes, so "damage" capture mode works
+    supports_damage = False
+    # Keep the GUI thread's grabber open between single frames
+    keep_grabber = True
+
+    def __init__(self, buffer_pool=None):
+        """
+        Args:
+            buffer_pool: FrameBufferPool for frame buffers (CaptureCore sets its
+                         own if none is given)
+        """
+        self.buffer_pool = buffer_pool
+
+    def probe(self):
+        """
+        Check that frames can be captured
+
+        Returns:
+            str: Why the source can't be used, or None if it can
+        """
+        return None
+
+    def open_grabber(self):
+        """Open a grabber for the calling thread"""
+        raise NotImplementedError
+
+    def _acquire(self, shape):
+        """Frame buffer from the pool, or a fresh array without one"""
+        if self.buffer_pool is not None:
+            return self.buffer_pool.acquire(shape)
+        return np.empty(shape, dtype=np.uint8)
+
+
+class X11Source(CaptureSource):
+    """X11 / XWayland capture through mss, with XShm when the server supports it"""
+
+    name = "x11"
+    composite_cursor = True
+    supports_damage = True
+
+    def __init__(self, buffer_pool=None, with_shm=True):
+        super().__init__(buffer_pool)
+        self.with_shm = with_shm
+
+    def probe(self):
+        # X connections are per thread: just check one can be opened
+        try:
+            mss.mss(with_shm=self.with_shm).close()
+        except Exception as e:
+            return str(e)
+        return None
+
+    def open_grabber(self):
+        return X11Grabber(self, mss.mss(with_shm=self.with_shm))
+
+
+class X11Grabber:
+    """Per-thread mss connection of an X11Source"""
+
+    def __init__(self, source, sct):
+        self.source = source
+        self.sct = sct
+
+    def grab(self, region):
+        """Grab a region as a BGRA array"""
+        screenshot = self.sct.grab(region)
+
+        # BGRA view on the grab, no copy. An XShm segment is overwritten by the
+        # next grab, so only that buffer has to be copied out.
+        frame = np.asarray(screenshot)
+        if not isinstance(screenshot.raw, bytearray):
+            pooled = self.source._acquire(frame.shape)
+            np.copyto(pooled, frame)
+            frame = pooled
+        return frame
+
+    def close(self):
+        self.sct.close()
+
+
+class WaylandSource(CaptureSource):
+    """Wayland capture from a frame producer process (see WaylandStreamCapture)"""
+
+    name = "wayland"
+    # The producer stream shouldn't keep running between single frames
+    keep_grabber = False
+
+    def probe(self):
+        if not WaylandStreamCapture.is_available():
+            return "no Wayland frame producer (install wf-recorder or grim, or set GIFCAP_WAYLAND_PRODUCER)"
+        return None
+
+    def open_grabber(self):
+        return WaylandGrabber(WaylandStreamCapture())
+
+
+class WaylandGrabber:
+    """Per-thread frame stream of a WaylandSource"""
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def grab(self, region):
+        """Newest streamed frame of a region as an RGB array"""
+        # The compositor draws the cursor into Wayland frames itself
+        return self.stream.grab_frame_array(region['left'], region['top'], region['width'], region['height'])
+
+    def close(self):
+        self.stream.stop()
+
+
+# Scenes understood by SyntheticSource
+SYNTHETIC_SCENES = ("typing", "scroll", "video", "static")
+
+# (scene, seconds) pairs, played in order and then repeated
+DEFAULT_SCRIPT = (("typing", 3.0), ("static", 2.0), ("scroll", 3.0), ("video", 2.0))
+
+
+class SyntheticSource(CaptureSource):
+    """
+    Scripted, deterministic screen content without a display
+
+    The screen is a page of "text" (ink blocks shaped like words) and the
+    script decides what happens to it:
+
+    - typing: the page is typed out character by character behind a blinking caret
+    - scroll: the page scrolls up at a steady speed
+    - video: a noise rectangle over the middle half, new noise every frame
+    - static: the page doesn't change
+
+    By default the content clock advances one frame (1/fps seconds) per grab,
+    so the same grabs always return the same frames, whatever the capture rate
+    or machine load. With realtime=True it follows the wall clock instead,
+    like a real screen.
+    """
+
+    name = "synthetic"
+    composite_cursor = False
+
+    LINE_HEIGHT = 20
+    GLYPH_HEIGHT = 12
+    CHAR_WIDTH = 8
+    CHARS_PER_SECOND = 15
+    SCROLL_SPEED = 120  # pixels per second
+    BACKGROUND = (250, 250, 250, 255)  # BGRA
+    INK = (60, 40, 30, 255)
+
+    def __init__(self, width=1280, height=720, fps=30, script=DEFAULT_SCRIPT, seed=0,
+                 realtime=False, buffer_pool=None):
+        """
+        Args:
+            width, height: Size of the synthetic screen; grabs are cropped from it
+            fps: Content frame rate (noise changes and frame-clock steps)
+            script: Sequence of (scene, seconds), see SYNTHETIC_SCENES
+            seed: Seed for the page layout and the noise
+            realtime: Follow the wall clock instead of advancing per grab
+            buffer_pool: FrameBufferPool for the returned frames
+        """
+        super().__init__(buffer_pool)
+        for scene, seconds in script:
+            if scene not in SYNTHETIC_SCENES:
+                raise ValueError(f"Unknown synthetic scene {scene!r}, expected one of {SYNTHETIC_SCENES}")
+            if seconds <= 0:
+                raise ValueError("Synthetic scene durations must be positive")
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.script = tuple(script)
+        self.seed = seed
+        self.realtime = realtime
+
+        self.lock = threading.Lock()
+        self.frames_generated = 0
+        self.start_time = None
+        self.page = self._build_page()
+        self.noise = None
+        # Whole pixels as 32-bit words: filling with a scalar is much faster
+        # than broadcasting a 4-byte colour
+        self.background_word = np.array(self.BACKGROUND, dtype=np.uint8).view(np.uint32)[0]
+        self.ink_word = np.array(self.INK, dtype=np.uint8).view(np.uint32)[0]
+
+    def open_grabber(self):
+        return SyntheticGrabber(self)
+
+    def reset(self):
+        """Restart the script from the beginning"""
+        with self.lock:
+            self.frames_generated = 0
+            self.start_time = None
+
+    def _next_time(self):
+        """Content time of the next frame in seconds"""
+        with self.lock:
+            if self.realtime:
+                now = time.monotonic()
+                if self.start_time is None:
+                    self.start_time = now
+                content_time = now - self.start_time
+            else:
+                content_time = self.frames_generated / self.fps
+            self.frames_generated += 1
+            return content_time
+
+    def scene_at(self, content_time):
+        """
+        Scene playing at a content time
+
+        Returns:
+            tuple: (scene, seconds since the scene started)
+        """
+        total = sum(seconds for _, seconds in self.script)
+        offset = content_time % total
+        for scene, seconds in self.script:
+            if offset < seconds:
+                return scene, offset
+            offset -= seconds
+        return self.script[-1][0], self.script[-1][1]
+
+    def _build_page(self):
+        """Two screens of text lines: enough to scroll through"""
+        lines = max(1, (2 * self.height) // self.LINE_HEIGHT)
+        page = np.empty((lines * self.LINE_HEIGHT, self.width, 4), dtype=np.uint8)
+        page[:] = self.BACKGROUND
+
+        rng = np.random.default_rng(self.seed)
+        columns = max(1, self.width // self.CHAR_WIDTH - 2)
+        top = (self.LINE_HEIGHT - self.GLYPH_HEIGHT) // 2
+        for line in range(lines):
+            y = line * self.LINE_HEIGHT + top
+            column = 1
+            end = int(columns * rng.uniform(0.3, 1.0))
+            while column < end:
+                word = int(rng.integers(2, 10))
+                word = min(word, end - column)
+                x = column * self.CHAR_WIDTH
+                page[y:y + self.GLYPH_HEIGHT, x:x + word * self.CHAR_WIDTH - 1] = self.INK
+                column += word + 1
+        return page
+
+    def _noise_block(self, width, height):
+        """Precomputed noise twice the height of the video rectangle, made once"""
+        if self.noise is None or self.noise.shape[1] != width:
+            rng = np.random.default_rng(self.seed)
+            self.noise = rng.integers(0, 256, (2 * height, width, 3), dtype=np.uint8)
+        return self.noise
+
+    @staticmethod
+    def _clip(window, left, top, right, bottom):
+        """
+        Overlap of a screen rectangle with the rendered window
+
+        Returns:
+            tuple: (output slices, offset of the overlap inside the rectangle), or None
+        """
+        x0, y0, x1, y1 = window
+        left_, top_ = max(left, x0), max(top, y0)
+        right_, bottom_ = min(right, x1), min(bottom, y1)
+        if right_ <= left_ or bottom_ <= top_:
+            return None
+        target = (slice(top_ - y0, bottom_ - y0), slice(left_ - x0, right_ - x0))
+        return target, (left_ - left, top_ - top)
+
+    def render(self, content_time, window=None, out=None):
+        """
+        Synthetic screen at a content time
+
+        Args:
+            content_time: Seconds since the start of the script
+            window: (left, top, right, bottom) part of the screen to render
+                    (default: all of it); must lie within the screen
+            out: Optional uint8 array of the window's size to draw into
+
+        Returns:
+            (height, width, 4) BGRA array of the window
+        """
+        window = window or (0, 0, self.width, self.height)
+        x0, y0, x1, y1 = window
+        if out is None:
+            out = np.empty((y1 - y0, x1 - x0, 4), dtype=np.uint8)
+        scene, scene_time = self.scene_at(content_time)
+
+        if scene == "scroll":
+            offset = (int(scene_time * self.SCROLL_SPEED) + y0) % len(self.page)
+            first = min(y1 - y0, len(self.page) - offset)
+            out[:first] = self.page[offset:offset + first, x0:x1]
+            out[first:] = self.page[:y1 - y0 - first, x0:x1]
+        else:
+            # typing, video and static all start from the top of the page
+            out[:] = self.page[y0:y1, x0:x1]
+
+        if scene == "typing":
+            words = out.view(np.uint32)
+            columns = max(1, self.width // self.CHAR_WIDTH)
+            lines = max(1, self.height // self.LINE_HEIGHT)
+            typed = int(scene_time * self.CHARS_PER_SECOND) % (columns * lines)
+            line, column = divmod(typed, columns)
+            y = line * self.LINE_HEIGHT
+            x = column * self.CHAR_WIDTH
+            # Blank out what hasn't been typed yet
+            blanks = [(x, y, self.width, y + self.LINE_HEIGHT), (0, y + self.LINE_HEIGHT, self.width, self.height)]
+            for rectangle in blanks:
+                clipped = self._clip(window, *rectangle)
+                if clipped:
+                    words[clipped[0]] = self.background_word
+            # Caret blinks twice a second
+            if int(scene_time * 2) % 2 == 0:
+                clipped = self._clip(window, x, y + 2, x + 2, y + self.LINE_HEIGHT - 2)
+                if clipped:
+                    words[clipped[0]] = self.ink_word
+
+        elif scene == "video":
+            left, top = self.width // 4, self.height // 4
+            width, height = self.width // 2, self.height // 2
+            clipped = self._clip(window, left, top, left + width, top + height)
+            if clipped:
+                (rows, cols), (dx, dy) = clipped
+                # A different slice of the noise block every frame
+                noise = self._noise_block(width, height)
+                start = (int(content_time * self.fps) * 7919) % height + dy
+                out[rows, cols, :3] = noise[start:start + rows.stop - rows.start, dx:dx + cols.stop - cols.start]
+                out[rows, cols, 3] = 255
+        return out
+
+
+class SyntheticGrabber:
+    """Grabber of a SyntheticSource: renders the next frame of a region"""
+
+    def __init__(self, source):
+        self.source = source
+
+    def grab(self, region):
+        """Next scripted frame of a region as a BGRA array"""
+        source = self.source
+        content_time = source._next_time()
+
+        width, height = region['width'], region['height']
+        frame = source._acquire((height, width, 4))
+        left, top = region['left'], region['top']
+        # Part of the region on the synthetic screen; the rest is black
+        x0, y0 = max(0, left), max(0, top)
+        x1, y1 = min(source.width, left + width), min(source.height, top + height)
+        if x1 - x0 < width or y1 - y0 < height:
+            frame[:] = 0
+        if x1 > x0 and y1 > y0:
+            source.render(content_time, (x0, y0, x1, y1), frame[y0 - top:y1 - top, x0 - left:x1 - left])
+        return frame
+
+    def close(self):
+        pass
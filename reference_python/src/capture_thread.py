@@ -0,0 +1,52 @@
+"""
+Capture Thread - Run the capture loop off the GUI thread on a monotonic schedule
+"""
+
+import threading
+import time
+
+
+class CaptureThread(threading.Thread):
+    """
+    Worker thread that calls the engine's capture step once per frame interval.
+
+    Ticks are scheduled against absolute deadlines on the monotonic clock, so a
+    slow tick is made up by running the next one immediately instead of pushing
+    every following tick back. If the loop falls too far behind, the missed ticks
+    are skipped and handed to the engine so their time is not lost.
+    """
+
+    # How many frames late the loop may be before it stops catching up
+    MAX_CATCHUP_FRAMES = 3
+
+    def __init__(self, engine):
+        super().__init__(name="gifcap-capture", daemon=True)
+        self.engine = engine
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        """Ask the loop to exit and wait for the thread to finish"""
+        self._stop_event.set()
+        self.join()
+
+    def run(self):
+        """Capture loop"""
+        # X11 connections are per thread, so the grabber is opened here
+        grabber = self.engine._open_grabber()
+        try:
+            next_deadline = time.monotonic()
+            while not self._stop_event.is_set():
+                interval = self.engine.scheduler.interval
+                self.engine._capture_frame(grabber)
+
+                next_deadline += interval
+                lag = time.monotonic() - next_deadline
+                if lag > interval * self.MAX_CATCHUP_FRAMES:
+                    # Too far behind - skip the missed ticks rather than bursting
+                    skipped = int(lag / interval)
+                    next_deadline += skipped * interval
+                    self.engine._skip_frames(skipped)
+
+                self._stop_event.wait(max(0.0, next_deadline - time.monotonic()))
+        finally:
+            self.engine._close_grabber(grabber)
@@ -0,0 +1,240 @@
+"""
+Change Detection - Locate what changed between two captured frames
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+# Side of the square tiles the change map is made of (pixels)
+TILE_SIZE = 32
+
+# Sparse signature: every Nth row and column is compared first
+SIGNATURE_STEP = 8
+
+# Rows compared at a time while looking for the first difference
+BAND_ROWS = 64
+
+# Regions with more pixels than this are mapped by several worker threads
+PARALLEL_MIN_PIXELS = 1920 * 1080
+
+
+class FrameChange:
+    """
+    Where a frame differs from the one captured before it
+
+    Attributes:
+        tiles: 2D bool array, True for each tile_size x tile_size tile that changed
+        tile_size: Tile side in pixels (edge tiles may be smaller)
+        similarity: Fraction of identical channel values (1.0 means identical)
+        bbox: (left, top, right, bottom) pixel box around the changed tiles, or None
+    """
+
+    def __init__(self, tiles, tile_size, similarity, frame_size):
+        self.tiles = tiles
+        self.tile_size = tile_size
+        self.similarity = similarity
+        self.frame_size = frame_size
+        self.bbox = self._bounding_box(frame_size)
+
+    def _bounding_box(self, frame_size):
+        """Pixel bounding box of the changed tiles, clipped to the frame"""
+        rows = np.flatnonzero(self.tiles.any(axis=1))
+        if rows.size == 0:
+            return None
+        cols = np.flatnonzero(self.tiles.any(axis=0))
+
+        width, height = frame_size
+        size = self.tile_size
+        return (int(cols[0]) * size, int(rows[0]) * size,
+                min(width, (int(cols[-1]) + 1) * size), min(height, (int(rows[-1]) + 1) * size))
+
+    @property
+    def changed_tiles(self):
+        """Number of tiles that changed"""
+        return int(np.count_nonzero(self.tiles))
+
+
+def merge_changes(first, second):
+    """
+    Combine the changes of two consecutive frames into the change of the pair
+
+    Returns:
+        FrameChange covering both, or None if either is unknown
+    """
+    if first is None or second is None or first.tiles.shape != second.tiles.shape:
+        return None
+    return FrameChange(first.tiles | second.tiles, first.tile_size,
+                       min(first.similarity, second.similarity), second.frame_size)
+
+
+def _as_rows(frame):
+    """View a (height, width, channels) uint8 frame as (height, width * channels) bytes"""
+    return frame.reshape(frame.shape[0], -1)
+
+
+def _compared_values(frame):
+    """
+    Number of channel values the similarity is computed over
+
+    Only colour channels count, like the original RGB comparison. The padding
+    byte of BGRX captures is constant, so it never adds differences.
+    """
+    height, width = frame.shape[:2]
+    channels = frame.shape[2] if frame.ndim == 3 else 1
+    return height * width * min(channels, 3)
+
+
+def _map_band(previous, current, tile_size, channels):
+    """
+    Tile map and number of differing values for a band of whole tile rows
+
+    Works on the flattened rows so no per-channel reduction is needed:
+    a tile is tile_size rows by tile_size * channels bytes.
+    """
+    diff = _as_rows(previous) != _as_rows(current)
+    count = int(np.count_nonzero(diff))
+
+    height = diff.shape[0]
+    full = height - height % tile_size
+    rows = [diff[:full].reshape(full // tile_size, tile_size, -1).any(axis=1)] if full else []
+    if full < height:
+        rows.append(diff[full:].any(axis=0, keepdims=True))
+    rows = np.concatenate(rows) if len(rows) > 1 else rows[0]
+
+    tiles = np.logical_or.reduceat(rows, np.arange(0, rows.shape[1], tile_size * channels), axis=1)
+    return tiles, count
+
+
+def compute_change_map(previous, current, tile_size=TILE_SIZE, executor=None, bands=1):
+    """
+    Compare two frames and build their per-tile change map
+
+    Args:
+        previous, current: uint8 arrays of shape (height, width, channels)
+        tile_size: Tile side in pixels
+        executor: Optional executor used to map horizontal bands in parallel
+        bands: Number of bands to split the frame into when an executor is given
+
+    Returns:
+        FrameChange, or None if the frames don't have the same shape
+    """
+    if previous.shape != current.shape:
+        return None
+
+    height, width = current.shape[:2]
+    channels = current.shape[2] if current.ndim == 3 else 1
+
+    if executor is None or bands < 2:
+        results = [_map_band(previous, current, tile_size, channels)]
+    else:
+        # Bands are whole tile rows, so the partial results simply stack
+        tile_rows = -(-height // tile_size)
+        band = -(-tile_rows // bands) * tile_size
+        results = list(executor.map(
+            lambda top: _map_band(previous[top:top + band], current[top:top + band], tile_size, channels),
+            range(0, height, band)))
+
+    tiles = np.concatenate([tiles for tiles, _ in results]) if len(results) > 1 else results[0][0]
+    differing = sum(count for _, count in results)
+    similarity = 1.0 - min(1.0, differing / _compared_values(current))
+
+    return FrameChange(tiles, tile_size, similarity, (width, height))
+
+
+class ChangeDetector:
+    """
+    Fast, early-exit frame comparison for the capture loop
+
+    Identical frames are the common case while recording, so is_changed() is
+    built to reject them cheaply and to stop at the first proof of a change:
+
+    1. A sparse signature (every SIGNATURE_STEP-th row and column) is compared;
+       in exact mode any difference there settles it.
+    2. Bands of BAND_ROWS rows are compared as 64-bit words, stopping at the
+       first band that differs (exact mode) or once the differences exceed the
+       threshold's budget (similarity mode).
+
+    The full tile map is only built for frames that really changed, split
+    across worker threads for large regions. Frames are compared as uint8
+    arrays directly (BGRA captures or RGB images), without widening casts.
+    """
+
+    def __init__(self, threshold=1.0, tile_size=TILE_SIZE, workers=None):
+        """
+        Args:
+            threshold: Similarity at or above which frames count as identical.
+                1.0 requires identical pixels, 0.99 matches the original comparison.
+            tile_size: Tile side of the change map in pixels
+            workers: Threads used to map large regions (default: CPU count)
+        """
+        self.threshold = threshold
+        self.tile_size = tile_size
+        self.workers = workers or os.cpu_count() or 1
+        self._executor = None
+
+    def is_changed(self, previous, current):
+        """Return True if current differs from previous by more than the threshold allows"""
+        if previous.shape != current.shape:
+            return True
+
+        exact = self.threshold >= 1.0
+        if exact and not np.array_equal(previous[::SIGNATURE_STEP, ::SIGNATURE_STEP],
+                                        current[::SIGNATURE_STEP, ::SIGNATURE_STEP]):
+            return True
+
+        budget = (1.0 - self.threshold) * _compared_values(current)
+        differing = 0
+        prev_rows = self._as_words(previous)
+        curr_rows = self._as_words(current)
+        for top in range(0, current.shape[0], BAND_ROWS):
+            prev_band = prev_rows[top:top + BAND_ROWS]
+            curr_band = curr_rows[top:top + BAND_ROWS]
+            if np.array_equal(prev_band, curr_band):
+                continue
+            if exact:
+                return True
+            differing += np.count_nonzero(_as_rows(previous[top:top + BAND_ROWS]) !=
+                                          _as_rows(current[top:top + BAND_ROWS]))
+            if differing > budget:
+                return True
+        return False
+
+    def compare(self, previous, current):
+        """
+        Compare two frames
+
+        Returns:
+            FrameChange if the frames differ, None if they count as identical.
+            Frames of different sizes differ everywhere: every tile is marked.
+        """
+        if previous.shape != current.shape:
+            height, width = current.shape[:2]
+            size = self.tile_size
+            tiles = np.ones((-(-height // size), -(-width // size)), dtype=bool)
+            return FrameChange(tiles, size, 0.0, (width, height))
+        if not self.is_changed(previous, current):
+            return None
+        return compute_change_map(previous, current, self.tile_size, self._executor_for(current), self.workers)
+
+    def close(self):
+        """Stop the worker threads"""
+        if self._executor:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def _executor_for(self, frame):
+        """Thread pool for regions big enough to be worth splitting"""
+        if self.workers < 2 or frame.shape[0] * frame.shape[1] < PARALLEL_MIN_PIXELS:
+            return None
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="gifcap-diff")
+        return self._executor
+
+    @staticmethod
+    def _as_words(frame):
+        """View rows as 64-bit words when the row size allows it, fewer elements to compare"""
+        rows = _as_rows(frame)
+        if rows.shape[1] % 8 == 0 and rows.flags.c_contiguous:
+            return rows.view(np.uint64)
+        return rows
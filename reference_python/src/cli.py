@@ -0,0 +1,146 @@
+"""
+GifCap CLI - Record GIFs from scripts and terminals without starting the Qt UI
+
+Usage:
+    gifcap record --region X,Y,W,H [--fps N] [--duration S] -o out.gif
+"""
+
+import argparse
+import sys
+from capture_pipeline import QUEUE_POLICIES, MERGE
+
+
+def parse_region(text):
+    """Parse "x,y,width,height" into a tuple of ints"""
+    try:
+        x, y, width, height = (int(value) for value in text.split(","))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected X,Y,WIDTH,HEIGHT, got {text!r}") from None
+    if width <= 0 or height <= 0:
+        raise argparse.ArgumentTypeError("width and height must be positive")
+    return x, y, width, height
+
+
+def parse_scale(text):
+    """Parse an output scale: a number in (0, 1] or a fraction like 1/3"""
+    try:
+        if "/" in text:
+            numerator, denominator = text.split("/")
+            scale = float(numerator) / float(denominator)
+        else:
+            scale = float(text)
+    except (ValueError, ZeroDivisionError):
+        raise argparse.ArgumentTypeError(f"expected a number like 0.5 or 1/3, got {text!r}") from None
+    if not 0 < scale <= 1:
+        raise argparse.ArgumentTypeError("scale must be greater than 0 and at most 1")
+    return scale
+
+
+def build_parser():
+    """Argument parser for the gifcap command line"""
+    parser = argparse.ArgumentParser(prog="gifcap", description="GifCap screen recorder")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    record = commands.add_parser("record", help="Record a screen region to a GIF")
+    record.add_argument("--region", type=parse_region, required=True, metavar="X,Y,W,H",
+                        help="Screen region to record")
+    record.add_argument("--fps", type=int, default=30, help="Frames per second, 1-60 (default: 30)")
+    record.add_argument("--duration", type=float, default=None, metavar="S",
+                        help="Seconds to record (default: until Ctrl+C)")
+    record.add_argument("-o", "--output", required=True, help="Output GIF path")
+    record.add_argument("--storage", choices=("disk", "ram", "arena", "delta", "tiles", "hybrid"), default="disk",
+                        help="Where frames are kept while recording: PNG files, RAM, one "
+                             "memory-mapped arena file, RAM as keyframes plus deltas, RAM as "
+                             "deduplicated tiles, or RAM spilling to disk (default: disk)")
+    record.add_argument("--compress-level", "--png-level", dest="compress_level", type=int,
+                        choices=range(10), default=None, metavar="0-9",
+                        help="Compression of stored frames, 0 fastest to 9 smallest: PNG level in "
+                             "disk and hybrid mode (default: 1), zlib level in arena mode (default: 0, raw) "
+                             "and delta mode (default: 1)")
+    record.add_argument("--memory-budget", type=int, default=1024, metavar="MB",
+                        help="RAM for frames in hybrid storage before older ones go to disk (default: 1024)")
+    record.add_argument("--rss-limit", type=int, default=None, metavar="MB",
+                        help="Process memory above which hybrid storage keeps fewer frames in RAM "
+                             "(default: memory budget + 1024)")
+    record.add_argument("--no-cursor", action="store_true", help="Don't draw the cursor")
+    record.add_argument("--capture-mode", choices=("poll", "damage"), default="poll",
+                        help="Grab every tick, or only after XDamage reports a change")
+    record.add_argument("--queue-policy", choices=QUEUE_POLICIES, default=MERGE,
+                        help="What a full pipeline queue does (default: merge)")
+    record.add_argument("--fixed-rate", action="store_true",
+                        help="Always grab at --fps instead of adapting to activity and load")
+    record.add_argument("--source", choices=("auto", "x11", "wayland", "synthetic"), default="auto",
+                        help="Where frames come from; synthetic generates scripted content "
+                             "without a display (default: auto)")
+    record.add_argument("--scale", type=parse_scale, default=1.0, metavar="SCALE",
+                        help="Record at this size relative to the region, e.g. 0.5 or 1/3 "
+                             "(default: 1, full size)")
+    record.add_argument("--color-mode", choices=("quantize", "256", "grayscale", "monochrome"),
+                        default="quantize", help="GIF colour reduction (default: quantize)")
+    return parser
+
+
+def create_source(name, region, fps):
+    """CaptureSource for --source, or None to detect the session's"""
+    from capture_sources import SyntheticSource, WaylandSource, X11Source
+
+    if name == "x11":
+        return X11Source()
+    if name == "wayland":
+        return WaylandSource()
+    if name == "synthetic":
+        # A screen just big enough for the region, changing in real time
+        x, y, width, height = region
+        return SyntheticSource(max(1, x + width), max(1, y + height), fps=fps, realtime=True)
+    return None
+
+
+def record_command(args):
+    """Run `gifcap record`"""
+    # Imported here so `gifcap --help` stays instant
+    from frame_storage import FrameStorage, describe_stats
+    from recorder import Encoder, Recorder
+
+    try:
+        source = create_source(args.source, args.region, args.fps)
+        storage = FrameStorage(args.storage, compress_level=args.compress_level,
+                               memory_budget=args.memory_budget << 20,
+                               rss_limit=args.rss_limit << 20 if args.rss_limit else None)
+        recorder = Recorder(args.region, fps=args.fps, storage=storage,
+                            capture_cursor=not args.no_cursor, capture_mode=args.capture_mode,
+                            queue_policy=args.queue_policy, adaptive_rate=not args.fixed_rate,
+                            source=source, output_scale=args.scale)
+    except Exception as e:
+        # No display, no capture backend...
+        print(f"Error: Cannot start capture: {e}", file=sys.stderr)
+        return 1
+
+    with recorder:
+        try:
+            frames = recorder.record(args.duration)
+        except KeyboardInterrupt:
+            # record() already stopped the capture and stored the pending frames
+            frames = recorder.frame_count
+
+        if frames == 0:
+            print("Error: No frames captured", file=sys.stderr)
+            return 1
+        print(describe_stats(recorder.storage.stats()))
+        return 0 if Encoder(recorder.storage, args.color_mode).save(args.output) else 1
+
+
+def main(argv=None):
+    """
+    Command line entry point
+
+    Returns:
+        int: Process exit code
+    """
+    args = build_parser().parse_args(argv)
+    if args.command == "record":
+        return record_command(args)
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,35 +2,198 @@
 X11 Cursor Capture - Get cursor image and position for compositing
 """
 
-from PyQt6.QtGui import QCursor
+import sys
+import threading
+from ctypes import POINTER, byref, c_char_p, c_int, c_uint, c_ulong, c_void_p, cdll
+from ctypes.util import find_library
 from PIL import Image, ImageDraw
+import numpy as np
+from mss.linux import XFixesCursorImage
+from mss.tools import blend_premultiplied
+
+# Sprites kept per cursor serial; themes only have a few dozen shapes
+MAX_CACHED_SPRITES = 64
 
 
 class X11CursorCapture:
-    """Capture cursor information for compositing (works on all platforms via Qt)"""
+    """
+    Capture cursor information for compositing
+    
+    The real cursor shape is read through XFixes on its own X connection.
+    XFixes numbers every cursor shape with a serial, so each shape is converted
+    to an RGBA sprite once and later frames reuse the cached sprite. Without
+    XFixes the position comes from XQueryPointer on the same connection (or,
+    without X, from Qt on the GUI thread) and the default arrow is drawn.
+    """
     
     def __init__(self):
-        self.available = True  # Always available via Qt
+        self.available = True  # Position is always available via Qt
+        self.xlib = None
+        self.xfixes = None
+        self.display = None
+        self.xfixes_available = None  # Unknown until the first cursor read
+        self.root = None
+        self.sprites = {}  # cursor serial -> (RGBA array, hotspot)
+        self.conversions = 0
+        # The capture thread and the GUI thread (single frames) share the connection
+        self.lock = threading.Lock()
     
     def get_cursor_position(self):
         """
         Get cursor position using Qt (cross-platform, no dependencies)
-        Returns (x, y) tuple
+        Returns (x, y) tuple, or None without a running Qt application or
+        when called off the GUI thread (Qt isn't thread safe)
         """
+        if threading.current_thread() is not threading.main_thread():
+            return None
         try:
-            pos = QCursor.pos()
+            # Only ask Qt if the application already loaded it, so headless
+            # recordings never import PyQt
+            qt_gui = sys.modules.get("PyQt6.QtGui")
+            if qt_gui is None or qt_gui.QGuiApplication.instance() is None:
+                return None
+            pos = qt_gui.QCursor.pos()
             return (pos.x(), pos.y())
         except Exception as e:
             print(f"Error getting cursor position: {e}")
             return None
     
+    def get_cursor(self):
+        """
+        Get the cursor position and shape in one X round trip
+        
+        Returns:
+            dict with position (x, y), serial, image (premultiplied RGBA uint8
+            array, shared with the cache - don't modify it) and hotspot (x, y).
+            Without XFixes, serial and image are None. None if the position
+            can't be read at all.
+        """
+        with self.lock:
+            if self.xfixes_available is None:
+                self.xfixes_available = self._open_xfixes()
+            if self.xfixes_available:
+                cursor = self._read_cursor()
+                if cursor:
+                    return cursor
+            position = self._query_pointer() if self.display else None
+        
+        if position is None:
+            position = self.get_cursor_position()
+        if position is None:
+            return None
+        return {"position": position, "serial": None, "image": None, "hotspot": (0, 0)}
+    
     def get_cursor_image(self):
         """
         Get the current cursor image
-        For now, returns None and we use default cursor
-        Future: Could extract themed cursor via platform-specific APIs
+        
+        Returns:
+            (RGBA PIL Image, hotspot) tuple, or None if XFixes is not available
+        """
+        cursor = self.get_cursor()
+        if not cursor or cursor["image"] is None:
+            return None
+        image = Image.fromarray(cursor["image"], "RGBa").convert("RGBA")
+        return image, cursor["hotspot"]
+    
+    def _open_xfixes(self):
+        """
+        Load Xlib and open our own display connection, then libXfixes
+
+        Returns:
+            bool: True if XFixes can be used. Without it the connection stays
+            open (if there is one) for XQueryPointer.
+        """
+        try:
+            x11 = find_library("X11")
+            if not x11:
+                return False
+            self.xlib = cdll.LoadLibrary(x11)
+            self.xlib.XOpenDisplay.argtypes = [c_char_p]
+            self.xlib.XOpenDisplay.restype = c_void_p
+            self.xlib.XCloseDisplay.argtypes = [c_void_p]
+            self.xlib.XFree.argtypes = [c_void_p]
+            self.xlib.XDefaultRootWindow.argtypes = [c_void_p]
+            self.xlib.XDefaultRootWindow.restype = c_ulong
+            self.xlib.XQueryPointer.argtypes = [c_void_p, c_ulong, POINTER(c_ulong), POINTER(c_ulong),
+                                                POINTER(c_int), POINTER(c_int), POINTER(c_int),
+                                                POINTER(c_int), POINTER(c_uint)]
+            self.xlib.XQueryPointer.restype = c_int
+            
+            self.display = self.xlib.XOpenDisplay(None)
+            if not self.display:
+                return False
+            self.root = self.xlib.XDefaultRootWindow(self.display)
+            
+            xfixes = find_library("Xfixes")
+            if not xfixes:
+                return False
+            self.xfixes = cdll.LoadLibrary(xfixes)
+            self.xfixes.XFixesQueryExtension.argtypes = [c_void_p, POINTER(c_int), POINTER(c_int)]
+            self.xfixes.XFixesGetCursorImage.argtypes = [c_void_p]
+            self.xfixes.XFixesGetCursorImage.restype = POINTER(XFixesCursorImage)
+            
+            event_base = c_int()
+            error_base = c_int()
+            if not self.xfixes.XFixesQueryExtension(self.display, event_base, error_base):
+                return False
+        except Exception as e:
+            print(f"XFixes cursor capture not available: {e}")
+            self.close()
+            return False
+        
+        return True
+    
+    def _query_pointer(self):
+        """Cursor position from XQueryPointer, for any thread (lock held)"""
+        root, child = c_ulong(), c_ulong()
+        root_x, root_y, win_x, win_y = c_int(), c_int(), c_int(), c_int()
+        mask = c_uint()
+        if not self.xlib.XQueryPointer(self.display, self.root, byref(root), byref(child),
+                                       byref(root_x), byref(root_y), byref(win_x), byref(win_y),
+                                       byref(mask)):
+            return None  # The pointer is on another screen
+        return (root_x.value, root_y.value)
+    
+    def _read_cursor(self):
+        """Read the cursor from XFixes, converting its image only for unseen serials"""
+        ximage = self.xfixes.XFixesGetCursorImage(self.display)
+        if not ximage:
+            return None
+        try:
+            cursor = ximage.contents
+            serial = cursor.cursor_serial
+            sprite = self.sprites.get(serial)
+            if sprite is None:
+                sprite = self._convert_sprite(cursor)
+                if len(self.sprites) >= MAX_CACHED_SPRITES:
+                    self.sprites.clear()
+                self.sprites[serial] = sprite
+            image, hotspot = sprite
+            return {"position": (cursor.x, cursor.y), "serial": serial, "image": image, "hotspot": hotspot}
+        finally:
+            self.xlib.XFree(ximage)
+    
+    def _convert_sprite(self, cursor):
+        """
+        Convert XFixes cursor pixels to a premultiplied RGBA array
+        
+        Pixels are premultiplied ARGB in the low 32 bits of C longs.
         """
-        return None
+        self.conversions += 1
+        width, height = cursor.width, cursor.height
+        argb = np.ctypeslib.as_array(cursor.pixels, shape=(height * width,)).astype(np.uint32)
+        bgra = argb.view(np.uint8).reshape(height, width, 4)  # little-endian ARGB
+        rgba = np.ascontiguousarray(bgra[..., [2, 1, 0, 3]])
+        return rgba, (cursor.xhot, cursor.yhot)
+    
+    def close(self):
+        """Close the XFixes display connection"""
+        if self.display:
+            self.xlib.XCloseDisplay(self.display)
+        self.display = None
+        self.root = None
+        self.sprites.clear()
     
     def create_default_cursor(self):
         """Create a simple default cursor image (white arrow with black outline)"""
@@ -50,3 +213,84 @@ class X11CursorCapture:
         
         return cursor
 
+
+class CursorCompositor:
+    """
+    Draw a cursor sprite into raw frame buffers, in place
+
+    The sprite is premultiplied and reordered to the frame's channel order once,
+    in set_sprite(). composite() then only blends the few hundred pixels under
+    the cursor, clipped with array slicing, so its cost doesn't grow with the
+    capture region and no copy of the frame is made.
+    """
+
+    def __init__(self, sprite=None, hotspot=(0, 0), channel_order="BGRA"):
+        """
+        Args:
+            sprite: RGBA PIL image of the cursor (or None to set it later)
+            hotspot: Pixel of the sprite that sits at the cursor position
+            channel_order: Channel order of the frames, "BGRA" for mss or "RGB"
+        """
+        self.channel_order = channel_order
+        self.color = None
+        self.inv_alpha = None
+        self.hotspot = hotspot
+        self.key = None
+        self.prepared = {}  # key -> (color, inv_alpha, hotspot)
+        if sprite is not None:
+            self.set_sprite(sprite, hotspot)
+
+    def set_sprite(self, sprite, hotspot=(0, 0), premultiplied=False, key=None):
+        """
+        Prepare a cursor sprite for blending
+
+        Args:
+            sprite: RGBA PIL image or (height, width, 4) uint8 RGBA array
+            hotspot: Pixel of the sprite that sits at the cursor position
+            premultiplied: True if the colour channels are already multiplied by alpha
+            key: Identifies the sprite (e.g. the XFixes cursor serial); a sprite
+                 already prepared under the same key is reused as is
+        """
+        if key is not None and key == self.key:
+            return
+        if key in self.prepared:
+            self.color, self.inv_alpha, self.hotspot = self.prepared[key]
+            self.key = key
+            return
+
+        if isinstance(sprite, Image.Image):
+            sprite = np.asarray(sprite.convert('RGBA'))
+
+        alpha = sprite[..., 3:].astype(np.uint16)
+        color = sprite[..., :3].astype(np.uint16)
+        if not premultiplied:
+            color = (color * alpha + 127) // 255
+        if self.channel_order.startswith("BGR"):
+            color = color[..., ::-1]
+
+        self.color = np.ascontiguousarray(color)
+        self.inv_alpha = 255 - alpha
+        self.hotspot = hotspot
+        self.key = key
+        if key is not None:
+            if len(self.prepared) >= MAX_CACHED_SPRITES:
+                self.prepared.clear()
+            self.prepared[key] = (self.color, self.inv_alpha, self.hotspot)
+
+    def composite(self, frame, cursor_pos, origin=(0, 0)):
+        """
+        Blend the cursor into a frame
+
+        Args:
+            frame: Writable (height, width, channels) uint8 array
+            cursor_pos: Global (x, y) cursor position sampled for this frame
+            origin: Global position of the frame's top-left pixel
+
+        Returns:
+            bool: True if any part of the cursor was drawn
+        """
+        if self.color is None or cursor_pos is None:
+            return False
+        left = cursor_pos[0] - origin[0] - self.hotspot[0]
+        top = cursor_pos[1] - origin[1] - self.hotspot[1]
+        return blend_premultiplied(frame, self.color, self.inv_alpha, left, top)
@@ -0,0 +1,197 @@
+"""
+Damage Monitor - Track screen changes in the capture region through the XDamage extension
+"""
+
+from ctypes import (POINTER, Structure, Union, byref, c_char_p, c_int, c_long,
+                    c_short, c_ulong, c_ushort, c_void_p, cdll)
+from ctypes.util import find_library
+from threading import current_thread
+# mss's handler records X errors per thread instead of letting Xlib exit the process
+from mss.linux import _ERROR, _error_handler
+
+# XDamageReportLevel: one event per rectangle that grows the damaged region
+XDAMAGE_REPORT_DELTA_RECTANGLES = 1
+XDAMAGE_NOTIFY = 0
+
+
+class XRectangle(Structure):
+    _fields_ = [
+        ("x", c_short),
+        ("y", c_short),
+        ("width", c_ushort),
+        ("height", c_ushort),
+    ]
+
+
+class XDamageNotifyEvent(Structure):
+    """/usr/include/X11/extensions/Xdamage.h"""
+    _fields_ = [
+        ("type", c_int),
+        ("serial", c_ulong),
+        ("send_event", c_int),
+        ("display", c_void_p),
+        ("drawable", c_ulong),
+        ("damage", c_ulong),
+        ("level", c_int),
+        ("more", c_int),
+        ("timestamp", c_ulong),
+        ("area", XRectangle),
+        ("geometry", XRectangle),
+    ]
+
+
+class XEvent(Union):
+    _fields_ = [
+        ("type", c_int),
+        ("xdamage", XDamageNotifyEvent),
+        ("pad", c_long * 24),
+    ]
+
+
+class XDamageMonitor:
+    """
+    Report whether the capture region was drawn to since the last check.
+
+    Uses its own X connection with a damage object on the root window, so it can
+    be polled from the capture thread. start() returns False when XDamage is not
+    usable (no X server, missing library or extension) and the caller should keep
+    polling the screen instead. An X error later on stops the monitor, and poll()
+    then reports every tick as damaged, which is the same as polling.
+    """
+
+    def __init__(self):
+        self.xlib = None
+        self.xdamage = None
+        self.display = None
+        self.damage = None
+        self.event_base = 0
+        self.region = None
+        self.is_available = False
+        self.original_error_handler = None
+
+    def start(self, region):
+        """
+        Open the X connection and start tracking damage
+
+        Args:
+            region: Capture region dict with left/top/width/height
+
+        Returns:
+            bool: True if damage events are available
+        """
+        self.region = region
+        try:
+            self._load_libraries()
+            # Xlib's default handler exits the process on any X error
+            self.original_error_handler = self.xlib.XSetErrorHandler(_error_handler)
+            self.display = self.xlib.XOpenDisplay(None)
+            if not self.display:
+                return False
+
+            event_base = c_int()
+            error_base = c_int()
+            if not self.xdamage.XDamageQueryExtension(self.display, byref(event_base), byref(error_base)):
+                self.stop()
+                return False
+            self.event_base = event_base.value
+
+            root = self.xlib.XDefaultRootWindow(self.display)
+            self.damage = self.xdamage.XDamageCreate(self.display, root, XDAMAGE_REPORT_DELTA_RECTANGLES)
+            self.xlib.XSync(self.display, 0)
+            error = _ERROR.pop(current_thread(), None)
+            if error:
+                raise OSError(error["error"])
+        except Exception as e:
+            print(f"XDamage not available: {e}")
+            self.stop()
+            return False
+
+        self.is_available = True
+        return True
+
+    def _load_libraries(self):
+        """Load Xlib and libXdamage and declare the functions we use"""
+        x11 = find_library("X11")
+        xdamage = find_library("Xdamage")
+        if not x11 or not xdamage:
+            raise OSError("libX11 or libXdamage not found")
+
+        self.xlib = cdll.LoadLibrary(x11)
+        self.xdamage = cdll.LoadLibrary(xdamage)
+
+        self.xlib.XOpenDisplay.argtypes = [c_char_p]
+        self.xlib.XOpenDisplay.restype = c_void_p
+        self.xlib.XCloseDisplay.argtypes = [c_void_p]
+        self.xlib.XDefaultRootWindow.argtypes = [c_void_p]
+        self.xlib.XDefaultRootWindow.restype = c_ulong
+        self.xlib.XPending.argtypes = [c_void_p]
+        self.xlib.XNextEvent.argtypes = [c_void_p, POINTER(XEvent)]
+        self.xlib.XSync.argtypes = [c_void_p, c_int]
+        self.xlib.XSetErrorHandler.argtypes = [c_void_p]
+        self.xlib.XSetErrorHandler.restype = c_void_p
+
+        self.xdamage.XDamageQueryExtension.argtypes = [c_void_p, POINTER(c_int), POINTER(c_int)]
+        self.xdamage.XDamageCreate.argtypes = [c_void_p, c_ulong, c_int]
+        self.xdamage.XDamageCreate.restype = c_ulong
+        self.xdamage.XDamageSubtract.argtypes = [c_void_p, c_ulong, c_ulong, c_ulong]
+        self.xdamage.XDamageDestroy.argtypes = [c_void_p, c_ulong]
+
+    def set_region(self, region):
+        """Update the tracked region (the damage object covers the whole root window)"""
+        self.region = region
+
+    def poll(self):
+        """
+        Drain pending damage events
+
+        Returns:
+            bool: True if any damaged rectangle intersects the capture region
+        """
+        if not self.is_available:
+            return True
+
+        received = False
+        damaged = False
+        event = XEvent()
+        while self.xlib.XPending(self.display):
+            self.xlib.XNextEvent(self.display, byref(event))
+            if event.type == self.event_base + XDAMAGE_NOTIFY:
+                received = True
+                damaged = damaged or self._intersects(event.xdamage.area)
+
+        if received:
+            # Reset the accumulated damage so the same areas report again next time
+            self.xdamage.XDamageSubtract(self.display, self.damage, 0, 0)
+            self.xlib.XSync(self.display, 0)
+
+        error = _ERROR.pop(current_thread(), None)
+        if error:
+            print(f"XDamage failed, polling the screen instead: {error['error']}")
+            self.stop()
+            return True
+        return damaged
+
+    def _intersects(self, area):
+        """Check if a damage rectangle overlaps the capture region"""
+        region = self.region
+        if region is None:
+            return True
+        return (area.x < region['left'] + region['width'] and
+                area.x + area.width > region['left'] and
+                area.y < region['top'] + region['height'] and
+                area.y + area.height > region['top'])
+
+    def stop(self):
+        """Destroy the damage object and close the X connection"""
+        if self.display:
+            if self.damage:
+                self.xdamage.XDamageDestroy(self.display, self.damage)
+            self.xlib.XCloseDisplay(self.display)
+            # Errors of the requests above are of no interest any more
+            _ERROR.pop(current_thread(), None)
+        if self.original_error_handler:
+            self.xlib.XSetErrorHandler(self.original_error_handler)
+            self.original_error_handler = None
+        self.display = None
+        self.damage = None
+        self.is_available = False
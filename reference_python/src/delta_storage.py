@@ -0,0 +1,266 @@
+"""
+Delta Storage - Keyframes plus compressed changed-tile deltas between them
+"""
+
+import threading
+import zlib
+from bisect import bisect_left
+import numpy as np
+from change_detection import TILE_SIZE, compute_change_map
+from frame_cache import FrameCache
+from frame_convert import frame_to_array, read_only
+from storage_backends import StorageBackend
+
+# A full frame is stored at least every this many frames, which bounds the
+# number of deltas a random read has to apply
+KEYFRAME_INTERVAL = 30
+
+# Bytes of decoded frames kept for reads
+CACHE_BYTES = 128 << 20
+
+
+class DeltaEntry:
+    """One stored frame: a keyframe, or the changed rectangles against its base"""
+
+    __slots__ = ("base", "depth", "shape", "rects", "data")
+
+    def __init__(self, base, depth, shape, rects, data):
+        self.base = base      # Key of the frame the delta applies to, None for keyframes
+        self.depth = depth    # Deltas to apply after the keyframe (0 for keyframes)
+        self.shape = shape
+        self.rects = rects    # (n, 4) int32 top, left, bottom, right; None for keyframes
+        self.data = data      # zlib compressed pixels
+
+    @property
+    def nbytes(self):
+        return len(self.data) + (self.rects.nbytes if self.rects is not None else 0)
+
+
+def changed_rects(tiles, tile_size, height, width):
+    """
+    Rectangles covering the changed tiles of a change map
+
+    Each run of changed tiles in a tile row becomes one rectangle, so large
+    changed areas need few copies.
+
+    Returns:
+        (n, 4) int32 array of top, left, bottom, right pixel coordinates
+    """
+    padded = np.zeros((tiles.shape[0], tiles.shape[1] + 2), dtype=np.int8)
+    padded[:, 1:-1] = tiles
+    rows, edges = np.nonzero(np.diff(padded, axis=1))
+    # Edges alternate between run starts and run ends within each row
+    rows, starts, ends = rows[::2], edges[::2], edges[1::2]
+    rects = np.empty((rows.size, 4), dtype=np.int32)
+    rects[:, 0] = rows * tile_size
+    rects[:, 1] = starts * tile_size
+    rects[:, 2] = np.minimum((rows + 1) * tile_size, height)
+    rects[:, 3] = np.minimum(ends * tile_size, width)
+    return rects
+
+
+class DeltaBackend(StorageBackend):
+    """
+    Frames stored as periodic keyframes and changed-tile deltas
+
+    Consecutive screen frames are mostly identical. Every KEYFRAME_INTERVAL
+    frames (and whenever the size changes) a whole frame is stored zlib
+    compressed; the frames in between only keep the tiles that differ from the
+    frame before them, as rectangles plus their compressed pixels. The
+    changed tiles come from the capture pipeline's change map when it is
+    against the previous stored frame; other frames (manual captures, the
+    frame after one, the first after a delete) are compared against the
+    previous frame instead.
+
+    Reading a frame decodes its keyframe and applies the deltas up to it, so a
+    random read costs at most one keyframe and KEYFRAME_INTERVAL - 1 deltas.
+    Decoded frames are cached, and decoding starts from the nearest cached
+    frame of the chain: sequential reads (export, playback) apply a single
+    delta per frame.
+
+    Deleting a frame re-encodes the frame after it against the one before it,
+    so the chain stays intact.
+    """
+
+    name = "delta"
+    # Not cached by FrameStorage: the backend caches decoded frames itself, as delta bases
+
+    def __init__(self, compress_level=1, keyframe_interval=KEYFRAME_INTERVAL,
+                 tile_size=TILE_SIZE, cache_bytes=CACHE_BYTES):
+        """
+        Args:
+            compress_level: zlib level of keyframes and deltas, 1-9
+            keyframe_interval: Frames per keyframe (1 stores only keyframes)
+            tile_size: Tile side of the change maps in pixels
+            cache_bytes: Bytes of decoded frames kept for reads
+        """
+        self.compress_level = max(1, compress_level)
+        self.keyframe_interval = max(1, keyframe_interval)
+        self.tile_size = tile_size
+        self.lock = threading.Lock()
+        self.entries = {}  # key -> DeltaEntry
+        self.keys = []     # Stored keys in storage order (ascending, keys only grow)
+        self.cache = FrameCache(cache_bytes)
+        # Last stored frame, the base of the next delta
+        self.tail_key = None
+        self.tail = None
+
+        self.raw_bytes = 0
+        self.stored_bytes = 0
+        self.keyframes = 0
+
+    def _encode(self, frame, base_key, base, max_depth=None, change=None):
+        """
+        Entry for frame: a delta against base, or a keyframe (lock held)
+
+        max_depth limits the chain further when a frame is re-encoded: it
+        mustn't get deeper than before, or the depths recorded for the frames
+        after it would be too low. change is a FrameChange of frame against
+        base if one is known; otherwise the two are compared.
+        """
+        limit = self.keyframe_interval - 1 if max_depth is None else min(max_depth, self.keyframe_interval - 1)
+        base_entry = self.entries.get(base_key)
+        if (base is None or base_entry is None or base.shape != frame.shape
+                or base_entry.depth + 1 > limit):
+            return DeltaEntry(None, 0, frame.shape, None, zlib.compress(frame, self.compress_level))
+
+        height, width = frame.shape[:2]
+        tiles = change.tiles if self._fits(change, height, width) else None
+        if tiles is None:
+            tiles = compute_change_map(base, frame, self.tile_size).tiles
+        rects = changed_rects(tiles, self.tile_size, height, width)
+        compressor = zlib.compressobj(self.compress_level)
+        parts = [compressor.compress(np.ascontiguousarray(frame[top:bottom, left:right]))
+                 for top, left, bottom, right in rects.tolist()]
+        parts.append(compressor.flush())
+        return DeltaEntry(base_key, base_entry.depth + 1, frame.shape, rects, b"".join(parts))
+
+    def _fits(self, change, height, width):
+        """True if a change map has this backend's tiles for a frame of this size"""
+        return (change is not None and change.tile_size == self.tile_size and
+                change.tiles.shape == (-(-height // self.tile_size), -(-width // self.tile_size)))
+
+    def _set_entry(self, key, entry):
+        """Store or replace the entry of a key (lock held)"""
+        old = self.entries.get(key)
+        if old is not None:
+            self.stored_bytes -= old.nbytes
+            self.keyframes -= old.base is None
+        self.entries[key] = entry
+        self.stored_bytes += entry.nbytes
+        self.keyframes += entry.base is None
+
+    def put(self, key, frame, change=None, base_key=None):
+        array = frame_to_array(frame)
+        with self.lock:
+            # Own copy: it is the next delta's base and stays cached for reads
+            array = np.array(array, dtype=np.uint8, order="C")
+            if base_key is None or base_key != self.tail_key:
+                change = None  # Not against the tail, e.g. a manual capture came in between
+            self._set_entry(key, self._encode(array, self.tail_key, self.tail, change=change))
+            self.keys.append(key)
+            self.raw_bytes += array.nbytes
+            self.tail_key, self.tail = key, array
+            self.cache.put(key, array)
+
+    def _decode(self, key):
+        """Decoded frame, shared with the cache so it must not be written to (lock held)"""
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        # Walk back to a cached frame or the keyframe
+        chain = []
+        frame = None
+        current = key
+        while True:
+            entry = self.entries[current]
+            if entry.base is None:
+                frame = np.frombuffer(zlib.decompress(entry.data), dtype=np.uint8).reshape(entry.shape).copy()
+                break
+            chain.append(entry)
+            cached = self.cache.peek(entry.base)
+            if cached is not None:
+                frame = cached.copy()
+                break
+            current = entry.base
+
+        for entry in reversed(chain):
+            self._apply(frame, entry)
+        return self.cache.put(key, frame)
+
+    @staticmethod
+    def _apply(frame, entry):
+        """Copy a delta's rectangles into its base frame"""
+        data = zlib.decompress(entry.data)
+        channels = frame.shape[2] if frame.ndim == 3 else 1
+        offset = 0
+        for top, left, bottom, right in entry.rects.tolist():
+            region = frame[top:bottom, left:right]
+            count = (bottom - top) * (right - left) * channels
+            region[...] = np.frombuffer(data, dtype=np.uint8, count=count, offset=offset).reshape(region.shape)
+            offset += count
+
+    def get_array(self, key):
+        with self.lock:
+            return read_only(self._decode(key))
+
+    def delete(self, key):
+        self.delete_many([key])
+
+    def delete_many(self, keys):
+        """
+        Delete frames in one pass over the chain
+
+        Each remaining frame whose delta is against a deleted frame is
+        re-encoded against the remaining frame before it, once, however many
+        frames in a row are deleted.
+        """
+        with self.lock:
+            doomed = {key for key in keys if key in self.entries}
+            if not doomed:
+                return
+            first = bisect_left(self.keys, min(doomed))
+            last = max(doomed)
+            previous = self.keys[first - 1] if first > 0 else None
+            # Deleted entries stay until the end, decoding still walks through them
+            for key in self.keys[first:]:
+                if key in doomed:
+                    continue
+                entry = self.entries[key]
+                if entry.base in doomed:
+                    frame = self._decode(key)
+                    base = self._decode(previous) if previous is not None else None
+                    self._set_entry(key, self._encode(frame, previous, base, max_depth=entry.depth))
+                previous = key
+                if key > last:
+                    break
+
+            for key in doomed:
+                entry = self.entries.pop(key)
+                self.stored_bytes -= entry.nbytes
+                self.keyframes -= entry.base is None
+                self.raw_bytes -= int(np.prod(entry.shape))
+                self.cache.discard(key)
+            self.keys[first:] = [key for key in self.keys[first:] if key not in doomed]
+            if self.tail_key in doomed:
+                self.tail_key = self.keys[-1] if self.keys else None
+                self.tail = self._decode(self.tail_key) if self.keys else None
+
+    def stats(self):
+        with self.lock:
+            return {
+                "frames": len(self.entries),
+                "keyframes": self.keyframes,
+                "raw_bytes": self.raw_bytes,
+                "stored_bytes": self.stored_bytes,
+                "ratio": self.raw_bytes / self.stored_bytes if self.stored_bytes else 0.0,
+                "cache": self.cache.stats(),
+            }
+
+    def close(self):
+        with self.lock:
+            self.entries.clear()
+            self.keys.clear()
+            self.cache.clear()
+            self.tail_key = self.tail = None
@@ -0,0 +1,242 @@
+"""
+Disk Writer - Encode and write frame PNGs on background threads
+"""
+
+import os
+import threading
+from collections import deque
+
+
+class DiskWriterPool:
+    """
+    Bounded pool of threads writing frames to disk
+
+    PNG encoding takes tens of milliseconds per 1080p frame. zlib releases the
+    GIL while compressing, so a few threads keep up with capture where a
+    single synchronous write could not, without pickling frames across
+    processes.
+
+    Frames stay readable while they wait: read() hands the in-flight frame to
+    a callback, so readers never wait for the encoder. wait() is the barrier
+    for callers that need the files themselves, and only waits for the paths
+    it is given.
+
+    A write that fails is retried; if it keeps failing, the frame stays in
+    memory (see failed()) so it remains readable instead of being lost.
+    """
+
+    def __init__(self, encode, workers=2, max_pending=8, on_written=None, retries=1):
+        """
+        Args:
+            encode: Function (frame, path) writing one frame to a file
+            workers: Number of writer threads
+            max_pending: Frames queued or being written before submit() blocks
+            on_written: Optional function (frame) called once a frame is no
+                        longer needed (written or discarded)
+            retries: Times a failed write is queued again before the frame is
+                     kept in memory for good
+        """
+        self.encode = encode
+        self.max_pending = max(1, max_pending)
+        self.on_written = on_written
+        self.retries = retries
+
+        self.lock = threading.Lock()
+        self.changed = threading.Condition(self.lock)
+        self.queue = deque()    # Paths waiting for a writer, in submit order
+        self.pending = {}       # path -> frame, until it is on disk
+        self.writing = set()    # Paths a writer is working on
+        self.discarded = set()  # Paths being written whose file must go afterwards
+        self.attempts = {}      # path -> failed writes so far, while it is retried
+        self.failed = {}        # path -> frame that couldn't be written, kept readable
+        self.written = 0
+        self.errors = 0
+        self.closed = False
+
+        self.threads = [threading.Thread(target=self._run, name=f"gifcap-writer-{i}", daemon=True)
+                        for i in range(max(1, workers))]
+        for thread in self.threads:
+            thread.start()
+
+    def submit(self, path, frame):
+        """
+        Queue a frame to be written to path
+
+        Blocks while max_pending frames are already waiting, which slows the
+        caller down to the speed of the disk instead of using unbounded memory.
+        """
+        with self.changed:
+            while len(self.pending) >= self.max_pending and not self.closed:
+                self.changed.wait()
+            if self.closed:
+                raise RuntimeError("Disk writer pool is closed")
+            self.pending[path] = frame
+            self.queue.append(path)
+            self.changed.notify_all()
+
+    def read(self, path, convert):
+        """
+        Read a frame that isn't on disk yet
+
+        Args:
+            path: Path the frame was submitted with
+            convert: Function (frame) -> result, called while the frame can't
+                     be released, so it may read the frame's memory
+
+        Returns:
+            convert's result, or None if the frame isn't in memory (its file is
+            complete, or it was never submitted)
+        """
+        with self.lock:
+            frame = self.pending.get(path)
+            if frame is None:
+                frame = self.failed.get(path)
+            if frame is None:
+                return None
+            return convert(frame)
+
+    def is_pending(self, path):
+        with self.lock:
+            return path in self.pending
+
+    def is_failed(self, path):
+        """True if the frame couldn't be written and only exists in memory"""
+        with self.lock:
+            return path in self.failed
+
+    def discard(self, path):
+        """
+        Forget a frame that is about to be deleted
+
+        Returns:
+            bool: True if the frame was still pending (or failed). A frame
+            already being written has its file removed once the write finishes.
+        """
+        with self.changed:
+            if path in self.failed:
+                frame = self.failed.pop(path)
+                self.changed.notify_all()
+                self._release(frame)
+                return True
+            if path not in self.pending:
+                return False
+            if path in self.writing:
+                self.discarded.add(path)
+                return True
+            frame = self.pending.pop(path)
+            self.queue.remove(path)
+            self.changed.notify_all()
+        self._release(frame)
+        return True
+
+    def wait(self, paths=None, timeout=None):
+        """
+        Barrier: wait until frames are on disk
+
+        Args:
+            paths: Paths to wait for (default: everything submitted so far)
+            timeout: Seconds to wait at most
+
+        Returns:
+            bool: True if all of them were written (or discarded), False on
+            timeout or if any of them failed
+        """
+        with self.changed:
+            if paths is None:
+                paths = list(self.pending)
+            done = self.changed.wait_for(lambda: not any(path in self.pending for path in paths), timeout)
+            return done and not any(path in self.failed for path in paths)
+
+    def close(self, discard=False):
+        """
+        Stop the writer threads
+
+        Args:
+            discard: Drop frames that haven't been written instead of writing them
+        """
+        with self.changed:
+            if discard:
+                dropped = [self.pending.pop(path) for path in self.queue]
+                self.queue.clear()
+            else:
+                dropped = []
+            self.closed = True
+            # Nobody reads from a closed pool
+            dropped.extend(self.failed.values())
+            self.failed.clear()
+            self.changed.notify_all()
+        for frame in dropped:
+            self._release(frame)
+        for thread in self.threads:
+            thread.join()
+
+    def stats(self):
+        with self.lock:
+            return {"pending": len(self.pending), "written": self.written, "errors": self.errors,
+                    "failed": len(self.failed)}
+
+    def _release(self, frame):
+        if self.on_written:
+            self.on_written(frame)
+
+    def _run(self):
+        """Writer thread"""
+        while True:
+            with self.changed:
+                # Queued frames are still written after close()
+                while not self.queue and not self.closed:
+                    self.changed.wait()
+                if not self.queue:
+                    return
+                path = self.queue.popleft()
+                frame = self.pending[path]
+                self.writing.add(path)
+
+            # Write under a temporary name so a reader never sees half a file
+            temp_path = f"{path}.part"
+            try:
+                self.encode(frame, temp_path)
+                os.replace(temp_path, path)
+                failed = False
+            except Exception as e:
+                print(f"Error writing frame {path}: {e}")
+                failed = True
+                try:
+                    os.unlink(temp_path)
+                except OSError:
+                    pass
+
+            with self.changed:
+                self.writing.discard(path)
+                discarded = path in self.discarded
+                self.discarded.discard(path)
+                keep = False
+                if failed:
+                    self.errors += 1
+                    attempts = self.attempts.get(path, 0) + 1
+                    if discarded:
+                        self.attempts.pop(path, None)
+                    elif attempts <= self.retries and not self.closed:
+                        # Try again after the frames queued meanwhile; it stays pending
+                        self.attempts[path] = attempts
+                        self.queue.append(path)
+                        self.changed.notify_all()
+                        continue
+                    else:
+                        # Keep it readable from memory rather than losing it
+                        self.attempts.pop(path, None)
+                        self.failed[path] = frame
+                        keep = True
+                else:
+                    self.written += 1
+                    self.attempts.pop(path, None)
+                del self.pending[path]
+                self.changed.notify_all()
+
+            if discarded:
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+            if not keep:
+                self._release(frame)
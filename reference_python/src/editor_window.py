@@ -286,8 +286,7 @@ class EditorWindow(QWidget):
         )
         
         if reply == QMessageBox.StandardButton.Yes:
-            frames_to_delete = list(range(frame_num + 1))
-            self.frame_storage.delete_frames(frames_to_delete)
+            self.frame_storage.delete_range(0, frame_num + 1)
             self.refresh_display()
             self.frames_modified.emit()
     
@@ -304,25 +303,24 @@ class EditorWindow(QWidget):
         )
         
         if reply == QMessageBox.StandardButton.Yes:
-            frames_to_delete = list(range(frame_num, total_frames))
-            self.frame_storage.delete_frames(frames_to_delete)
+            self.frame_storage.delete_range(frame_num, total_frames)
             self.refresh_display()
             self.frames_modified.emit()
     
     def delete_even_frames(self):
         """Delete all even-numbered frames"""
         total_frames = self.frame_storage.get_frame_count()
-        even_frames = [i for i in range(total_frames) if i % 2 == 0]
+        even_count = (total_frames + 1) // 2
         
         reply = QMessageBox.question(
             self,
             "Confirm Deletion",
-            f"Delete all even-numbered frames ({len(even_frames)} frames)?",
+            f"Delete all even-numbered frames ({even_count} frames)?",
             QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
         )
         
         if reply == QMessageBox.StandardButton.Yes:
-            self.frame_storage.delete_frames(even_frames)
+            self.frame_storage.delete_range(0, None, 2)
             self.refresh_display()
             self.frames_modified.emit()
     
@@ -336,8 +334,7 @@ class EditorWindow(QWidget):
             
             if dialog.apply_to_all():
                 # Apply to all frames
-                for i in range(self.frame_storage.get_frame_count()):
-                    self.frame_storage.set_delay(i, new_delay)
+                self.frame_storage.set_all_delays(new_delay)
                 self.refresh_display()
             else:
                 # Apply to single frame
@@ -0,0 +1,143 @@
+"""
+Frame Cache - Bounded LRU of decoded frames, sized in bytes
+"""
+
+import threading
+from collections import OrderedDict
+from PIL import Image
+
+# Decoded frames kept by default (about 40 RGB 1080p frames)
+CACHE_BYTES = 256 << 20
+
+
+def cached_size(frame):
+    """Bytes a cached frame (array or PIL Image) takes"""
+    if isinstance(frame, Image.Image):
+        return frame.width * frame.height * len(frame.getbands())
+    return frame.nbytes
+
+
+class FrameCache:
+    """
+    Least recently used decoded frames, up to a number of bytes
+
+    Sized in bytes rather than frames, so the same cache holds many small
+    frames or a few 4K ones. Cached frames are shared between readers and
+    must not be written to. Thread safe.
+    """
+
+    def __init__(self, max_bytes=CACHE_BYTES):
+        """
+        Args:
+            max_bytes: Bytes of frames kept; 0 disables the cache
+        """
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.frames = OrderedDict()  # key -> frame, least recently used first
+        self.bytes = 0
+        # Bumped by discard() and clear(), so loads racing a delete aren't cached
+        self.generation = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __contains__(self, key):
+        with self.lock:
+            return key in self.frames
+
+    def get(self, key):
+        """
+        Cached frame, counted as a hit or a miss
+
+        Returns:
+            The frame, or None if it isn't cached
+        """
+        with self.lock:
+            frame = self.frames.get(key)
+            if frame is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.frames.move_to_end(key)
+            return frame
+
+    def peek(self, key):
+        """Cached frame or None, without counting or marking it recently used"""
+        with self.lock:
+            return self.frames.get(key)
+
+    def put(self, key, frame, generation=None):
+        """
+        Cache a frame, evicting the least recently used ones to make room
+
+        Frames bigger than the whole cache aren't kept.
+
+        Args:
+            generation: self.generation read before the frame was loaded; if a
+                        frame was discarded since, this one isn't cached (it
+                        may be the deleted frame)
+
+        Returns:
+            The frame
+        """
+        size = cached_size(frame)
+        with self.lock:
+            if generation is not None and generation != self.generation:
+                return frame
+            old = self.frames.pop(key, None)
+            if old is not None:
+                self.bytes -= cached_size(old)
+            if size > self.max_bytes:
+                return frame
+            self.frames[key] = frame
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, evicted = self.frames.popitem(last=False)
+                self.bytes -= cached_size(evicted)
+                self.evictions += 1
+        return frame
+
+    def get_or_load(self, key, load):
+        """
+        Cached frame, or load(key) cached on a miss
+
+        The loader runs outside the lock, so a slow decode doesn't block other
+        readers (two threads missing the same key may both decode it). A frame
+        discarded while it was loading isn't put back.
+        """
+        frame = self.get(key)
+        if frame is None:
+            generation = self.generation
+            frame = load(key)
+            if frame is not None:
+                self.put(key, frame, generation)
+        return frame
+
+    def discard(self, key):
+        """Forget a frame, e.g. once it is deleted"""
+        with self.lock:
+            self.generation += 1
+            frame = self.frames.pop(key, None)
+            if frame is not None:
+                self.bytes -= cached_size(frame)
+
+    def clear(self):
+        with self.lock:
+            self.generation += 1
+            self.frames.clear()
+            self.bytes = 0
+
+    def stats(self):
+        """Hit/miss counters and usage for display"""
+        with self.lock:
+            requests = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / requests if requests else 0.0,
+                "evictions": self.evictions,
+                "frames": len(self.frames),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+            }
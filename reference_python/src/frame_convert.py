@@ -0,0 +1,50 @@
+"""
+Frame Convert - Conversions between captured frame arrays and PIL Images
+"""
+
+from PIL import Image
+import numpy as np
+
+
+def frame_to_image(frame):
+    """
+    Convert a captured frame to a PIL Image
+
+    Frames are PIL Images or uint8 arrays of shape (height, width, channels):
+    4 channels are BGRA/BGRX as grabbed by mss, 3 channels are RGB.
+    """
+    if isinstance(frame, Image.Image):
+        return frame
+    height, width = frame.shape[:2]
+    if frame.shape[2] == 4:
+        return Image.frombuffer("RGB", (width, height), np.ascontiguousarray(frame), "raw", "BGRX", 0, 1)
+    return Image.fromarray(frame, "RGB")
+
+
+def frame_to_rgb_array(frame):
+    """Convert a captured frame to a contiguous (height, width, 3) RGB array"""
+    if isinstance(frame, Image.Image):
+        return np.asarray(frame.convert("RGB"))
+    if frame.shape[2] == 4:
+        return np.ascontiguousarray(frame[..., 2::-1])
+    return frame
+
+
+def rgb_copy(frame):
+    """RGB array of a frame that doesn't share its memory"""
+    rgb = frame_to_rgb_array(frame)
+    return rgb.copy() if rgb is frame else rgb
+
+
+def frame_to_array(frame):
+    """Captured frame as a uint8 array: arrays as they are, PIL Images as RGB"""
+    if isinstance(frame, Image.Image):
+        return np.asarray(frame.convert("RGB"))
+    return frame
+
+
+def read_only(array):
+    """View of an array that can't be written through"""
+    view = array.view()
+    view.flags.writeable = False
+    return view
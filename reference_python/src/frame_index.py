@@ -0,0 +1,139 @@
+"""
+Frame Index - Frame order and per-frame metadata in parallel arrays
+"""
+
+import numpy as np
+
+# Frames the index makes room for up front (it doubles when full)
+INITIAL_CAPACITY = 1024
+
+
+class FrameIndex:
+    """
+    Display order of the frames with their storage keys, delays, timestamps
+    and change maps
+
+    Every field is one array indexed by display position, instead of a dict
+    per frame: a session of 100k+ frames costs a few MB, and deletes move
+    the arrays once instead of renumbering every frame. A frame's position
+    is just where it is in the arrays; its storage key never changes.
+
+    Not thread safe, FrameStorage serializes access.
+    """
+
+    def __init__(self, capacity=INITIAL_CAPACITY):
+        capacity = max(1, capacity)
+        self.keys = np.empty(capacity, dtype=np.int64)
+        self.delays = np.empty(capacity, dtype=np.int32)
+        self.timestamps = np.empty(capacity, dtype=np.float64)  # NaN when unknown
+        self.changes = np.empty(capacity, dtype=object)         # FrameChange or None
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def _grow(self):
+        capacity = len(self.keys) * 2
+        for name in ("keys", "delays", "timestamps", "changes"):
+            old = getattr(self, name)
+            new = np.empty(capacity, dtype=old.dtype)
+            new[:self.count] = old[:self.count]
+            setattr(self, name, new)
+
+    def append(self, key, delay, timestamp=None, change=None):
+        """
+        Add a frame at the end
+
+        Returns:
+            int: Its position
+        """
+        if self.count == len(self.keys):
+            self._grow()
+        position = self.count
+        self.keys[position] = key
+        self.delays[position] = delay
+        self.timestamps[position] = np.nan if timestamp is None else timestamp
+        self.changes[position] = change
+        self.count += 1
+        return position
+
+    def key(self, position):
+        return int(self.keys[position])
+
+    def delay(self, position):
+        return int(self.delays[position])
+
+    def set_delay(self, position, delay):
+        self.delays[position] = delay
+
+    def set_all_delays(self, delay):
+        self.delays[:self.count] = delay
+
+    def timestamp(self, position):
+        value = self.timestamps[position]
+        return None if np.isnan(value) else float(value)
+
+    def change(self, position):
+        return self.changes[position]
+
+    def delay_array(self):
+        """Delays of all frames in display order (a view, don't keep it across edits)"""
+        return self.delays[:self.count]
+
+    def key_array(self):
+        """Storage keys of all frames in display order (a view, don't keep it across edits)"""
+        return self.keys[:self.count]
+
+    def delete(self, positions):
+        """
+        Delete frames at any positions in one pass
+
+        The change map of each frame that follows a deleted one is dropped, it
+        was relative to a frame that is gone.
+
+        Args:
+            positions: Iterable of positions; out of range ones are ignored
+
+        Returns:
+            int64 array of the deleted frames' storage keys, in display order
+        """
+        positions = np.fromiter((p for p in positions if 0 <= p < self.count), dtype=np.int64)
+        if positions.size == 0:
+            return np.empty(0, dtype=np.int64)
+        keep = np.ones(self.count, dtype=bool)
+        keep[positions] = False
+        return self._compact(keep)
+
+    def delete_range(self, start, stop=None, step=1):
+        """
+        Delete the frames of range(start, stop, step) in one pass
+
+        Returns:
+            int64 array of the deleted frames' storage keys, in display order
+        """
+        keep = np.ones(self.count, dtype=bool)
+        keep[slice(start, stop, step)] = False
+        if keep.all():
+            return np.empty(0, dtype=np.int64)
+        return self._compact(keep)
+
+    def _compact(self, keep):
+        """Keep the frames where keep is True, moving every array once"""
+        count = self.count
+        deleted = self.keys[:count][~keep].copy()
+
+        # A kept frame right after a deleted one loses its change map
+        after_deleted = np.zeros(count, dtype=bool)
+        after_deleted[1:] = keep[1:] & ~keep[:-1]
+        self.changes[:count][after_deleted] = None
+
+        kept = int(np.count_nonzero(keep))
+        for array in (self.keys, self.delays, self.timestamps, self.changes):
+            array[:kept] = array[:count][keep]
+        self.changes[kept:count] = None  # Don't keep dropped change maps alive
+        self.count = kept
+        return deleted
+
+    def clear(self):
+        self.changes[:self.count] = None
+        self.count = 0
@@ -0,0 +1,100 @@
+"""
+Frame Pool - Reuse full-size frame buffers across captures
+"""
+
+import threading
+import numpy as np
+
+
+class FrameBufferPool:
+    """
+    Pool of preallocated frame buffers keyed by shape
+
+    A long recording grabs the same region size thousands of times, so instead
+    of allocating a fresh multi-megabyte array per grab, buffers are checked
+    out with acquire() and come back with release() once nobody needs them.
+
+    Buffers are reference counted because several parts of the pipeline may
+    hold the same frame: the capture pipeline while it is queued, the diff
+    stage as the reference for the next comparison, and RAM storage for as
+    long as the frame is kept. Each holder calls retain() when it keeps a
+    buffer and release() when it lets go; the buffer returns to the pool when
+    the count drops to zero. Arrays that didn't come from the pool are
+    ignored by retain() and release(), so callers don't have to tell them apart.
+    """
+
+    def __init__(self, max_free_per_shape=8):
+        """
+        Args:
+            max_free_per_shape: Idle buffers kept per shape; extra ones are freed
+        """
+        self.max_free_per_shape = max_free_per_shape
+        self.lock = threading.Lock()
+        self.free = {}  # shape -> list of idle buffers
+        self.refs = {}  # id(buffer) -> [buffer, reference count]
+
+        self.hits = 0
+        self.misses = 0
+        self.high_water = 0
+
+    def acquire(self, shape):
+        """
+        Check out a uint8 buffer of the given shape (contents are undefined)
+
+        Returns:
+            numpy array with a reference count of 1
+        """
+        shape = tuple(shape)
+        with self.lock:
+            idle = self.free.get(shape)
+            if idle:
+                buffer = idle.pop()
+                self.hits += 1
+            else:
+                buffer = np.empty(shape, dtype=np.uint8)
+                self.misses += 1
+            self.refs[id(buffer)] = [buffer, 1]
+            self.high_water = max(self.high_water, len(self.refs))
+            return buffer
+
+    def retain(self, buffer):
+        """Add a reference to a checked-out buffer"""
+        with self.lock:
+            entry = self.refs.get(id(buffer))
+            if entry is not None and entry[0] is buffer:
+                entry[1] += 1
+
+    def release(self, buffer):
+        """Drop a reference; the buffer is reused once no references are left"""
+        if buffer is None:
+            return
+        with self.lock:
+            entry = self.refs.get(id(buffer))
+            if entry is None or entry[0] is not buffer:
+                return
+            entry[1] -= 1
+            if entry[1] > 0:
+                return
+            del self.refs[id(buffer)]
+
+            idle = self.free.setdefault(buffer.shape, [])
+            if len(idle) < self.max_free_per_shape:
+                idle.append(buffer)
+
+    def clear(self):
+        """Free all idle buffers (checked-out buffers stay valid)"""
+        with self.lock:
+            self.free.clear()
+
+    def stats(self):
+        """Hit/miss counters and buffer usage for display"""
+        with self.lock:
+            requests = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / requests if requests else 0.0,
+                "in_use": len(self.refs),
+                "high_water": self.high_water,
+                "idle": sum(len(idle) for idle in self.free.values()),
+            }
@@ -0,0 +1,73 @@
+"""
+Frame Scaling - Shrink captured frames before they are compared and stored
+"""
+
+import numpy as np
+from PIL import Image
+
+# How close 1/scale has to be to a whole number to use the box filter
+INTEGER_TOLERANCE = 1e-6
+
+
+def integer_factor(scale):
+    """
+    Whole-number reduction factor for a scale, e.g. 2 for 0.5
+
+    Returns:
+        int or None: The factor, or None if 1/scale isn't a whole number
+    """
+    factor = round(1.0 / scale)
+    if factor >= 2 and abs(1.0 / scale - factor) < INTEGER_TOLERANCE:
+        return factor
+    return None
+
+
+def scaled_size(width, height, scale):
+    """Size of a width x height frame after scale_frame()"""
+    if scale >= 1.0:
+        return width, height
+    factor = integer_factor(scale)
+    if factor:
+        # A partial block at the right/bottom edge still becomes one pixel
+        return -(-width // factor), -(-height // factor)
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def scale_frame(frame, scale, buffer_pool=None):
+    """
+    Scale a captured frame down
+
+    An integer reduction (0.5, 0.25, 1/3...) averages each factor x factor
+    block of pixels (a box filter, done by Pillow's reduce() on the frame's own
+    buffer). Any other scale uses Lanczos resampling, which is slower.
+
+    Args:
+        frame: (height, width, 4) BGRA/BGRX or (height, width, 3) RGB uint8 array
+        scale: Output size relative to the input, 0 < scale <= 1
+        buffer_pool: FrameBufferPool to take the output buffer from
+
+    Returns:
+        Scaled array in the same channel layout (the frame itself if scale >= 1)
+    """
+    if scale >= 1.0:
+        return frame
+
+    height, width, channels = frame.shape
+    # Channel order doesn't matter to a filter; RGBX keeps the 4th byte out of
+    # any alpha handling (X11 leaves it undefined)
+    mode = "RGBX" if channels == 4 else "RGB"
+    image = Image.frombuffer(mode, (width, height), np.ascontiguousarray(frame), "raw", mode, 0, 1)
+
+    factor = integer_factor(scale)
+    if factor:
+        scaled = image.reduce(factor)
+    else:
+        scaled = image.resize(scaled_size(width, height, scale), Image.Resampling.LANCZOS,
+                              reducing_gap=2.0)
+
+    result = np.asarray(scaled)
+    if buffer_pool is None:
+        return result
+    pooled = buffer_pool.acquire(result.shape)
+    np.copyto(pooled, result)
+    return pooled
@@ -2,139 +2,374 @@
 Frame Storage - Manage captured frames on disk or in RAM
 """
 
-import os
 import shutil
-import json
+import threading
 from pathlib import Path
-from PIL import Image
 import tempfile
 import uuid
+from frame_cache import CACHE_BYTES, FrameCache
+from frame_index import FrameIndex
+from frame_pool import FrameBufferPool
+# Re-exported: frame_storage has always provided these conversions
+from frame_convert import frame_to_image, frame_to_rgb_array  # noqa: F401
+from storage_backends import PngBackend, RamBackend
+
+# Where frames are kept:
+#   disk   - one PNG file per frame, written in the background
+#   ram    - frames as captured, no copy
+#   arena  - raw frames in one memory-mapped file (RAM-like reads, disk-backed)
+#   delta  - in RAM, as keyframes plus compressed changed tiles
+#   tiles  - in RAM, each unique tile once, frames as grids of tile references
+#   hybrid - in RAM up to a memory budget, older frames spilled to PNG files
+STORAGE_MODES = ("disk", "ram", "arena", "delta", "tiles", "hybrid")
+
+
+def describe_stats(stats):
+    """
+    One line summary of FrameStorage.stats() for the CLI and the recorder window
+
+    Returns:
+        str: e.g. "tiles storage: 120 frames, 24.0x tile dedup, 12.5 MB for 300.0 MB raw"
+    """
+    parts = [f"{stats['frame_count']} frames"]
+    if "dedup_ratio" in stats:
+        parts.append(f"{stats['dedup_ratio']:.1f}x tile dedup "
+                     f"({stats['unique_tiles']} unique of {stats['referenced_tiles']})")
+    if "keyframes" in stats:
+        parts.append(f"{stats['keyframes']} keyframes")
+    if "ram_frames" in stats:
+        parts.append(f"{stats['ram_frames']} in RAM, {stats['packed_frames']} packed, "
+                     f"{stats['disk_frames']} on disk")
+    if stats.get("stored_bytes"):
+        parts.append(f"{stats['stored_bytes'] / (1 << 20):.1f} MB for "
+                     f"{stats['raw_bytes'] / (1 << 20):.1f} MB raw")
+    errors = stats.get("errors", stats.get("disk", {}).get("errors", 0))
+    if errors:
+        parts.append(f"{errors} write errors")
+    cache = stats.get("frame_cache")
+    if cache and cache["hits"] + cache["misses"]:
+        parts.append(f"frame cache {cache['hit_rate']:.0%} hits")
+    return f"{stats['mode']} storage: " + ", ".join(parts)
 
 
 class FrameStorage:
-    def __init__(self, storage_mode="disk"):
+    def __init__(self, storage_mode="disk", compress_level=None, writers=None, max_pending_writes=8,
+                 memory_budget=None, cache_bytes=CACHE_BYTES, rss_limit=None):
+        """
+        Args:
+            storage_mode: One of STORAGE_MODES
+            compress_level: 0-9; PNG level in disk and hybrid mode (default 1:
+                            frames are temporary, so speed wins), zlib level in
+                            arena mode (default 0: raw frames, zero-copy reads)
+                            and delta mode (default 1)
+            writers: Threads encoding and writing disk frames (default: one per
+                     spare CPU core, at most 4)
+            max_pending_writes: Frames waiting for a writer before add_frame() blocks
+            memory_budget: Bytes of frames hybrid mode keeps in RAM (default: 1 GiB)
+            cache_bytes: Bytes of decoded frames kept for repeated reads, in the
+                         modes whose reads decode (0 disables the cache)
+            rss_limit: Process RSS in bytes above which hybrid mode keeps fewer
+                       frames in RAM (default: memory_budget plus 1 GiB)
+        """
         self.storage_mode = storage_mode
         self.session_id = str(uuid.uuid4())[:8]
-        self.frames = []  # List of frame metadata
+        # Display order, storage keys, delays, timestamps and change maps
+        self.index = FrameIndex()
         self.frame_dir = None
+        # Frames are added from the capture pipeline while the UI reads them
+        self.lock = threading.RLock()
+        # Frame buffers shared with the capture engine; stored frames hold a reference
+        self.buffer_pool = FrameBufferPool()
+        # Stable key of the next frame: never reused, unaffected by deletes
+        self.next_key = 0
+        # Decoded frames by key, so editor refreshes and repeated exports skip the decode
+        self.cache = FrameCache(cache_bytes)
+        if storage_mode not in STORAGE_MODES:
+            raise ValueError(f"Unknown storage mode {storage_mode!r}, expected one of {STORAGE_MODES}")
         
-        if storage_mode == "disk":
+        if storage_mode in ("disk", "arena", "hybrid"):
             # Create temporary directory for frames
             self.frame_dir = Path(tempfile.gettempdir()) / f"gifcap_frames_{self.session_id}"
             self.frame_dir.mkdir(parents=True, exist_ok=True)
             print(f"Frame storage: {self.frame_dir}")
-        else:
-            # RAM mode - store PIL Images directly
-            self.ram_frames = []
+        self.backend = self._create_backend(compress_level, writers, max_pending_writes, memory_budget,
+                                            rss_limit)
+    
+    def _create_backend(self, compress_level, writers, max_pending_writes, memory_budget, rss_limit):
+        """Pixel store for the storage mode"""
+        if self.storage_mode == "disk":
+            # PNG encoding happens off the store thread; frames stay readable meanwhile
+            return PngBackend(str(self.frame_dir), self.buffer_pool,
+                              compress_level=1 if compress_level is None else compress_level,
+                              writers=writers, max_pending=max_pending_writes)
+        if self.storage_mode == "arena":
+            from arena_storage import ArenaBackend
+            return ArenaBackend(str(self.frame_dir / "frames.arena"), compress_level=compress_level or 0)
+        if self.storage_mode == "delta":
+            from delta_storage import DeltaBackend
+            return DeltaBackend(compress_level=compress_level or 1)
+        if self.storage_mode == "tiles":
+            from tile_storage import TileBackend
+            return TileBackend()
+        if self.storage_mode == "hybrid":
+            from hybrid_storage import MEMORY_BUDGET, HybridBackend
+            return HybridBackend(str(self.frame_dir), self.buffer_pool,
+                                 memory_budget=memory_budget or MEMORY_BUDGET,
+                                 compress_level=1 if compress_level is None else compress_level,
+                                 writers=writers, max_pending=max_pending_writes, rss_limit=rss_limit)
+        return RamBackend(self.buffer_pool)
     
-    def add_frame(self, image, delay=100):
+    def add_frame(self, image, delay=100, timestamp=None, change=None, base_key=None):
         """
         Add a frame to storage
         
         Args:
-            image: PIL Image object
+            image: PIL Image or uint8 frame array (BGRA with 4 channels, RGB with 3).
+                   Arrays are kept as they are, without a copy - in RAM mode
+                   until the frame is deleted, in disk mode until it has been
+                   written - so the caller must not reuse their memory (pool
+                   buffers are retained meanwhile). The other modes copy them.
             delay: Frame delay in milliseconds
-        """
-        frame_num = len(self.frames)
+            timestamp: Monotonic capture time in seconds (None for manual captures)
+            change: FrameChange against the frame stored under base_key (None if unknown)
+            base_key: Storage key of the frame change was computed against (see
+                      append_frame()). Unless that is still the last frame, the
+                      change is dropped.
         
-        if self.storage_mode == "disk":
-            # Save to disk
-            frame_path = self.frame_dir / f"frame_{frame_num:05d}.png"
-            image.save(frame_path, "PNG")
-            
-            metadata = {
-                "frame_num": frame_num,
-                "delay": delay,
-                "path": str(frame_path)
-            }
-        else:
-            # Store in RAM
-            self.ram_frames.append(image.copy())
-            metadata = {
-                "frame_num": frame_num,
-                "delay": delay,
-                "path": None
-            }
+        Returns:
+            int: Position of the new frame
+        """
+        return self._append(image, delay, timestamp, change, base_key)[0]
+    
+    def append_frame(self, image, delay=100, timestamp=None, change=None, base_key=None):
+        """
+        add_frame() for the capture pipeline
         
-        self.frames.append(metadata)
-        return frame_num
+        Returns:
+            int: Storage key of the new frame, to pass as base_key with the
+            change of the frame after it
+        """
+        return self._append(image, delay, timestamp, change, base_key)[1]
+    
+    def _append(self, image, delay, timestamp, change, base_key):
+        """Store a frame and index it, returning (position, key)"""
+        with self.lock:
+            key = self.next_key
+            self.next_key += 1
+            count = len(self.index)
+            if change is not None and (count == 0 or self.index.key(count - 1) != base_key):
+                # Its base was deleted, or another frame (e.g. a manual capture) came after it
+                change = base_key = None
+            # Disk mode blocks here while its writers are busy
+            self.backend.put(key, image, change, base_key)
+            return self.index.append(key, delay, timestamp, change), key
+    
+    def _key(self, frame_num):
+        """Storage key of the frame at a position, or None if there is none"""
+        with self.lock:
+            if 0 <= frame_num < len(self.index):
+                return self.index.key(frame_num)
+            return None
+    
+    def _read(self, key, read):
+        """read(key), or None if the frame was deleted since its key was looked up"""
+        try:
+            return read(key)
+        except KeyError:
+            return None
+    
+    def _cached_array(self, key):
+        """Frame array from the cache, decoded and cached on a miss"""
+        return self.cache.get_or_load(key, self.backend.get_array)
     
     def get_frame(self, frame_num):
-        """Get a frame by number"""
-        if frame_num >= len(self.frames):
+        """Get a frame by number as a PIL Image (converted on demand)"""
+        key = self._key(frame_num)
+        if key is None:
             return None
+        if self.backend.decodes:
+            frame = self._read(key, self._cached_array)
+            return None if frame is None else frame_to_image(frame)
+        return self._read(key, self.backend.get_image)
+    
+    def get_frame_array(self, frame_num):
+        """
+        Get a frame by number as a uint8 array without converting it to PIL
         
-        if self.storage_mode == "disk":
-            path = self.frames[frame_num]["path"]
-            return Image.open(path)
-        else:
-            return self.ram_frames[frame_num]
+        Returns:
+            Array in the frame's native layout where the backend keeps it (BGRA
+            from X11 captures, RGB otherwise; disk frames are RGB), read-only
+            and only valid while the frame is stored - or None if the frame
+            doesn't exist
+        """
+        key = self._key(frame_num)
+        if key is None:
+            return None
+        return self._read(key, self._cached_array if self.backend.decodes else self.backend.get_array)
+    
+    def get_frame_path(self, frame_num):
+        """
+        Path of a frame's own image file, once it is complete (disk mode)
+        
+        Only waits for this frame's write, not for the whole queue.
+        
+        Returns:
+            str, or None if the mode has no per-frame files or the frame doesn't exist
+        """
+        key = self._key(frame_num)
+        if key is None:
+            return None
+        return self.backend.path(key)
+    
+    def flush(self, frame_nums=None, timeout=None):
+        """
+        Wait until frames are written to disk (no-op unless writes are asynchronous)
+        
+        Reads never need this, get_frame() and get_frame_array() serve frames
+        that are still being written from memory.
+        
+        Args:
+            frame_nums: Frames to wait for (default: all of them)
+            timeout: Seconds to wait at most
+        
+        Returns:
+            bool: True if the frames are on disk
+        """
+        with self.lock:
+            if frame_nums is None:
+                keys = None
+            else:
+                keys = [self.index.key(i) for i in frame_nums if 0 <= i < len(self.index)]
+        return self.backend.flush(keys, timeout)
+    
+    def compact(self):
+        """
+        Give the space of deleted frames back (arena mode; other modes free it on delete)
+        
+        Returns:
+            int: Bytes reclaimed
+        """
+        with self.lock:
+            return self.backend.compact()
+    
+    def stats(self):
+        """Storage mode, frame count, backend and frame cache counters, for display"""
+        return dict(self.backend.stats(), mode=self.storage_mode, frame_count=self.get_frame_count(),
+                    frame_cache=self.cache.stats())
     
     def get_frame_count(self):
         """Return total number of frames"""
-        return len(self.frames)
+        return len(self.index)
     
     def get_delay(self, frame_num):
         """Get delay for a specific frame"""
-        if frame_num < len(self.frames):
-            return self.frames[frame_num]["delay"]
+        with self.lock:
+            if 0 <= frame_num < len(self.index):
+                return self.index.delay(frame_num)
         return 100  # Default
     
+    def get_delays(self):
+        """Delays of all frames in order, as an int array (a copy)"""
+        with self.lock:
+            return self.index.delay_array().copy()
+    
+    def get_timestamp(self, frame_num):
+        """Get the monotonic capture time of a frame (None if unknown)"""
+        with self.lock:
+            if 0 <= frame_num < len(self.index):
+                return self.index.timestamp(frame_num)
+        return None
+    
+    def get_change(self, frame_num):
+        """
+        Get the tile change map of a frame against the previous one
+        
+        Returns:
+            FrameChange, or None for the first frame, manual captures and
+            frames whose predecessor was deleted
+        """
+        with self.lock:
+            if 0 <= frame_num < len(self.index):
+                return self.index.change(frame_num)
+        return None
+    
     def set_delay(self, frame_num, delay):
         """Set delay for a specific frame"""
-        if frame_num < len(self.frames):
-            self.frames[frame_num]["delay"] = delay
+        with self.lock:
+            if 0 <= frame_num < len(self.index):
+                self.index.set_delay(frame_num, delay)
+    
+    def set_all_delays(self, delay):
+        """Set the same delay for every frame"""
+        with self.lock:
+            self.index.set_all_delays(delay)
     
     def update_last_frame_delay(self, delay):
         """Update delay for the last frame in storage"""
-        if len(self.frames) > 0:
-            self.frames[-1]["delay"] = delay
+        with self.lock:
+            if len(self.index) > 0:
+                self.index.set_delay(len(self.index) - 1, delay)
+    
+    def _forget(self, keys):
+        """Delete the pixels of frames already removed from the index"""
+        keys = keys.tolist()
+        self.backend.delete_many(keys)
+        for key in keys:
+            self.cache.discard(key)
+        return len(keys)
     
     def delete_frame(self, frame_num):
         """Delete a specific frame"""
-        if frame_num >= len(self.frames):
-            return False
-        
-        if self.storage_mode == "disk":
-            # Delete file
-            path = Path(self.frames[frame_num]["path"])
-            if path.exists():
-                path.unlink()
-        else:
-            # Remove from RAM
-            del self.ram_frames[frame_num]
-        
-        # Remove metadata
-        del self.frames[frame_num]
-        
-        # Renumber remaining frames
-        for i, frame in enumerate(self.frames):
-            frame["frame_num"] = i
-        
-        return True
+        return self.delete_frames([frame_num]) == 1
     
     def delete_frames(self, frame_nums):
-        """Delete multiple frames (indices should be sorted descending)"""
-        for frame_num in sorted(frame_nums, reverse=True):
-            self.delete_frame(frame_num)
+        """
+        Delete frames at any positions, in any order, in one pass
+        
+        Returns:
+            int: Number of frames deleted
+        """
+        with self.lock:
+            # Keys of the other frames stay as they are, only positions shift
+            return self._forget(self.index.delete(frame_nums))
+    
+    def delete_range(self, start, stop=None, step=1):
+        """
+        Delete the frames of range(start, stop, step) in one pass, e.g.
+        delete_range(0, 10) for the first ten or delete_range(0, None, 2) for
+        every other frame
+        
+        Returns:
+            int: Number of frames deleted
+        """
+        with self.lock:
+            return self._forget(self.index.delete_range(start, stop, step))
     
     def get_all_frames(self):
         """Generator that yields (frame_image, delay) tuples"""
-        for i in range(len(self.frames)):
-            yield self.get_frame(i), self.frames[i]["delay"]
+        for i in range(len(self.index)):
+            yield self.get_frame(i), self.get_delay(i)
+    
+    def get_all_frame_arrays(self):
+        """Generator that yields (frame_array, delay) tuples, see get_frame_array()"""
+        for i in range(len(self.index)):
+            yield self.get_frame_array(i), self.get_delay(i)
     
     def cleanup(self):
         """Clean up temporary files"""
-        if self.storage_mode == "disk" and self.frame_dir and self.frame_dir.exists():
+        if getattr(self, "backend", None):
+            self.backend.close()
+            self.backend = None
+        if self.frame_dir and self.frame_dir.exists():
             try:
                 shutil.rmtree(self.frame_dir)
                 print(f"Cleaned up frame storage: {self.frame_dir}")
             except Exception as e:
                 print(f"Error cleaning up frames: {e}")
         
-        self.frames.clear()
-        if self.storage_mode == "ram":
-            self.ram_frames.clear()
+        self.index.clear()
+        self.cache.clear()
+        self.buffer_pool.clear()
     
     def __del__(self):
         """Cleanup on destruction"""
@@ -2,9 +2,9 @@
 GIF Encoder - Export frames to animated GIF
 """
 
-import imageio
 from PIL import Image
 import numpy as np
+from frame_convert import frame_to_image, frame_to_rgb_array
 
 
 class GifEncoder:
@@ -35,28 +35,28 @@ class GifEncoder:
             frames = []
             durations = []
             
-            for frame_img, delay_ms in self.frame_storage.get_all_frames():
-                # Ensure RGB mode
-                if frame_img.mode != "RGB":
-                    frame_img = frame_img.convert("RGB")
-                
-                # Apply color transformations if needed
+            for frame, delay_ms in self.frame_storage.get_all_frame_arrays():
+                # Apply color transformations if needed (full colour frames skip PIL)
                 if color_mode == "grayscale":
-                    frame_img = frame_img.convert("L").convert("RGB")
+                    frame = np.asarray(frame_to_image(frame).convert("L").convert("RGB"))
                 elif color_mode == "monochrome":
-                    frame_img = frame_img.convert("1").convert("RGB")
+                    frame = np.asarray(frame_to_image(frame).convert("1").convert("RGB"))
                 
-                # Convert to numpy array as RGB
-                frames.append(np.array(frame_img))
-                # Convert milliseconds to seconds for imageio
-                durations.append(delay_ms / 1000.0)
+                # RGB numpy array for imageio
+                frames.append(frame_to_rgb_array(frame))
+                # imageio's Pillow GIF writer takes milliseconds
+                durations.append(delay_ms)
+            
+            # Loaded on the first export, it isn't needed to start the app
+            import imageio
             
             # Write GIF using imageio - it will handle palette quantization globally
             imageio.mimsave(
                 output_path,
                 frames,
                 format='GIF',
-                duration=durations,
+                # Pillow rejects a list of durations for a single frame
+                duration=durations if len(durations) > 1 else durations[0],
                 loop=0,  # Infinite loop
             )
             
@@ -116,8 +116,8 @@ class GifEncoder:
             return 0
         
         # Get a sample frame
-        sample_frame, _ = next(self.frame_storage.get_all_frames())
-        width, height = sample_frame.size
+        sample_frame = self.frame_storage.get_frame_array(0)
+        height, width = sample_frame.shape[:2]
         
         # Rough estimation based on color mode
         if color_mode in ["quantize", "256"]:
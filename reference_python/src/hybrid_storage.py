@@ -0,0 +1,330 @@
+"""
+Hybrid Storage - Recent frames in RAM up to a memory budget, older ones spilled to disk
+"""
+
+import os
+import shutil
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from PIL import Image
+import numpy as np
+from frame_convert import frame_to_array, frame_to_image, read_only
+from storage_backends import PngBackend, StorageBackend
+
+# RAM for frames by default, like the original GifCam's cap
+MEMORY_BUDGET = 1 << 30
+
+# Process memory on top of the frame budget (interpreter, GUI, frame cache,
+# frames waiting for the disk writers) before RSS counts as high
+RSS_HEADROOM = 1 << 30
+
+# Seconds between resource checks
+CHECK_INTERVAL = 1.0
+
+# Below this much available system memory the budget shrinks to a quarter
+MIN_AVAILABLE_MEMORY = 512 << 20
+
+# Below this much free disk space spilled frames use the strongest PNG compression
+MIN_FREE_DISK = 2 << 30
+
+# Below this much free disk space nothing is spilled; frames are compressed in RAM instead
+DISK_RESERVE = 256 << 20
+
+# zlib level of frames compressed in RAM
+PACK_LEVEL = 6
+
+
+def process_rss():
+    """Resident memory of this process in bytes, or None where it can't be read"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def available_memory():
+    """Memory the system can still hand out in bytes, or None where it can't be read"""
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def frame_size(frame):
+    """Bytes a frame takes in memory"""
+    if isinstance(frame, Image.Image):
+        return frame.width * frame.height * len(frame.getbands())
+    return frame.nbytes
+
+
+class PackedFrame:
+    """A frame kept zlib compressed in RAM"""
+
+    __slots__ = ("shape", "data")
+
+    def __init__(self, frame):
+        array = np.ascontiguousarray(frame_to_array(frame))
+        self.shape = array.shape
+        self.data = zlib.compress(array, PACK_LEVEL)
+
+    @property
+    def nbytes(self):
+        return len(self.data)
+
+    def unpack(self):
+        return np.frombuffer(zlib.decompress(self.data), dtype=np.uint8).reshape(self.shape)
+
+
+class HybridBackend(StorageBackend):
+    """
+    Frames in RAM up to a memory budget, the least recently used spilled to disk
+
+    Short clips never touch the disk. Once the frames in RAM exceed the
+    budget, the least recently used ones (the oldest, unless the editor is
+    looking at them) go to a PngBackend, whose writer threads encode them in
+    the background while they stay readable.
+
+    Every CHECK_INTERVAL seconds the process RSS, available system memory and
+    free disk space are checked. Rather than failing when resources run low,
+    the storage gets more aggressive:
+
+    - Little available memory (or RSS above rss_limit): the budget shrinks to
+      a quarter, so more frames are spilled.
+    - Little free disk space: spilled frames use PNG compression level 9.
+    - Almost no free disk space: nothing more is spilled; frames over the
+      budget are zlib compressed in RAM instead. Compressed frames still
+      count toward the budget, and are the first to go to disk once there
+      is space again.
+    """
+
+    name = "hybrid"
+    decodes = True
+
+    def __init__(self, directory, buffer_pool, memory_budget=MEMORY_BUDGET, compress_level=1,
+                 writers=None, max_pending=8, rss_limit=None):
+        """
+        Args:
+            directory: Existing directory for spilled frame files
+            buffer_pool: Pool the captured frame buffers belong to
+            memory_budget: Bytes of frames kept in RAM
+            compress_level: PNG compression level of spilled frames, 0-9
+            writers: Writer threads (default: one per spare CPU core, at most 4)
+            max_pending: Spilled frames waiting for a writer before put() blocks
+            rss_limit: Process RSS in bytes above which memory counts as low
+                       (default: memory_budget + RSS_HEADROOM)
+        """
+        self.directory = directory
+        self.buffer_pool = buffer_pool
+        self.memory_budget = memory_budget
+        self.budget = memory_budget
+        self.compress_level = compress_level
+        self.rss_limit = memory_budget + RSS_HEADROOM if rss_limit is None else rss_limit
+        self.disk = PngBackend(directory, buffer_pool, compress_level, writers, max_pending)
+
+        self.lock = threading.Lock()
+        self.ram = OrderedDict()  # key -> frame as captured, least recently used first
+        self.packed = {}          # key -> PackedFrame
+        self.spilling = {}        # key -> frame (or PackedFrame) being packed or handed to the disk writers
+        self.dropped = set()      # Keys deleted while being spilled
+        self.on_disk = set()
+        self.ram_bytes = 0      # Frames in self.ram
+        self.packed_bytes = 0   # Frames in self.packed; the budget applies to both
+
+        self.spilled = 0
+        self.memory_low = False
+        self.disk_low = False
+        self.disk_full = False
+        self.last_check = 0.0
+        self.rss = None
+        self.available = None
+        self.disk_free = None
+
+    def _check_resources(self):
+        """Adjust budget and compression to the memory and disk space left"""
+        self.last_check = time.monotonic()
+        self.rss = process_rss()
+        self.available = available_memory()
+        try:
+            self.disk_free = shutil.disk_usage(self.directory).free
+        except OSError:
+            self.disk_free = None
+
+        memory_low = ((self.available is not None and self.available < MIN_AVAILABLE_MEMORY) or
+                      (self.rss_limit is not None and self.rss is not None and self.rss > self.rss_limit))
+        disk_low = self.disk_free is not None and self.disk_free < MIN_FREE_DISK
+        disk_full = self.disk_free is not None and self.disk_free < DISK_RESERVE
+
+        if memory_low != self.memory_low:
+            print("Frame storage: memory is low, keeping fewer frames in RAM" if memory_low
+                  else "Frame storage: memory recovered")
+        if disk_low != self.disk_low:
+            print("Frame storage: disk space is low, compressing spilled frames harder" if disk_low
+                  else "Frame storage: disk space recovered")
+        if disk_full != self.disk_full:
+            print("Frame storage: disk is almost full, compressing frames in RAM instead" if disk_full
+                  else "Frame storage: spilling frames to disk again")
+
+        self.memory_low, self.disk_low, self.disk_full = memory_low, disk_low, disk_full
+        self.budget = self.memory_budget // 4 if memory_low else self.memory_budget
+        self.disk.compress_level = 9 if disk_low else self.compress_level
+
+    def put(self, key, frame, change=None, base_key=None):
+        if isinstance(frame, Image.Image):
+            frame = frame.copy()
+        else:
+            # Pool buffers come back once the frame is deleted or written
+            self.buffer_pool.retain(frame)
+        with self.lock:
+            self.ram[key] = frame
+            self.ram_bytes += frame_size(frame)
+        if time.monotonic() - self.last_check >= CHECK_INTERVAL:
+            self._check_resources()
+        self._spill()
+
+    def _spill(self):
+        """Move frames out of RAM until the budget is met"""
+        while True:
+            with self.lock:
+                if self.ram_bytes + self.packed_bytes <= self.budget:
+                    return
+                if self.packed and not self.disk_full:
+                    # Packed while the disk was full: these go to disk first
+                    key = next(iter(self.packed))
+                    frame = self.packed.pop(key)
+                    self.packed_bytes -= frame.nbytes
+                elif self.ram:
+                    key, frame = self.ram.popitem(last=False)
+                    self.ram_bytes -= frame_size(frame)
+                else:
+                    return
+                pack = self.disk_full and not isinstance(frame, PackedFrame)
+                # Readable while it is compressed or handed to the writers
+                self.spilling[key] = frame
+
+            if pack:
+                self._pack(key, frame)
+                continue
+            if isinstance(frame, PackedFrame):
+                self._write(key, frame.unpack())
+            else:
+                self._write(key, frame)
+                # The disk writers hold their own reference until the file is written
+                self.buffer_pool.release(frame)
+
+    def _pack(self, key, frame):
+        """Compress a frame taken out of self.ram into self.packed"""
+        packed = PackedFrame(frame)
+        with self.lock:
+            del self.spilling[key]
+            if key in self.dropped:
+                self.dropped.discard(key)
+            else:
+                self.packed[key] = packed
+                self.packed_bytes += packed.nbytes
+        self.buffer_pool.release(frame)
+
+    def _write(self, key, frame):
+        """Hand a frame in self.spilling to the disk writers"""
+        # Blocks while the writers are busy; the frame stays readable meanwhile
+        self.disk.put(key, frame)
+        with self.lock:
+            del self.spilling[key]
+            if key in self.dropped:
+                self.dropped.discard(key)
+                self.disk.delete(key)
+            else:
+                self.on_disk.add(key)
+                self.spilled += 1
+
+    def _memory_frame(self, key):
+        """Frame if it is in memory, marking it recently used (lock held)"""
+        frame = self.ram.get(key)
+        if frame is not None:
+            self.ram.move_to_end(key)
+            return frame
+        frame = self.packed.get(key)
+        if frame is None:
+            frame = self.spilling.get(key)
+        if isinstance(frame, PackedFrame):
+            return frame.unpack()
+        return frame
+
+    def get_array(self, key):
+        with self.lock:
+            frame = self._memory_frame(key)
+            if frame is not None:
+                # Copied: the frame may be spilled and its buffer reused while the array is in use
+                return read_only(np.array(frame_to_array(frame)))
+        return self.disk.get_array(key)
+
+    def get_image(self, key):
+        with self.lock:
+            frame = self._memory_frame(key)
+            if frame is not None:
+                # Copied for the same reason as in get_array()
+                return frame_to_image(frame).copy()
+        return self.disk.get_image(key)
+
+    def delete(self, key):
+        with self.lock:
+            frame = self.ram.pop(key, None)
+            if frame is not None:
+                self.ram_bytes -= frame_size(frame)
+                self.buffer_pool.release(frame)
+                return
+            packed = self.packed.pop(key, None)
+            if packed is not None:
+                self.packed_bytes -= packed.nbytes
+                return
+            if key in self.spilling:
+                self.dropped.add(key)
+                return
+            self.on_disk.discard(key)
+        self.disk.delete(key)
+
+    def path(self, key):
+        with self.lock:
+            if key not in self.on_disk:
+                return None
+        return self.disk.path(key)
+
+    def flush(self, keys=None, timeout=None):
+        return self.disk.flush(keys, timeout)
+
+    def stats(self):
+        with self.lock:
+            stats = {
+                "ram_frames": len(self.ram),
+                "packed_frames": len(self.packed),
+                "disk_frames": len(self.on_disk),
+                "ram_bytes": self.ram_bytes,
+                "packed_bytes": self.packed_bytes,
+                "budget": self.budget,
+                "spilled": self.spilled,
+                "rss": self.rss,
+                "rss_limit": self.rss_limit,
+                "available_memory": self.available,
+                "disk_free": self.disk_free,
+                "memory_low": self.memory_low,
+                "disk_low": self.disk_low,
+                "disk_full": self.disk_full,
+            }
+        stats["disk"] = self.disk.stats()
+        return stats
+
+    def close(self):
+        self.disk.close()
+        with self.lock:
+            for frame in self.ram.values():
+                self.buffer_pool.release(frame)
+            self.ram.clear()
+            self.packed.clear()
+            self.on_disk.clear()
+            self.ram_bytes = self.packed_bytes = 0
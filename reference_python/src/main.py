@@ -2,15 +2,23 @@
 """
 GifCap - Linux Screen Recorder for GIFs
 Main application entry point
+
+`gifcap record ...` runs the headless command line recorder (see cli.py)
+without importing Qt; anything else starts the GUI.
 """
 
 import sys
-from PyQt6.QtWidgets import QApplication
-from PyQt6.QtCore import Qt
-from recorder_window import RecorderWindow
 
 
 def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "record":
+        from cli import main as cli_main
+        sys.exit(cli_main(sys.argv[1:]))
+    
+    from PyQt6.QtWidgets import QApplication
+    from PyQt6.QtCore import Qt
+    from recorder_window import RecorderWindow
+    
     # Enable high DPI scaling
     QApplication.setHighDpiScaleFactorRoundingPolicy(
         Qt.HighDpiScaleFactorRoundingPolicy.PassThrough
@@ -10,7 +10,12 @@ from typing import Any, Callable, Iterator, List, Optional, Tuple, Type, Union
 from .exception import ScreenShotError
 from .models import Monitor, Monitors
 from .screenshot import ScreenShot
-from .tools import to_png
+from .tools import blend_premultiplied, to_png
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional, the cursor is then blended pixel by pixel
+    np = None
 
 lock = Lock()
 
@@ -28,6 +33,7 @@ class MSSBase(metaclass=ABCMeta):
         display: Optional[Union[bytes, str]] = None,  # Linux only
         max_displays: int = 32,  # Mac only
         with_cursor: bool = False,
+        with_shm: bool = False,  # Linux only
     ) -> None:
         # pylint: disable=unused-argument
         self.cls_image: Type[ScreenShot] = ScreenShot
@@ -208,6 +214,14 @@ class MSSBase(metaclass=ABCMeta):
         if not overlap:
             return screenshot
 
+        if np is not None:
+            # XFixes cursor pixels are premultiplied
+            sprite = np.frombuffer(cursor.raw, dtype=np.uint8).reshape(ch, cw, 4)
+            frame = np.frombuffer(screenshot.raw, dtype=np.uint8).reshape(h, w, 4)
+            alpha = sprite[..., 3:].astype(np.uint16)
+            blend_premultiplied(frame, sprite[..., :3].astype(np.uint16), 255 - alpha, cx - x, cy - y)
+            return screenshot
+
         screen_data = screenshot.raw
         cursor_data = cursor.raw
 
@@ -5,6 +5,7 @@ Source: https://github.com/BoboTiG/python-mss
 import os
 from contextlib import suppress
 from ctypes import (
+    CDLL,
     CFUNCTYPE,
     POINTER,
     Structure,
@@ -14,6 +15,7 @@ from ctypes import (
     c_int32,
     c_long,
     c_short,
+    c_size_t,
     c_ubyte,
     c_uint,
     c_uint32,
@@ -23,10 +25,11 @@ from ctypes import (
     cast,
     cdll,
     create_string_buffer,
+    get_errno,
 )
 from ctypes.util import find_library
 from threading import current_thread, local
-from typing import Any, Tuple
+from typing import Any, Optional, Tuple
 
 from .base import MSSBase, lock
 from .exception import ScreenShotError
@@ -39,6 +42,15 @@ __all__ = ("MSS",)
 PLAINMASK = 0x00FFFFFF
 ZPIXMAP = 2
 
+# System V shared memory flags, see shmget(2) and shmctl(2)
+IPC_PRIVATE = 0
+IPC_CREAT = 0o1000
+IPC_RMID = 0
+
+# XShm images are cached by region size, keep the oldest ones from piling up
+# when the capture region is resized.
+SHM_MAX_SEGMENTS = 4
+
 
 class Display(Structure):
     """
@@ -111,6 +123,20 @@ class XImage(Structure):
     ]
 
 
+class XShmSegmentInfo(Structure):
+    """
+    Shared memory segment shared between the client and the X server.
+    /usr/include/X11/extensions/XShm.h
+    """
+
+    _fields_ = [
+        ("shmseg", c_ulong),  # resource id
+        ("shmid", c_int),  # kernel id
+        ("shmaddr", c_void_p),  # address in client
+        ("readOnly", c_int),  # how the server should attach it
+    ]
+
+
 class XRRCrtcInfo(Structure):
     """
     Structure that contains CRTC information.
@@ -187,7 +213,9 @@ class XWindowAttributes(Structure):
 
 
 _ERROR = {}
+_LIBC = find_library("c")
 _X11 = find_library("X11")
+_XEXT = find_library("Xext")
 _XFIXES = find_library("Xfixes")
 _XRANDR = find_library("Xrandr")
 
@@ -235,7 +263,7 @@ def _validate(retval: int, func: Any, args: Tuple[Any, Any], /) -> Tuple[Any, An
 # This is a dict:
 #    cfunction: (attr, argtypes, restype)
 #
-# Available attr: xfixes, xlib, xrandr.
+# Available attr: xext, xfixes, xlib, xrandr.
 #
 # Note: keep it sorted by cfunction.
 CFUNCTIONS: CFunctions = {
@@ -257,16 +285,40 @@ CFUNCTIONS: CFunctions = {
     "XRRGetScreenResources": ("xrandr", [POINTER(Display), POINTER(Display)], POINTER(XRRScreenResources)),
     "XRRGetScreenResourcesCurrent": ("xrandr", [POINTER(Display), POINTER(Display)], POINTER(XRRScreenResources)),
     "XSetErrorHandler": ("xlib", [c_void_p], c_void_p),
+    "XShmAttach": ("xext", [POINTER(Display), POINTER(XShmSegmentInfo)], c_int),
+    "XShmCreateImage": (
+        "xext",
+        [POINTER(Display), c_void_p, c_uint, c_int, c_void_p, POINTER(XShmSegmentInfo), c_uint, c_uint],
+        POINTER(XImage),
+    ),
+    "XShmDetach": ("xext", [POINTER(Display), POINTER(XShmSegmentInfo)], c_int),
+    "XShmGetImage": ("xext", [POINTER(Display), POINTER(Display), POINTER(XImage), c_int, c_int, c_ulong], c_int),
+    "XShmQueryExtension": ("xext", [POINTER(Display)], c_int),
+    "XSync": ("xlib", [POINTER(Display), c_int], c_int),
 }
 
 
+class ShmSegment:
+    """
+    An XShm image attached to the X server, reused across grabs of the same size.
+    The pixels are exposed through *buffer* without any copy.
+    """
+
+    __slots__ = {"buffer", "info", "ximage"}
+
+    def __init__(self, info: XShmSegmentInfo, ximage: Any, buffer: memoryview, /) -> None:
+        self.info = info
+        self.ximage = ximage
+        self.buffer = buffer
+
+
 class MSS(MSSBase):
     """
     Multiple ScreenShots implementation for GNU/Linux.
     It uses intensively the Xlib and its Xrandr extension.
     """
 
-    __slots__ = {"xfixes", "xlib", "xrandr", "_handles"}
+    __slots__ = {"libc", "with_shm", "xext", "xfixes", "xlib", "xrandr", "_handles"}
 
     def __init__(self, /, **kwargs: Any) -> None:
         """GNU/Linux initialisations."""
@@ -279,6 +331,8 @@ class MSS(MSSBase):
         self._handles.drawable = None
         self._handles.original_error_handler = None
         self._handles.root = None
+        self._handles.shm_enabled = False
+        self._handles.shm_segments = {}
 
         display = kwargs.get("display", b"")
         if not display:
@@ -301,6 +355,16 @@ class MSS(MSSBase):
             raise ScreenShotError("No Xrandr extension found.")
         self.xrandr = cdll.LoadLibrary(_XRANDR)
 
+        # XShm is optional: without it (or without libc) grabs go through XGetImage()
+        self.with_shm = kwargs.get("with_shm", False)
+        if self.with_shm:
+            if _XEXT and _LIBC:
+                self.xext = cdll.LoadLibrary(_XEXT)
+                self.libc = CDLL(_LIBC, use_errno=True)
+                self._set_libc_functions()
+            else:
+                self.with_shm = False
+
         if self.with_cursor:
             if _XFIXES:
                 self.xfixes = cdll.LoadLibrary(_XFIXES)
@@ -325,6 +389,9 @@ class MSS(MSSBase):
         #     expected LP_Display instance instead of LP_XWindowAttributes
         self._handles.drawable = cast(self._handles.root, POINTER(Display))
 
+        if self.with_shm:
+            self._handles.shm_enabled = self._is_shm_available()
+
     def close(self) -> None:
         # Remove our error handler
         if self._handles.original_error_handler:
@@ -338,6 +405,7 @@ class MSS(MSSBase):
 
         # Clean-up
         if self._handles.display:
+            self._release_shm_segments()
             self.xlib.XCloseDisplay(self._handles.display)
             self._handles.display = None
             self._handles.drawable = None
@@ -365,11 +433,20 @@ class MSS(MSSBase):
                 return False
             return True
 
+    def _is_shm_available(self) -> bool:
+        """Return True if the MIT-SHM extension can be used with the current display."""
+        try:
+            self.xext.XShmQueryExtension(self._handles.display)
+        except ScreenShotError:
+            return False
+        return True
+
     def _set_cfunctions(self) -> None:
         """Set all ctypes functions and attach them to attributes."""
 
         cfactory = self._cfactory
         attrs = {
+            "xext": getattr(self, "xext", None),
             "xfixes": getattr(self, "xfixes", None),
             "xlib": self.xlib,
             "xrandr": self.xrandr,
@@ -379,6 +456,15 @@ class MSS(MSSBase):
                 errcheck = None if func == "XSetErrorHandler" else _validate
                 cfactory(attrs[attr], func, argtypes, restype, errcheck=errcheck)
 
+    def _set_libc_functions(self) -> None:
+        """Set the System V shared memory functions, they report errors through errno."""
+
+        cfactory = self._cfactory
+        cfactory(self.libc, "shmat", [c_int, c_void_p, c_int], c_void_p)
+        cfactory(self.libc, "shmctl", [c_int, c_int, c_void_p], c_int)
+        cfactory(self.libc, "shmdt", [c_void_p], c_int)
+        cfactory(self.libc, "shmget", [c_int, c_size_t, c_int], c_int)
+
     def _monitors_impl(self) -> None:
         """Get positions of monitors. It will populate self._monitors."""
 
@@ -424,6 +510,16 @@ class MSS(MSSBase):
     def _grab_impl(self, monitor: Monitor, /) -> ScreenShot:
         """Retrieve all pixels from a monitor. Pixels have to be RGB."""
 
+        if self._handles.shm_enabled:
+            segment = self._shm_segment(monitor["width"], monitor["height"])
+            if segment:
+                return self._grab_impl_xshm(monitor, segment)
+
+        return self._grab_impl_xgetimage(monitor)
+
+    def _grab_impl_xgetimage(self, monitor: Monitor, /) -> ScreenShot:
+        """Retrieve all pixels from a monitor using a new XImage for every call."""
+
         ximage = self.xlib.XGetImage(
             self._handles.display,
             self._handles.drawable,
@@ -451,6 +547,113 @@ class MSS(MSSBase):
 
         return self.cls_image(data, monitor)
 
+    def _grab_impl_xshm(self, monitor: Monitor, segment: ShmSegment, /) -> ScreenShot:
+        """
+        Retrieve all pixels from a monitor into a shared memory segment.
+
+        The returned ScreenShot does not own its data: it is a view on the segment
+        and will be overwritten by the next grab of the same size.
+        """
+
+        self.xext.XShmGetImage(
+            self._handles.display,
+            self._handles.drawable,
+            segment.ximage,
+            monitor["left"],
+            monitor["top"],
+            PLAINMASK,
+        )
+        return self.cls_image(segment.buffer, monitor)
+
+    def _shm_segment(self, width: int, height: int, /) -> Optional[ShmSegment]:
+        """
+        Return the XShm segment used to grab a *width* x *height* region, creating it if needed.
+        If the server cannot attach the segment (remote display for instance), XShm is disabled
+        and None is returned so that the caller falls back to XGetImage().
+        """
+
+        segments = self._handles.shm_segments
+        segment = segments.get((width, height))
+        if segment:
+            return segment
+
+        while len(segments) >= SHM_MAX_SEGMENTS:
+            self._release_shm_segment(segments.pop(next(iter(segments))))
+
+        try:
+            segment = self._create_shm_segment(width, height)
+        except ScreenShotError:
+            self._handles.shm_enabled = False
+            return None
+
+        segments[(width, height)] = segment
+        return segment
+
+    def _create_shm_segment(self, width: int, height: int, /) -> ShmSegment:
+        """Create a shared memory segment and attach it to the X server."""
+
+        display = self._handles.display
+        libc = self.libc
+
+        gwa = XWindowAttributes()
+        self.xlib.XGetWindowAttributes(display, self._handles.root, byref(gwa))
+
+        info = XShmSegmentInfo()
+        ximage = self.xext.XShmCreateImage(display, gwa.visual, gwa.depth, ZPIXMAP, None, byref(info), width, height)
+        if not ximage:
+            raise ScreenShotError("XShmCreateImage() failed")
+
+        image = ximage.contents
+        if image.bits_per_pixel != 32:
+            self.xlib.XDestroyImage(ximage)
+            raise ScreenShotError(f"[XShm] bits per pixel value not (yet?) implemented: {image.bits_per_pixel}.")
+
+        size = image.bytes_per_line * image.height
+        info.shmid = libc.shmget(IPC_PRIVATE, size, IPC_CREAT | 0o600)
+        if info.shmid < 0:
+            self.xlib.XDestroyImage(ximage)
+            raise ScreenShotError("shmget() failed", details={"errno": get_errno()})
+
+        info.shmaddr = libc.shmat(info.shmid, None, 0)
+        if info.shmaddr in {None, c_void_p(-1).value}:
+            libc.shmctl(info.shmid, IPC_RMID, None)
+            self.xlib.XDestroyImage(ximage)
+            raise ScreenShotError("shmat() failed", details={"errno": get_errno()})
+
+        image.data = info.shmaddr
+        info.readOnly = 0
+
+        try:
+            # XSync() makes sure a BadAccess from a remote server is reported now
+            self.xext.XShmAttach(display, byref(info))
+            self.xlib.XSync(display, 0)
+        except ScreenShotError:
+            libc.shmdt(info.shmaddr)
+            self.xlib.XDestroyImage(ximage)
+            raise
+        finally:
+            # The segment is destroyed once both the client and the server detached it
+            libc.shmctl(info.shmid, IPC_RMID, None)
+
+        buffer = memoryview((c_ubyte * size).from_address(info.shmaddr)).cast("B")
+        return ShmSegment(info, ximage, buffer)
+
+    def _release_shm_segment(self, segment: ShmSegment, /) -> None:
+        """Detach a segment from the X server and unmap it."""
+
+        with suppress(ScreenShotError):
+            self.xext.XShmDetach(self._handles.display, byref(segment.info))
+            self.xlib.XSync(self._handles.display, 0)
+        self.xlib.XDestroyImage(segment.ximage)
+        self.libc.shmdt(segment.info.shmaddr)
+
+    def _release_shm_segments(self) -> None:
+        """Release all shared memory segments of the current thread."""
+
+        segments = getattr(self._handles, "shm_segments", {})
+        while segments:
+            self._release_shm_segment(segments.popitem()[1])
+
     def _cursor_impl(self) -> ScreenShot:
         """Retrieve all cursor data. Pixels have to be RGB."""
 
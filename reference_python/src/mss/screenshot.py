@@ -8,6 +8,11 @@ from typing import Any, Dict, Iterator, Optional, Type
 from .exception import ScreenShotError
 from .models import Monitor, Pixel, Pixels, Pos, Size
 
+try:
+    import numpy as np
+except ImportError:  # numpy is optional, array accessors are then unavailable
+    np = None
+
 
 class ScreenShot:
     """
@@ -27,6 +32,8 @@ class ScreenShot:
 
         #: Bytearray of the raw BGRA pixels retrieved by ctypes
         #: OS independent implementations.
+        #: With XShm (GNU/Linux, ``with_shm=True``) it is a memoryview on a shared
+        #: segment that is reused, hence overwritten, by the next grab of the same size.
         self.raw = data
 
         #: NamedTuple of the screen shot coordinates.
@@ -54,6 +61,26 @@ class ScreenShot:
             "data": self.raw,
         }
 
+    @property
+    def array(self) -> Any:
+        """
+        BGRA pixels as a (height, width, 4) uint8 numpy array.
+        It is a view on raw: no copy is made, and writes go to raw.
+        """
+
+        if np is None:
+            raise ScreenShotError("numpy is required for ScreenShot.array.")
+        return np.asarray(self)
+
+    @property
+    def rgb_array(self) -> Any:
+        """
+        RGB pixels as a new (height, width, 3) uint8 numpy array.
+        Vectorised equivalent of `rgb` and `pixels`.
+        """
+
+        return np.ascontiguousarray(self.array[..., 2::-1])
+
     @classmethod
     def from_size(cls: Type["ScreenShot"], data: bytearray, width: int, height: int, /) -> "ScreenShot":
         """Instantiate a new class given only screen shot's data and size."""
@@ -95,7 +122,9 @@ class ScreenShot:
         :return bytes: RGB pixels.
         """
 
-        if not self.__rgb:
+        if not self.__rgb and np is not None:
+            self.__rgb = self.rgb_array.tobytes()
+        elif not self.__rgb:
             rgb = bytearray(self.height * self.width * 3)
             raw = self.raw
             rgb[::3] = raw[2::4]
@@ -125,6 +154,10 @@ class ScreenShot:
         """
 
         try:
+            if np is not None and not self.__pixels:
+                # Read the one pixel instead of building the whole list of tuples
+                blue, green, red = self.array[coord_y, coord_x, :3].tolist()
+                return red, green, blue
             return self.pixels[coord_y][coord_x]  # type: ignore
         except IndexError as exc:
             raise ScreenShotError(f"Pixel location ({coord_x}, {coord_y}) is out of range.") from exc
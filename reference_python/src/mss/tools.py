@@ -6,7 +6,7 @@ Source: https://github.com/BoboTiG/python-mss
 import os
 import struct
 import zlib
-from typing import Optional, Tuple
+from typing import Any, Optional, Tuple
 
 
 def to_png(data: bytes, size: Tuple[int, int], /, *, level: int = 6, output: Optional[str] = None) -> Optional[bytes]:
@@ -62,3 +62,32 @@ def to_png(data: bytes, size: Tuple[int, int], /, *, level: int = 6, output: Opt
         os.fsync(fileh.fileno())
 
     return None
+
+
+def blend_premultiplied(frame: Any, color: Any, inv_alpha: Any, left: int, top: int, /) -> bool:
+    """
+    Blend a premultiplied sprite over a numpy frame, in place.
+
+    Only the overlapping part of the sprite is touched, so the cost depends on
+    the sprite size and not on the frame size.
+
+    :param frame: Writable (height, width, channels) uint8 array.
+    :param color: (h, w, 3) uint16 premultiplied colour, in the frame's channel order.
+    :param inv_alpha: (h, w, 1) uint16 array of 255 - alpha.
+    :param int left: Sprite position in frame coordinates, may be negative.
+    :param int top: Sprite position in frame coordinates, may be negative.
+    :return bool: False if the sprite lies entirely outside the frame.
+    """
+    height, width = frame.shape[:2]
+    sprite_height, sprite_width = color.shape[:2]
+
+    x1, y1 = max(left, 0), max(top, 0)
+    x2, y2 = min(left + sprite_width, width), min(top + sprite_height, height)
+    if x1 >= x2 or y1 >= y2:
+        return False
+
+    rows, cols = slice(y1 - top, y2 - top), slice(x1 - left, x2 - left)
+    dest = frame[y1:y2, x1:x2, :3]
+    # dst = src + dst * (1 - alpha), rounded; stays within uint16
+    dest[...] = color[rows, cols] + (dest * inv_alpha[rows, cols] + 127) // 255
+    return True
@@ -0,0 +1,151 @@
+"""
+Recorder - Qt-free recording API: capture a region into FrameStorage and encode it to GIF
+"""
+
+import threading
+from capture_core import CaptureCore
+from capture_pipeline import MERGE
+from frame_storage import FrameStorage
+from gif_encoder import GifEncoder
+
+
+class Recorder:
+    """
+    Record a screen region without any UI
+
+    Frames go through the same grab -> diff -> store pipeline as the GUI and
+    end up in a FrameStorage, ready for Encoder:
+
+        with Recorder((0, 0, 640, 480), fps=20) as recorder:
+            recorder.record(5)
+            Encoder(recorder.storage).save("out.gif")
+    """
+
+    def __init__(self, region, fps=30, storage_mode="disk", capture_cursor=True,
+                 capture_mode="poll", queue_policy=MERGE, adaptive_rate=True, storage=None,
+                 source=None, output_scale=1.0):
+        """
+        Args:
+            region: (x, y, width, height) in global screen coordinates
+            fps: Capture frame rate (clamped to 1-60 like the GUI)
+            storage_mode: One of STORAGE_MODES, used when no storage is given
+            capture_cursor: Draw the cursor into the frames
+            capture_mode: "poll" or "damage" (X11 only)
+            queue_policy: Full-queue policy of the pipeline: block, drop_newest or merge
+            adaptive_rate: Lower the rate on static screens and when capture falls behind
+            storage: Existing FrameStorage to record into; the recorder owns it
+                     from then on and cleans it up in close(), or right away
+                     if construction fails
+            source: CaptureSource to record from (e.g. capture_sources.SyntheticSource
+                    for headless runs); by default the session's screen
+            output_scale: Frame size relative to the region, e.g. 0.5 for half size
+        """
+        self.storage = storage or FrameStorage(storage_mode)
+        try:
+            self.core = CaptureCore(self.storage, source=source)
+            if self.core.backend_error:
+                raise RuntimeError(self.core.backend_error)
+            self.core.set_capture_region(*region)
+            self.core.set_fps(fps)
+            self.core.capture_cursor = capture_cursor
+            self.core.capture_mode = capture_mode
+            self.core.queue_policy = queue_policy
+            self.core.adaptive_rate = adaptive_rate
+            if not self.core.set_output_scale(output_scale):
+                raise ValueError(f"Invalid output scale: {output_scale}")
+        except Exception:
+            # The storage is ours like after close(): don't leave its files and writers behind
+            self.storage.cleanup()
+            raise
+
+        # Optional callback(frame_count), called from the store thread
+        self.on_frame = None
+        self.core.on_frame_captured = self._frame_captured
+        self._stop_requested = threading.Event()
+
+    def _frame_captured(self, frame_count):
+        if self.on_frame:
+            self.on_frame(frame_count)
+
+    @property
+    def frame_count(self):
+        """Number of frames stored so far"""
+        return self.storage.get_frame_count()
+
+    @property
+    def is_recording(self):
+        return self.core.is_recording
+
+    def start(self):
+        """
+        Start recording in the background
+
+        Returns:
+            bool: True if recording started
+        """
+        self._stop_requested.clear()
+        return self.core.start_recording()
+
+    def stop(self):
+        """Stop recording; frames still in the pipeline are stored first"""
+        if self.core.is_recording:
+            self.core.stop_recording()
+
+    def request_stop(self):
+        """Make a running record() return early (safe to call from any thread)"""
+        self._stop_requested.set()
+
+    def record(self, duration=None):
+        """
+        Record for a fixed time and stop
+
+        Args:
+            duration: Seconds to record, or None to record until request_stop()
+                      or KeyboardInterrupt
+
+        Returns:
+            int: Number of frames stored
+        """
+        if not self.start():
+            return 0
+        try:
+            self._stop_requested.wait(duration)
+        finally:
+            self.stop()
+        return self.frame_count
+
+    def close(self):
+        """Stop recording and delete the stored frames"""
+        self.stop()
+        self.core.change_detector.close()
+        if self.core.cursor_capture:
+            self.core.cursor_capture.close()
+        self.storage.cleanup()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class Encoder:
+    """Encode the frames of a FrameStorage to an animated GIF"""
+
+    def __init__(self, storage, color_mode="quantize"):
+        """
+        Args:
+            storage: FrameStorage holding the frames (e.g. Recorder.storage)
+            color_mode: "quantize", "256", "grayscale" or "monochrome"
+        """
+        self.storage = storage
+        self.color_mode = color_mode
+
+    def save(self, output_path):
+        """
+        Write the GIF
+
+        Returns:
+            bool: True if successful
+        """
+        return GifEncoder(self.storage).export(output_path, color_mode=self.color_mode)
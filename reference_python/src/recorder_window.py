@@ -2,18 +2,21 @@
 Recorder Window - Main window with transparent cutout and controls
 """
 
+import threading
 from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QPushButton, 
                               QLabel, QSpinBox, QFileDialog, QMessageBox, QCheckBox)
-from PyQt6.QtCore import Qt, QRect, QPoint
+from PyQt6.QtCore import Qt, QRect, QPoint, pyqtSignal
 from PyQt6.QtGui import QRegion, QPainter, QColor, QPen
 from settings_manager import settings
-from frame_storage import FrameStorage
-from capture_engine import CaptureEngine
-from gif_encoder import GifEncoder
-from editor_window import EditorWindow
+
+# The capture stack (numpy, PIL, mss), the encoder (imageio) and the editor are
+# imported on first use, so the window shows as soon as Qt is up.
 
 
 class RecorderWindow(QWidget):
+    # Emitted by the background loader once the capture modules are imported
+    capture_modules_loaded = pyqtSignal()
+    
     def __init__(self):
         super().__init__()
         
@@ -26,16 +29,12 @@ class RecorderWindow(QWidget):
         height = settings.get("window_height", 300)
         self.resize(width, height)
         
-        # Recording state
-        self.frame_storage = FrameStorage(storage_mode=settings.get("storage_mode", "disk"))
-        self.capture_engine = CaptureEngine(self.frame_storage)
-        self.gif_encoder = GifEncoder(self.frame_storage)
+        # Recording state, created by init_capture() once its modules are loaded
+        self.frame_storage = None
+        self.capture_engine = None
+        self.gif_encoder = None
         self.editor_window = None
         
-        # Connect signals
-        self.capture_engine.frame_captured.connect(self.on_frame_captured)
-        self.capture_engine.recording_stopped.connect(self.on_recording_stopped)
-        
         # UI state
         self.is_recording = False
         self.frame_count = 0
@@ -46,14 +45,57 @@ class RecorderWindow(QWidget):
         self.init_ui()
         
         # Set FPS from settings
-        fps = settings.get("fps", 30)
-        self.fps_spinbox.setValue(fps)
-        self.capture_engine.set_fps(fps)
+        self.fps_spinbox.setValue(settings.get("fps", 30))
         
         # Set cursor capture from settings (default enabled)
-        capture_cursor = settings.get("capture_cursor", True)
-        self.cursor_checkbox.setChecked(capture_cursor)
-        self.capture_engine.capture_cursor = capture_cursor
+        self.cursor_checkbox.setChecked(settings.get("capture_cursor", True))
+        
+        # Import the capture stack in the background; Rec/Frame load it
+        # synchronously if they're clicked before it's ready
+        self.capture_modules_loaded.connect(self.init_capture)
+        threading.Thread(target=self._load_capture_modules, name="gifcap-loader", daemon=True).start()
+    
+    def _load_capture_modules(self):
+        """Loader thread: import the capture modules"""
+        import capture_engine  # noqa: F401
+        import frame_storage  # noqa: F401
+        self.capture_modules_loaded.emit()
+    
+    def init_capture(self):
+        """Create the frame storage and capture engine (once)"""
+        if self.capture_engine is not None:
+            return
+        from frame_storage import FrameStorage
+        from capture_engine import CaptureEngine
+        
+        storage_mode = settings.get("storage_mode", "disk")
+        if storage_mode == "arena":
+            compress_level = settings.get("arena_compress_level", 0)
+        elif storage_mode in ("disk", "hybrid"):
+            compress_level = settings.get("png_compress_level", 1)
+        else:
+            compress_level = None
+        self.frame_storage = FrameStorage(storage_mode=storage_mode, compress_level=compress_level,
+                                          memory_budget=settings.get("memory_budget_mb", 1024) << 20,
+                                          rss_limit=(settings.get("rss_limit_mb", 0) << 20) or None,
+                                          cache_bytes=settings.get("frame_cache_mb", 256) << 20)
+        # Backends are probed on a background thread, recording waits for the result
+        self.capture_engine = CaptureEngine(self.frame_storage, probe=False)
+        self.capture_engine.capture_mode = settings.get("capture_mode", "poll")
+        self.capture_engine.queue_policy = settings.get("queue_policy", "merge")
+        self.capture_engine.adaptive_rate = settings.get("adaptive_rate", True)
+        self.capture_engine.set_output_scale(settings.get("output_scale", 1.0))
+        self.capture_engine.set_fps(self.fps_spinbox.value())
+        self.capture_engine.capture_cursor = self.cursor_checkbox.isChecked()
+        threading.Thread(target=self.capture_engine.probe_backends, name="gifcap-probe", daemon=True).start()
+        
+        # Connect signals (queued: the engine emits them from its capture thread)
+        queued = Qt.ConnectionType.QueuedConnection
+        self.capture_engine.frame_captured.connect(self.on_frame_captured, queued)
+        self.capture_engine.recording_stopped.connect(self.on_recording_stopped, queued)
+        self.capture_engine.pipeline_stats.connect(self.on_pipeline_stats, queued)
+        
+        self.update_capture_region()
     
     def init_ui(self):
         """Initialize the user interface"""
@@ -195,6 +237,12 @@ class RecorderWindow(QWidget):
         self.frame_counter_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
         layout.addWidget(self.frame_counter_label)
         
+        # Capture pipeline health (queue depths in the tooltip)
+        self.dropped_label = QLabel("Dropped: 0")
+        self.dropped_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.dropped_label.setStyleSheet("font-size: 10px;")
+        layout.addWidget(self.dropped_label)
+        
         layout.addStretch()
         
         panel.setLayout(layout)
@@ -213,6 +261,9 @@ class RecorderWindow(QWidget):
     
     def update_capture_region(self):
         """Update the screen capture region based on cutout position"""
+        if self.capture_engine is None:
+            return  # Set once the engine exists
+        
         # Get the global position and size of the cutout widget
         cutout_global_pos = self.cutout_widget.mapToGlobal(self.cutout_widget.rect().topLeft())
         cutout_size = self.cutout_widget.size()
@@ -226,13 +277,15 @@ class RecorderWindow(QWidget):
     
     def on_fps_changed(self, value):
         """Handle FPS spinbox change"""
-        self.capture_engine.set_fps(value)
+        if self.capture_engine:
+            self.capture_engine.set_fps(value)
         settings.set("fps", value)
     
     def on_cursor_changed(self, state):
         """Handle cursor capture checkbox change"""
         capture_cursor = (state == Qt.CheckState.Checked.value)
-        self.capture_engine.capture_cursor = capture_cursor
+        if self.capture_engine:
+            self.capture_engine.capture_cursor = capture_cursor
         settings.set("capture_cursor", capture_cursor)
         print(f"Cursor capture {'enabled' if capture_cursor else 'disabled'}")
     
@@ -256,6 +309,7 @@ class RecorderWindow(QWidget):
             self.rec_button.setStyleSheet(self.rec_button.styleSheet())
         else:
             # Start recording
+            self.init_capture()
             self.update_capture_region()
             if self.capture_engine.start_recording():
                 self.is_recording = True
@@ -265,6 +319,7 @@ class RecorderWindow(QWidget):
     
     def capture_frame(self):
         """Capture a single frame"""
+        self.init_capture()
         self.update_capture_region()
         self.capture_engine.capture_single_frame()
     
@@ -275,6 +330,30 @@ class RecorderWindow(QWidget):
         self.edit_button.setEnabled(self.frame_count > 0)
         self.save_button.setEnabled(self.frame_count > 0)
     
+    def on_pipeline_stats(self, stats):
+        """Show dropped frames and queue depths of the capture pipeline"""
+        dropped = sum(stage.get("dropped", 0) + stage.get("merged", 0) for stage in stats.values())
+        self.dropped_label.setText(f"Dropped: {dropped}")
+        
+        lines = []
+        for name in ("diff", "store"):
+            if name in stats:
+                stage = stats[name]
+                lines.append(f"{name}: {stage['depth']}/{stage['capacity']} queued, "
+                             f"{stage['dropped']} dropped, {stage['merged']} merged")
+        lines.append(f"grab: {stats.get('grab', {}).get('skipped', 0)} ticks skipped")
+        if "scheduler" in stats:
+            scheduler = stats["scheduler"]
+            lines.append(f"rate: {scheduler['fps']:g}/{scheduler['target_fps']:g} fps ({scheduler['reason']})")
+        if "pool" in stats:
+            pool = stats["pool"]
+            lines.append(f"buffers: {pool['in_use']} in use (peak {pool['high_water']}), "
+                         f"{pool['hit_rate']:.0%} reused")
+        if "storage" in stats:
+            from frame_storage import describe_stats
+            lines.append(describe_stats(stats["storage"]))
+        self.dropped_label.setToolTip("\n".join(lines))
+    
     def on_recording_stopped(self):
         """Handle recording stopped signal"""
         self.frame_count = self.frame_storage.get_frame_count()
@@ -285,6 +364,7 @@ class RecorderWindow(QWidget):
         if self.frame_count == 0:
             return
         
+        from editor_window import EditorWindow
         self.editor_window = EditorWindow(self.frame_storage)
         self.editor_window.frames_modified.connect(self.on_frames_modified)
         self.editor_window.show()
@@ -316,6 +396,9 @@ class RecorderWindow(QWidget):
             settings.set("last_save_dir", os.path.dirname(file_path))
             
             # Export GIF
+            if self.gif_encoder is None:
+                from gif_encoder import GifEncoder
+                self.gif_encoder = GifEncoder(self.frame_storage)
             success = self.gif_encoder.export(file_path, color_mode="quantize")
             
             if success:
@@ -330,6 +413,7 @@ class RecorderWindow(QWidget):
         settings.set("window_height", self.height())
         
         # Cleanup
-        self.frame_storage.cleanup()
+        if self.frame_storage:
+            self.frame_storage.cleanup()
         
         event.accept()
@@ -9,10 +9,9 @@ from pathlib import Path
 
 class SettingsManager:
     def __init__(self):
-        # Use XDG config directory
-        config_dir = Path.home() / ".config" / "gifcap"
-        config_dir.mkdir(parents=True, exist_ok=True)
-        self.config_file = config_dir / "settings.json"
+        # Use XDG config directory (created on the first save)
+        self.config_dir = Path.home() / ".config" / "gifcap"
+        self.config_file = self.config_dir / "settings.json"
         
         # Default settings
         self.defaults = {
@@ -21,10 +20,27 @@ class SettingsManager:
             "window_height": 300,
             "last_save_dir": str(Path.home()),
             "capture_cursor": False,
-            "storage_mode": "disk"  # "disk" or "ram"
+            "storage_mode": "disk",  # "disk", "ram", "arena", "delta", "tiles" or "hybrid"
+            "capture_mode": "poll",  # "poll" or "damage" (X11 only, grab on XDamage events)
+            "queue_policy": "merge",  # Full capture queue: "block", "drop_newest" or "merge"
+            "adaptive_rate": True,  # Slow down on static screens and when capture falls behind
+            "output_scale": 1.0,  # Frame size relative to the region (0.5 = half size)
+            "png_compress_level": 1,  # Disk/hybrid mode frame files: 0 (fastest) to 9 (smallest)
+            "memory_budget_mb": 1024,  # Hybrid mode RAM for frames before older ones spill to disk
+            "rss_limit_mb": 0,  # Hybrid mode spills sooner above this process RSS (0: budget + 1024)
+            "frame_cache_mb": 256,  # Decoded frames kept for the editor and repeated exports
+            "arena_compress_level": 0  # Arena mode zlib level, 0 keeps frames raw
         }
         
-        self.settings = self.load()
+        # Read on first access, not when the module is imported
+        self._settings = None
+    
+    @property
+    def settings(self):
+        """Current settings, loaded from disk the first time they are needed"""
+        if self._settings is None:
+            self._settings = self.load()
+        return self._settings
     
     def load(self):
         """Load settings from disk or return defaults"""
@@ -42,6 +58,7 @@ class SettingsManager:
     def save(self):
         """Save current settings to disk"""
         try:
+            self.config_dir.mkdir(parents=True, exist_ok=True)
             with open(self.config_file, 'w') as f:
                 json.dump(self.settings, f, indent=2)
         except Exception as e:
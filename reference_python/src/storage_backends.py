@@ -0,0 +1,214 @@
+"""
+Storage Backends - Where FrameStorage keeps the pixels of its frames
+"""
+
+import os
+from PIL import Image
+import numpy as np
+from disk_writer import DiskWriterPool
+from frame_convert import frame_to_image, frame_to_array, read_only, rgb_copy
+
+
+class StorageBackend:
+    """
+    Pixel store behind FrameStorage
+
+    FrameStorage keeps the frame order, delays and timestamps; a backend only
+    maps stable frame keys (ints handed out once per added frame, never
+    reused) to pixels. Keys don't change when frames before them are deleted,
+    so nothing has to be renamed or moved on a delete.
+
+    Frames come in as uint8 arrays (BGRA with 4 channels, RGB with 3) or PIL
+    Images. get_array() returns the frame in its native layout where the
+    backend keeps it, read-only and only valid while the frame is stored.
+    """
+
+    name = None
+    # Reads decode (or copy) the frame, so FrameStorage caches what they return
+    decodes = False
+
+    def put(self, key, frame, change=None, base_key=None):
+        """
+        Store a frame under a new key
+
+        change is the capture pipeline's FrameChange against the frame stored
+        under base_key, or None when that isn't known. Backends that diff
+        consecutive frames can use it instead of comparing them again, as
+        long as base_key is the frame they would diff against.
+        """
+        raise NotImplementedError
+
+    def get_array(self, key):
+        """Frame as a read-only uint8 array"""
+        raise NotImplementedError
+
+    def get_image(self, key):
+        """Frame as a PIL Image"""
+        return frame_to_image(self.get_array(key))
+
+    def delete(self, key):
+        """Forget a frame"""
+        raise NotImplementedError
+
+    def delete_many(self, keys):
+        """Forget several frames; backends with cheaper batch deletes override this"""
+        for key in keys:
+            self.delete(key)
+
+    def path(self, key):
+        """File holding the frame on its own, for backends that have one"""
+        return None
+
+    def flush(self, keys=None, timeout=None):
+        """Wait until frames are persisted (default: all of them)"""
+        return True
+
+    def compact(self):
+        """
+        Give space of deleted frames back
+
+        Returns:
+            int: Bytes reclaimed
+        """
+        return 0
+
+    def stats(self):
+        """Backend specific counters for display"""
+        return {}
+
+    def close(self):
+        """Release everything; the backend isn't used afterwards"""
+
+
+class RamBackend(StorageBackend):
+    """Frames kept as they were captured, without a copy"""
+
+    name = "ram"
+
+    def __init__(self, buffer_pool):
+        self.buffer_pool = buffer_pool
+        self.frames = {}  # key -> array or PIL Image
+
+    def put(self, key, frame, change=None, base_key=None):
+        if isinstance(frame, Image.Image):
+            frame = frame.copy()
+        else:
+            # Pool buffers come back once the frame is deleted
+            self.buffer_pool.retain(frame)
+        self.frames[key] = frame
+
+    def get_array(self, key):
+        frame = self.frames[key]
+        if isinstance(frame, Image.Image):
+            return frame_to_array(frame)
+        return read_only(frame)
+
+    def get_image(self, key):
+        return frame_to_image(self.frames[key])
+
+    def delete(self, key):
+        self.buffer_pool.release(self.frames.pop(key))
+
+    def stats(self):
+        return {"frames": len(self.frames),
+                "bytes": sum(frame.nbytes for frame in self.frames.values() if isinstance(frame, np.ndarray))}
+
+    def close(self):
+        for frame in self.frames.values():
+            self.buffer_pool.release(frame)
+        self.frames.clear()
+
+
+class PngBackend(StorageBackend):
+    """
+    One PNG file per frame in a directory
+
+    Encoding happens on a DiskWriterPool; frames stay readable from memory
+    until their file is complete, or for good if it can't be written.
+    """
+
+    name = "disk"
+    decodes = True
+
+    def __init__(self, directory, buffer_pool, compress_level=1, writers=None, max_pending=8):
+        """
+        Args:
+            directory: Existing directory for the frame files
+            buffer_pool: Pool the captured frame buffers belong to
+            compress_level: PNG compression level, 0-9
+            writers: Writer threads (default: one per spare CPU core, at most 4)
+            max_pending: Frames waiting for a writer before put() blocks
+        """
+        self.directory = directory
+        self.buffer_pool = buffer_pool
+        self.compress_level = compress_level
+        if writers is None:
+            writers = max(1, min(4, (os.cpu_count() or 2) - 1))
+        self.writer = DiskWriterPool(self._write_png, workers=writers, max_pending=max_pending,
+                                     on_written=buffer_pool.release)
+
+    def _file(self, key):
+        return os.path.join(self.directory, f"frame_{key:06d}.png")
+
+    def _write_png(self, frame, path):
+        """Writer pool callback: encode one frame"""
+        frame_to_image(frame).save(path, "PNG", compress_level=self.compress_level)
+
+    def put(self, key, frame, change=None, base_key=None):
+        if isinstance(frame, Image.Image):
+            frame = frame.copy()
+        else:
+            self.buffer_pool.retain(frame)
+        # Blocks while the writer pool is full
+        self.writer.submit(self._file(key), frame)
+
+    def get_array(self, key):
+        path = self._file(key)
+        # Not written (yet): convert the in-memory frame (copied, its buffer is reused)
+        pending = self.writer.read(path, rgb_copy)
+        if pending is not None:
+            return pending
+        try:
+            with Image.open(path) as img:
+                return np.asarray(img.convert("RGB"))
+        except OSError as e:
+            print(f"Error reading frame {key}: {e}")
+            return None
+
+    def get_image(self, key):
+        path = self._file(key)
+        pending = self.writer.read(path, lambda frame: frame_to_image(frame).copy())
+        if pending is not None:
+            return pending
+        # Loaded right away so the file is closed again
+        try:
+            with Image.open(path) as img:
+                img.load()
+                return img
+        except OSError as e:
+            print(f"Error reading frame {key}: {e}")
+            return None
+
+    def delete(self, key):
+        # A pending write is dropped, or its file removed when done
+        path = self._file(key)
+        if not self.writer.discard(path) and os.path.exists(path):
+            os.unlink(path)
+
+    def path(self, key):
+        # Only waits for this frame's write, not for the whole queue
+        path = self._file(key)
+        if not self.writer.wait([path]):
+            return None  # Couldn't be written, it only exists in memory
+        return path
+
+    def flush(self, keys=None, timeout=None):
+        paths = None if keys is None else [self._file(key) for key in keys]
+        return self.writer.wait(paths, timeout)
+
+    def stats(self):
+        return self.writer.stats()
+
+    def close(self):
+        # Frames nobody will read again don't need to be written
+        self.writer.close(discard=True)
@@ -0,0 +1,239 @@
+"""
+Tile Storage - Frames as grids of references into a pool of unique tiles
+"""
+
+import hashlib
+import threading
+import numpy as np
+from change_detection import TILE_SIZE, compute_change_map
+from frame_convert import frame_to_array, read_only
+from storage_backends import StorageBackend
+
+# Tiles the pool makes room for when it is first used
+INITIAL_TILES = 1024
+
+
+def tile_digest(tile):
+    """Content address of a tile"""
+    return hashlib.blake2b(tile, digest_size=16).digest()
+
+
+class TilePool:
+    """
+    Unique tiles of one channel count, addressed by their content
+
+    Tiles live in one (capacity, tile_size, tile_size, channels) array, so
+    frames are rebuilt with a single gather. Tiles are reference counted by
+    the frames using them and their slots reused once unreferenced.
+    """
+
+    def __init__(self, tile_size, channels):
+        self.tile_size = tile_size
+        self.channels = channels
+        self.data = np.empty((INITIAL_TILES, tile_size, tile_size, channels), dtype=np.uint8)
+        self.refs = np.zeros(INITIAL_TILES, dtype=np.int64)
+        self.digests = [None] * INITIAL_TILES
+        self.index = {}   # digest -> tile id
+        self.free = []    # Unused tile ids below self.used
+        self.used = 0     # Tile ids handed out so far (high-water mark)
+
+    def __len__(self):
+        return len(self.index)
+
+    def _grow(self):
+        capacity = len(self.refs) * 2
+        data = np.empty((capacity,) + self.data.shape[1:], dtype=np.uint8)
+        data[:self.used] = self.data[:self.used]
+        refs = np.zeros(capacity, dtype=np.int64)
+        refs[:self.used] = self.refs[:self.used]
+        self.data, self.refs = data, refs
+        self.digests.extend([None] * (capacity - len(self.digests)))
+
+    def intern(self, tile):
+        """
+        Id of the tile with this content, added to the pool if it is new
+
+        Returns:
+            (tile id, True if the tile was already in the pool)
+        """
+        digest = tile_digest(tile)
+        tile_id = self.index.get(digest)
+        if tile_id is not None:
+            return tile_id, True
+
+        if self.free:
+            tile_id = self.free.pop()
+        else:
+            if self.used == len(self.refs):
+                self._grow()
+            tile_id = self.used
+            self.used += 1
+        self.data[tile_id] = tile
+        self.digests[tile_id] = digest
+        self.index[digest] = tile_id
+        return tile_id, False
+
+    def retain(self, grid):
+        """Count the references of a frame's tile grid"""
+        np.add.at(self.refs, grid.ravel(), 1)
+
+    def release(self, grid):
+        """Drop the references of a frame's tile grid, freeing tiles nobody uses"""
+        ids = grid.ravel()
+        np.subtract.at(self.refs, ids, 1)
+        for tile_id in np.unique(ids[self.refs[ids] == 0]).tolist():
+            del self.index[self.digests[tile_id]]
+            self.digests[tile_id] = None
+            self.free.append(tile_id)
+
+    def tiles_in_use(self):
+        return int(np.count_nonzero(self.refs[:self.used]))
+
+
+class TileFrame:
+    """A stored frame: its shape and tile grid"""
+
+    __slots__ = ("shape", "grid")
+
+    def __init__(self, shape, grid):
+        self.shape = shape
+        self.grid = grid  # (rows, cols) int32 tile ids
+
+
+class TileBackend(StorageBackend):
+    """
+    Content-addressed tile deduplication across the whole recording
+
+    Frames are split into tile_size x tile_size tiles. Each tile is hashed and
+    stored once in a TilePool; a frame is kept as a grid of tile ids and
+    rebuilt on demand. Content that comes back - a blinking caret, a dialog
+    opening and closing, toolbars that never change - costs no memory after
+    its first appearance, however far apart the frames are.
+
+    Only the tiles that differ from the previous frame are hashed; the others
+    reuse the previous frame's ids. Which tiles differ comes from the capture
+    pipeline's change map when it is against the previous stored frame, or
+    from comparing the frames otherwise.
+    """
+
+    name = "tiles"
+    decodes = True
+
+    def __init__(self, tile_size=TILE_SIZE):
+        """
+        Args:
+            tile_size: Tile side in pixels
+        """
+        self.tile_size = tile_size
+        self.lock = threading.Lock()
+        self.frames = {}  # key -> TileFrame
+        self.pools = {}   # channels -> TilePool
+        # Last stored frame and its grid, to hash only the tiles that changed
+        self.tail_key = None
+        self.tail = None
+
+        self.hashed_tiles = 0
+        self.hash_hits = 0
+        self.reused_tiles = 0
+        # Totals over the stored frames, kept up to date so stats() is cheap
+        self.referenced_tiles = 0
+        self.raw_bytes = 0
+        self.grid_bytes = 0
+
+    def _pool(self, channels):
+        pool = self.pools.get(channels)
+        if pool is None:
+            pool = self.pools[channels] = TilePool(self.tile_size, channels)
+        return pool
+
+    def _tile(self, frame, row, col):
+        """Contiguous tile of a frame; edge tiles are zero padded to full size"""
+        size = self.tile_size
+        tile = frame[row * size:(row + 1) * size, col * size:(col + 1) * size]
+        if tile.shape[0] == size and tile.shape[1] == size:
+            return np.ascontiguousarray(tile)
+        padded = np.zeros((size, size, frame.shape[2]), dtype=np.uint8)
+        padded[:tile.shape[0], :tile.shape[1]] = tile
+        return padded
+
+    def put(self, key, frame, change=None, base_key=None):
+        array = frame_to_array(frame)
+        if array.ndim == 2:
+            array = array[:, :, None]
+        height, width, channels = array.shape
+        size = self.tile_size
+        rows, cols = -(-height // size), -(-width // size)
+
+        with self.lock:
+            pool = self._pool(channels)
+            if self.tail is not None and self.tail.shape == array.shape:
+                # Only a change map against the tail says which of its tiles can be reused
+                if (change is not None and base_key is not None and base_key == self.tail_key and
+                        change.tile_size == size and change.tiles.shape == (rows, cols)):
+                    changed = change.tiles
+                else:
+                    changed = compute_change_map(self.tail, array, size).tiles
+                grid = self.frames[self.tail_key].grid.copy()
+            else:
+                changed = np.ones((rows, cols), dtype=bool)
+                grid = np.empty((rows, cols), dtype=np.int32)
+
+            for row, col in zip(*np.nonzero(changed)):
+                grid[row, col], known = pool.intern(self._tile(array, row, col))
+                self.hash_hits += known
+            hashed = int(np.count_nonzero(changed))
+            self.hashed_tiles += hashed
+            self.reused_tiles += grid.size - hashed
+
+            pool.retain(grid)
+            self.frames[key] = TileFrame(array.shape, grid)
+            self.referenced_tiles += grid.size
+            self.raw_bytes += array.nbytes
+            self.grid_bytes += grid.nbytes
+            # The next frame is compared against this one
+            self.tail_key = key
+            self.tail = array.copy()
+
+    def get_array(self, key):
+        with self.lock:
+            stored = self.frames[key]
+            height, width, channels = stored.shape
+            rows, cols = stored.grid.shape
+            size = self.tile_size
+            tiles = self.pools[channels].data[stored.grid]
+        frame = tiles.transpose(0, 2, 1, 3, 4).reshape(rows * size, cols * size, channels)
+        return read_only(frame[:height, :width])
+
+    def delete(self, key):
+        with self.lock:
+            stored = self.frames.pop(key)
+            self.pools[stored.shape[2]].release(stored.grid)
+            self.referenced_tiles -= stored.grid.size
+            self.raw_bytes -= int(np.prod(stored.shape))
+            self.grid_bytes -= stored.grid.nbytes
+            if key == self.tail_key:
+                # Its tiles may be gone; the next frame is hashed in full
+                self.tail_key = self.tail = None
+
+    def stats(self):
+        with self.lock:
+            unique = sum(len(pool) for pool in self.pools.values())
+            tile_bytes = sum(len(pool) * pool.data[0].nbytes for pool in self.pools.values())
+            return {
+                "frames": len(self.frames),
+                "referenced_tiles": self.referenced_tiles,
+                "unique_tiles": unique,
+                "dedup_ratio": self.referenced_tiles / unique if unique else 0.0,
+                "raw_bytes": self.raw_bytes,
+                "stored_bytes": tile_bytes + self.grid_bytes,
+                "hashed_tiles": self.hashed_tiles,
+                "hash_hits": self.hash_hits,
+                "reused_tiles": self.reused_tiles,
+            }
+
+    def close(self):
+        with self.lock:
+            self.frames.clear()
+            self.pools.clear()
+            self.tail_key = self.tail = None
+            self.referenced_tiles = self.raw_bytes = self.grid_bytes = 0
@@ -1,100 +1,316 @@
 """
-Wayland Portal Capture - Screen capture via xdg-desktop-portal for Wayland support
+Wayland Capture - Screen capture on Wayland from a producer streaming PPM frames
 """
 
 import os
+import shlex
+import shutil
 import subprocess
-from pathlib import Path
+import sys
+import threading
+import time
 from PIL import Image
-import tempfile
+import numpy as np
 
+# Command line of a process writing binary PPM frames to stdout, one after the other.
+# {x}, {y}, {width} and {height} are replaced with the capture region.
+PRODUCER_ENV = "GIFCAP_WAYLAND_PRODUCER"
 
-class WaylandPortalCapture:
+# Default producer: one wf-recorder process for the whole recording, encoding
+# every frame as PPM through ffmpeg's image2pipe muxer. {geometry} is "x,y wxh".
+WF_RECORDER_PRODUCER = ["wf-recorder", "-y", "-g", "{geometry}", "-m", "image2pipe", "-c", "ppm",
+                        "-x", "rgb24", "-f", "/dev/stdout"]
+
+# Fallback when wf-recorder isn't installed: grim in a shell loop. This only
+# saves the PNG encode/decode and the temporary file; every frame still forks
+# a new grim process with its own screencopy session.
+GRIM_PRODUCER = 'while grim -t ppm -g "$0" -; do :; done'
+
+# Seconds before a producer that exited is started again, doubled with every
+# further exit that didn't deliver a frame
+RESTART_DELAY = 0.5
+
+# Exits in a row without a frame before grabs fail instead of restarting it
+MAX_RESTARTS = 5
+
+
+class PPMStreamReader:
     """
-    Screen capture using xdg-desktop-portal ScreenCast API
-    This works on both Wayland and X11
+    Parse binary PPM (P6) frames written back to back on a pipe
+
+    Each frame carries its own header, so producers may change the frame
+    size (HiDPI scaling for instance) at any time.
     """
-    
-    def __init__(self):
-        self.is_available = self._check_portal_available()
-        self.temp_dir = None
-        self.recording_process = None
-    
-    def _check_portal_available(self):
-        """Check if xdg-desktop-portal is available"""
-        try:
-            # Check if we can communicate with the portal
-            result = subprocess.run(
-                ['busctl', 'status', 'org.freedesktop.portal.Desktop'],
-                capture_output=True,
-                timeout=2
-            )
-            return result.returncode == 0
-        except Exception:
-            return False
-    
-    def start_capture(self, x, y, width, height):
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def read_frame(self):
         """
-        Start screen capture via portal
-        Note: First time will require user permission dialog
+        Read the next frame
+
+        Returns:
+            (width, height, rgb_bytes) tuple, or None at end of stream
         """
-        if not self.is_available:
-            return False
-        
-        # Create temp directory for screenshots
-        self.temp_dir = Path(tempfile.mkdtemp(prefix="gifcap_portal_"))
-        
-        # For now, use grim/slurp as a simpler alternative
-        # Full portal implementation would require D-Bus bindings
-        return self._check_grim_available()
-    
-    def _check_grim_available(self):
-        """Check if grim (Wayland screenshot tool) is available"""
-        try:
-            result = subprocess.run(['which', 'grim'], capture_output=True)
-            return result.returncode == 0
-        except Exception:
-            return False
-    
-    def grab_frame(self, x, y, width, height):
+        magic = self._read_token()
+        if magic is None:
+            return None
+        if magic != b"P6":
+            raise ValueError(f"Unsupported frame format: {magic!r}")
+
+        width = int(self._read_token())
+        height = int(self._read_token())
+        maxval = int(self._read_token())
+        if maxval > 255:
+            raise ValueError("16-bit PPM frames are not supported")
+
+        size = width * height * 3
+        data = self.stream.read(size)
+        if len(data) < size:
+            return None
+        return width, height, data
+
+    def _read_token(self):
+        """Read one whitespace separated header token, skipping comments"""
+        token = b""
+        while True:
+            char = self.stream.read(1)
+            if not char:
+                return token or None
+            if char == b"#":
+                while char not in (b"\n", b""):
+                    char = self.stream.read(1)
+                continue
+            if char.isspace():
+                # The single whitespace after maxval ends the header, so stop right here
+                if token:
+                    return token
+                continue
+            token += char
+
+
+class WaylandStreamCapture:
+    """
+    Wayland capture from one long-lived producer process
+
+    The producer streams raw PPM frames over a pipe; a reader thread parses
+    them and keeps only the newest one, so grab_frame() never waits for a
+    PNG encode/decode or a temporary file. With wf-recorder (the default)
+    there is also no process start per frame; the grim fallback still forks
+    grim for every frame.
+
+    A producer that exits is restarted, with a growing delay while it keeps
+    exiting without delivering frames; after MAX_RESTARTS such exits in a row
+    grabs raise RuntimeError.
+    """
+
+    def __init__(self, producer=None):
         """
-        Capture a frame of the specified region
-        Returns PIL Image or None
+        Args:
+            producer: Optional function (x, y, width, height) -> argv of the producer.
+                Defaults to $GIFCAP_WAYLAND_PRODUCER, then wf-recorder, then
+                grim in a loop (one process per frame).
         """
-        if not self.temp_dir:
-            return None
-        
-        # Use grim for Wayland screenshot
-        # grim -g "x,y widthxheight" output.png
-        output_file = self.temp_dir / f"frame_{os.getpid()}.png"
+        self.producer = producer
+        self.process = None
+        self.reader_thread = None
+        self.geometry = None
+        self.frames_read = 0
+        self.frames_at_start = 0
+        self.failures = 0       # Producer exits in a row without a frame
+        self.retry_at = 0.0     # time.monotonic() before which it isn't restarted
+        self._latest = None
+        self._frame_ready = threading.Condition()
+
+    @staticmethod
+    def is_available():
+        """Check if a frame producer can be started"""
+        return (bool(os.environ.get(PRODUCER_ENV)) or shutil.which("wf-recorder") is not None
+                or shutil.which("grim") is not None)
+
+    def _producer_command(self, x, y, width, height):
+        """Build the producer's command line for a region"""
+        if self.producer:
+            return self.producer(x, y, width, height)
+
+        template = os.environ.get(PRODUCER_ENV)
+        if template:
+            return shlex.split(template.format(x=x, y=y, width=width, height=height))
+
         geometry = f"{x},{y} {width}x{height}"
-        
+        if shutil.which("wf-recorder"):
+            return [arg.format(geometry=geometry) for arg in WF_RECORDER_PRODUCER]
+        return ["sh", "-c", GRIM_PRODUCER, geometry]
+
+    def start(self, x, y, width, height):
+        """Start streaming the given region (restarts the producer if needed)"""
+        self.stop()
+        self.geometry = (x, y, width, height)
+        self._latest = None
+        self.frames_at_start = self.frames_read
+        self.process = subprocess.Popen(
+            self._producer_command(x, y, width, height),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        )
+        self.reader_thread = threading.Thread(target=self._read_frames, args=(self.process,),
+                                              name="gifcap-wayland-reader", daemon=True)
+        self.reader_thread.start()
+
+    def _read_frames(self, process):
+        """Reader thread: keep the newest frame of the stream"""
+        reader = PPMStreamReader(process.stdout)
         try:
-            subprocess.run(
-                ['grim', '-g', geometry, str(output_file)],
-                capture_output=True,
-                timeout=1,
-                check=True
-            )
-            
-            if output_file.exists():
-                img = Image.open(output_file)
-                output_file.unlink()  # Clean up
-                return img
-            
+            while True:
+                frame = reader.read_frame()
+                if frame is None:
+                    break
+                with self._frame_ready:
+                    self._latest = frame
+                    self.frames_read += 1
+                    self._frame_ready.notify_all()
         except Exception as e:
-            print(f"Error capturing via portal: {e}")
-        
-        return None
-    
-    def cleanup(self):
-        """Clean up temporary files"""
-        if self.temp_dir and self.temp_dir.exists():
-            import shutil
+            print(f"Error reading Wayland frame stream: {e}")
+        finally:
+            with self._frame_ready:
+                self._frame_ready.notify_all()
+
+    def grab_frame(self, x, y, width, height, timeout=1.0):
+        """
+        Return the newest streamed frame of the specified region
+
+        Returns PIL Image or None
+        """
+        frame = self.grab_frame_array(x, y, width, height, timeout)
+        if frame is None:
+            return None
+        # Wraps the bytes without copying them
+        frame_height, frame_width = frame.shape[:2]
+        return Image.frombuffer("RGB", (frame_width, frame_height), frame, "raw", "RGB", 0, 1)
+
+    def grab_frame_array(self, x, y, width, height, timeout=1.0):
+        """
+        Return the newest streamed frame of the specified region as an array
+
+        Returns:
+            Read-only (height, width, 3) RGB uint8 array over the frame's
+            bytes, or None
+
+        Raises:
+            RuntimeError: The producer keeps exiting without delivering frames
+        """
+        if self.geometry != (x, y, width, height) or self.process is None:
+            self.start(x, y, width, height)
+        elif self.process.poll() is not None and not self._restart():
+            return None
+
+        deadline = time.monotonic() + timeout
+        with self._frame_ready:
+            while self._latest is None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self.reader_thread.is_alive():
+                    return None
+                self._frame_ready.wait(remaining)
+            frame_width, frame_height, data = self._latest
+
+        # Every frame has its own bytes object, so the view stays valid
+        return np.frombuffer(data, dtype=np.uint8).reshape(frame_height, frame_width, 3)
+
+    def _restart(self):
+        """
+        Start the producer again after it exited, unless it is backing off
+
+        Returns:
+            bool: True if it was restarted
+        """
+        if self.frames_read > self.frames_at_start:
+            self.failures = 0  # It was working until now
+        if self.failures >= MAX_RESTARTS:
+            raise RuntimeError(f"Wayland frame producer keeps exiting (restarted {self.failures} times, "
+                               f"exit code {self.process.returncode})")
+        now = time.monotonic()
+        if now < self.retry_at:
+            return False
+        self.failures += 1
+        self.retry_at = now + RESTART_DELAY * 2 ** (self.failures - 1)
+        self.start(*self.geometry)
+        return True
+
+    def stop(self):
+        """Stop the producer and the reader thread"""
+        if self.process:
+            self.process.terminate()
             try:
-                shutil.rmtree(self.temp_dir)
-            except Exception:
-                pass
-    
+                self.process.wait(timeout=1)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+        if self.reader_thread:
+            # The reader sees the end of the stream once the producer is gone
+            self.reader_thread.join(timeout=1)
+            self.reader_thread = None
+        if self.process:
+            self.process.stdout.close()
+            self.process = None
+
+    def close(self):
+        """Same as stop(), so the capture can be used like an mss grabber"""
+        self.stop()
+
     def __del__(self):
-        self.cleanup()
+        self.stop()
+
+
+def synthetic_producer(x, y, width, height, fps=30):
+    """
+    Producer argv running this module as a stand-in for the compositor
+
+    Use it as WaylandStreamCapture(producer=...) or through
+    GIFCAP_WAYLAND_PRODUCER to exercise the streaming path without Wayland.
+    """
+    return [sys.executable, os.path.abspath(__file__), "--synthetic",
+            f"{width}x{height}", "--fps", str(fps)]
+
+
+def _emit_synthetic_frames(width, height, fps, count):
+    """Write deterministic PPM frames (a bar sweeping over a gradient) to stdout"""
+    header = f"P6\n{width} {height}\n255\n".encode("ascii")
+    row = bytearray(width * 3)
+    for x in range(width):
+        row[x * 3:x * 3 + 3] = bytes(((x * 255) // max(1, width - 1), 64, 128))
+    background = bytes(row) * height
+
+    out = sys.stdout.buffer
+    bar_width = max(1, width // 16)
+    frame = 0
+    next_time = time.monotonic()
+    while count is None or frame < count:
+        data = bytearray(background)
+        left = (frame * bar_width) % width
+        bar = b"\xff\xff\xff" * min(bar_width, width - left)
+        for y in range(height):
+            start = (y * width + left) * 3
+            data[start:start + len(bar)] = bar
+        try:
+            out.write(header)
+            out.write(data)
+            out.flush()
+        except BrokenPipeError:
+            return
+
+        frame += 1
+        next_time += 1.0 / fps
+        time.sleep(max(0.0, next_time - time.monotonic()))
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Synthetic PPM frame producer for WaylandStreamCapture")
+    parser.add_argument("--synthetic", required=True, metavar="WxH", help="Frame size")
+    parser.add_argument("--fps", type=float, default=30)
+    parser.add_argument("--frames", type=int, default=None, help="Stop after this many frames")
+    args = parser.parse_args()
+
+    synthetic_width, synthetic_height = (int(v) for v in args.synthetic.lower().split("x"))
+    _emit_synthetic_frames(synthetic_width, synthetic_height, args.fps, args.frames)
@@ -0,0 +1,8 @@
+"""
+Test setup - Import the modules in src/ the way the app and benchmarks do
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
@@ -0,0 +1,43 @@
+"""
+Capture core tests - Frames recorded headless from a synthetic source
+"""
+
+from capture_core import CaptureCore
+from capture_pipeline import BLOCK
+from capture_sources import SyntheticSource
+from frame_storage import FrameStorage
+
+
+def make_core(storage, source):
+    core = CaptureCore(storage, source=source)
+    core.capture_cursor = False
+    core.adaptive_rate = False
+    core.queue_policy = BLOCK
+    return core
+
+
+def test_frames_are_stored_after_region_resize():
+    storage = FrameStorage("ram")
+    # New noise every grab, so every frame differs from the one before
+    source = SyntheticSource(640, 480, script=(("video", 60.0),), buffer_pool=storage.buffer_pool)
+    grabber = source.open_grabber()
+    core = make_core(storage, source)
+    core.set_capture_region(0, 0, 320, 240)
+    try:
+        assert core.start_recording(run_thread=False)
+        for _ in range(5):
+            core._capture_frame(grabber)
+        core.set_capture_region(10, 10, 300, 200)
+        for _ in range(5):
+            core._capture_frame(grabber)
+        core.stop_recording()
+
+        shapes = [storage.get_frame_array(i).shape[:2] for i in range(storage.get_frame_count())]
+        assert shapes.count((240, 320)) == 5
+        assert shapes.count((200, 300)) == 5
+        # The first frame of the new size has no change map against the old size
+        assert storage.index.change(5) is None
+    finally:
+        grabber.close()
+        core.change_detector.close()
+        storage.cleanup()
@@ -0,0 +1,88 @@
+"""
+Frame storage tests - Frames come back pixel for pixel from every storage mode
+"""
+
+import numpy as np
+import pytest
+from change_detection import compute_change_map
+from delta_storage import DeltaBackend
+from frame_storage import FrameStorage
+from tile_storage import TileBackend
+
+
+def frame(value, block=None):
+    """A flat 96x128 BGRA frame, with an optional (top, left, value) 32x32 block"""
+    array = np.full((96, 128, 4), value, dtype=np.uint8)
+    if block is not None:
+        top, left, block_value = block
+        array[top:top + 32, left:left + 32] = block_value
+    return array
+
+
+def read_back(storage):
+    """Every stored frame, decoded again instead of taken from a cache"""
+    storage.cache.clear()
+    backend_cache = getattr(storage.backend, "cache", None)
+    if backend_cache is not None:
+        backend_cache.clear()
+    return [np.array(storage.get_frame_array(i)) for i in range(storage.get_frame_count())]
+
+
+@pytest.mark.parametrize("mode", ["delta", "tiles"])
+def test_single_frame_between_pipeline_frames(mode):
+    storage = FrameStorage(mode)
+    try:
+        first = frame(10)
+        second = frame(10, (0, 0, 200))
+        manual = frame(90)
+        third = frame(10, (32, 32, 200))
+
+        key = storage.append_frame(first)
+        key = storage.append_frame(second, change=compute_change_map(first, second), base_key=key)
+        # A single frame capture lands between two pipeline frames
+        storage.add_frame(manual)
+        # The pipeline's map is against the second frame, not the manual one at the tail
+        storage.append_frame(third, change=compute_change_map(second, third), base_key=key)
+
+        for stored, expected in zip(read_back(storage), [first, second, manual, third]):
+            assert np.array_equal(stored, expected)
+        assert storage.index.change(3) is None
+    finally:
+        storage.cleanup()
+
+
+@pytest.mark.parametrize("mode", ["delta", "tiles"])
+def test_change_map_used_when_base_is_tail(mode):
+    storage = FrameStorage(mode)
+    try:
+        first = frame(10)
+        second = frame(10, (0, 0, 200))
+        change = compute_change_map(first, second)
+        key = storage.append_frame(first)
+        storage.append_frame(second, change=change, base_key=key)
+
+        assert storage.index.change(1) is change
+        assert all(np.array_equal(stored, expected)
+                   for stored, expected in zip(read_back(storage), [first, second]))
+    finally:
+        storage.cleanup()
+
+
+@pytest.mark.parametrize("backend_class", [DeltaBackend, TileBackend])
+def test_backend_ignores_change_map_against_other_frame(backend_class):
+    backend = backend_class()
+    first = frame(10)
+    second = frame(10, (0, 0, 200))
+    manual = frame(90)
+    third = frame(10, (32, 32, 200))
+
+    backend.put(0, first)
+    backend.put(1, second, compute_change_map(first, second), base_key=0)
+    backend.put(2, manual)
+    backend.put(3, third, compute_change_map(second, third), base_key=1)
+
+    cache = getattr(backend, "cache", None)
+    if cache is not None:
+        cache.clear()
+    assert np.array_equal(backend.get_array(3), third)
+    backend.close()
@@ -0,0 +1,31 @@
+"""
+Recorder tests - Construction and cleanup without a display
+"""
+
+import pytest
+from capture_sources import SyntheticSource
+from frame_storage import FrameStorage
+from recorder import Recorder
+
+
+class BrokenSource(SyntheticSource):
+    """A source whose probe fails, like a session without a capture backend"""
+
+    def probe(self):
+        return "no capture backend"
+
+
+def test_storage_cleaned_up_when_backend_unavailable():
+    storage = FrameStorage("disk")
+    frame_dir = storage.frame_dir
+    with pytest.raises(RuntimeError):
+        Recorder((0, 0, 64, 48), storage=storage, source=BrokenSource(64, 48))
+    assert not frame_dir.exists()
+    assert storage.backend is None
+
+
+def test_storage_cleaned_up_on_invalid_scale():
+    storage = FrameStorage("disk")
+    with pytest.raises(ValueError):
+        Recorder((0, 0, 64, 48), storage=storage, source=SyntheticSource(64, 48), output_scale=2)
+    assert not storage.frame_dir.exists()